@@ -1,479 +1,166 @@
+import cProfile
+import uuid
+from typing import List
+
 import streamlit as st
-from dataclasses import dataclass
-from typing import List, Dict, Set
-import urllib.parse
+
+from catalog import CUISINE_OPTIONS, PANTRY_OPTIONS
+from engine import Engine, Suggestion, normalize_pantry
+from perf import RequestTrace, profile_report
+from ranking import Prefs
+from result_cache import pantry_fingerprint
+from speculative import Speculator
 
 st.set_page_config(page_title="Recipe Bot", page_icon="🥘", layout="wide")
 st.title("🥘 Recipe Bot")
 st.caption("Pick what you have. I’ll suggest recipes with steps and a related YouTube video.")
 
-@dataclass
-class Recipe:
-    title: str
-    cuisine: str
-    ingredients: Dict[str, List[str]]  # by category
-    time_minutes: int
-    diet: Set[str]  # {"veg", "egg-veg", "vegan", "omnivore"}
-    steps: List[str]
-
-CATEGORIES = [
-    "veggies",
-    "proteins",
-    "masalas_spices",
-    "sauces_condiments",
-    "carbs",
-    "others",
-]
-
-# Normalization helpers
-synonyms = {
-    "scallion": "spring onion",
-    "green onion": "spring onion",
-    "chili": "chilli",
-    "chilies": "chilli",
-    "chilies green": "chilli",
-    "soy sauce": "light soy sauce",
-    "soya sauce": "light soy sauce",
-    "paneer cheese": "paneer",
-    "bell pepper": "capsicum",
-    "fenugreek leaves": "kasuri methi",
-    "cilantro leaves": "cilantro",
-    "lemon juice": "lemon",
+
+# One engine (catalog, index, result cache) per process, shared read-only by
+# every session and rerun; its store swaps in a new catalog when the file changes.
+@st.cache_resource
+def get_engine() -> Engine:
+    return Engine()
+
+
+@st.cache_resource
+def get_speculator() -> Speculator:
+    return Speculator(get_engine())
+
+
+engine = get_engine()
+
+# Matches per page; the first is the default
+PAGE_SIZES = [3, 5, 10, 20]
+
+# "What to buy next": sets of up to this many ingredients, this many per size
+UNLOCK_SIZE = 2
+UNLOCK_LIMIT = 3
+
+# "More like this" under each match
+SIMILAR_K = 3
+
+# "Plan my week": how many meals the planner may be asked for
+PLAN_DAYS = range(3, 15)
+
+# widget key -> pantry category
+PANTRY_KEYS = {
+    "veggies": "veggies",
+    "proteins": "proteins",
+    "masalas": "masalas_spices",
+    "sauces": "sauces_condiments",
+    "carbs": "carbs",
+    "others": "others",
 }
 
-def norm(x: str) -> str:
-    x = x.strip().lower()
-    return synonyms.get(x, x)
-
-RECIPES: List[Recipe] = [
-    # ---- INDIAN ----
-    Recipe(
-        title="Indian Masala Omelette",
-        cuisine="Indian",
-        ingredients={
-            "veggies": ["onion", "tomato", "green chilli", "cilantro"],
-            "proteins": ["egg"],
-            "masalas_spices": ["turmeric", "cumin", "garam masala", "black pepper", "salt"],
-            "sauces_condiments": [],
-            "carbs": [],
-            "others": ["oil"],
-        },
-        time_minutes=15,
-        diet={"egg-veg", "omnivore"},
-        steps=[
-            "Beat eggs with salt, turmeric, cumin, and garam masala.",
-            "Sauté onion, green chilli, and tomato in a little oil until soft.",
-            "Pour eggs, cook until just set, fold, and finish with cilantro.",
-        ],
-    ),
-    Recipe(
-        title="Indian Chana Masala (Quick)",
-        cuisine="Indian",
-        ingredients={
-            "veggies": ["onion", "tomato", "ginger", "garlic", "green chilli"],
-            "proteins": ["chickpeas"],
-            "masalas_spices": ["cumin", "coriander", "turmeric", "garam masala", "chilli powder", "salt"],
-            "sauces_condiments": [],
-            "carbs": ["rice"],
-            "others": ["oil"],
-        },
-        time_minutes=25,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Bloom spices in oil, then sauté onion, ginger, garlic.",
-            "Add tomato; cook down, then add chickpeas and simmer.",
-            "Adjust seasoning; serve with rice.",
-        ],
-    ),
-    Recipe(
-        title="Paneer Butter Masala (Easy)",
-        cuisine="Indian",
-        ingredients={
-            "veggies": ["onion", "tomato", "ginger", "garlic"],
-            "proteins": ["paneer"],
-            "masalas_spices": ["garam masala", "cumin", "turmeric", "chilli powder", "kasuri methi", "salt"],
-            "sauces_condiments": ["tomato paste", "cream"],
-            "carbs": ["naan", "rice"],
-            "others": ["butter", "oil"],
-        },
-        time_minutes=25,
-        diet={"veg", "omnivore"},
-        steps=[
-            "Sauté onion, ginger, garlic in butter/oil.",
-            "Add tomato paste, spices, splash of water; simmer.",
-            "Stir in cream and paneer; finish with kasuri methi.",
-        ],
-    ),
-    Recipe(
-        title="Aloo Gobi (Potato Cauliflower)",
-        cuisine="Indian",
-        ingredients={
-            "veggies": ["potato", "cauliflower", "onion", "tomato", "green chilli", "cilantro"],
-            "proteins": [],
-            "masalas_spices": ["cumin", "turmeric", "coriander", "garam masala", "salt"],
-            "sauces_condiments": [],
-            "carbs": ["roti", "rice"],
-            "others": ["oil"],
-        },
-        time_minutes=25,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Bloom cumin; sauté onion and chilli.",
-            "Add potatoes and cauliflower with spices; cover and cook.",
-            "Add tomato to finish; garnish with cilantro.",
-        ],
-    ),
-    Recipe(
-        title="Dal Tadka",
-        cuisine="Indian",
-        ingredients={
-            "veggies": ["onion", "tomato", "garlic", "ginger", "green chilli"],
-            "proteins": ["lentils"],
-            "masalas_spices": ["turmeric", "cumin", "mustard seeds", "asafoetida", "chilli powder", "salt"],
-            "sauces_condiments": [],
-            "carbs": ["rice"],
-            "others": ["ghee", "oil"],
-        },
-        time_minutes=30,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Boil lentils with turmeric and salt until soft.",
-            "Make tadka: sizzle cumin, mustard, garlic in ghee/oil; add chilli powder.",
-            "Pour over lentils; simmer 2–3 minutes.",
-        ],
-    ),
-
-    # ---- CHINESE ----
-    Recipe(
-        title="Chinese Tomato & Egg Stir-Fry",
-        cuisine="Chinese",
-        ingredients={
-            "veggies": ["tomato", "spring onion"],
-            "proteins": ["egg"],
-            "masalas_spices": ["white pepper", "salt"],
-            "sauces_condiments": ["light soy sauce", "sugar", "sesame oil"],
-            "carbs": ["rice"],
-            "others": ["oil"],
-        },
-        time_minutes=12,
-        diet={"egg-veg", "omnivore"},
-        steps=[
-            "Scramble eggs softly and set aside.",
-            "Stir-fry tomatoes; season with soy, sugar, salt, white pepper.",
-            "Return eggs; finish with sesame oil and spring onion.",
-        ],
-    ),
-    Recipe(
-        title="Veg Fried Rice",
-        cuisine="Chinese",
-        ingredients={
-            "veggies": ["carrot", "peas", "spring onion", "garlic"],
-            "proteins": ["egg"],
-            "masalas_spices": ["white pepper", "salt"],
-            "sauces_condiments": ["light soy sauce", "sesame oil"],
-            "carbs": ["rice"],
-            "others": ["oil"],
-        },
-        time_minutes=15,
-        diet={"veg", "egg-veg", "omnivore"},
-        steps=[
-            "Stir-fry aromatics; add veggies.",
-            "Add rice and soy; toss on high heat.",
-            "Push aside, scramble egg if using; mix and finish with sesame oil.",
-        ],
-    ),
-    Recipe(
-        title="Kung Pao Chicken",
-        cuisine="Chinese",
-        ingredients={
-            "veggies": ["garlic", "spring onion", "capsicum"],
-            "proteins": ["chicken"],
-            "masalas_spices": ["chilli flakes", "white pepper", "salt"],
-            "sauces_condiments": ["light soy sauce", "vinegar", "sugar", "cornstarch"],
-            "carbs": ["rice"],
-            "others": ["oil", "peanuts"],
-        },
-        time_minutes=18,
-        diet={"omnivore"},
-        steps=[
-            "Marinate chicken with soy and cornstarch.",
-            "Stir-fry chilli flakes, chicken, peppers; add sauce (soy, vinegar, sugar).",
-            "Finish with spring onion and peanuts.",
-        ],
-    ),
-    Recipe(
-        title="Mapo Tofu (mild)",
-        cuisine="Chinese",
-        ingredients={
-            "veggies": ["garlic", "spring onion", "ginger"],
-            "proteins": ["tofu", "minced beef"],
-            "masalas_spices": ["chilli powder", "white pepper", "salt"],
-            "sauces_condiments": ["light soy sauce", "doubanjiang"],
-            "carbs": ["rice"],
-            "others": ["oil"],
-        },
-        time_minutes=20,
-        diet={"omnivore"},
-        steps=[
-            "Sauté aromatics and beef; add doubanjiang.",
-            "Add tofu and soy; simmer briefly.",
-            "Serve with rice; garnish spring onion.",
-        ],
-    ),
-    Recipe(
-        title="Chinese Garlic Chicken & Broccoli Stir-Fry",
-        cuisine="Chinese",
-        ingredients={
-            "veggies": ["broccoli", "garlic", "spring onion"],
-            "proteins": ["chicken"],
-            "masalas_spices": ["white pepper", "salt"],
-            "sauces_condiments": ["light soy sauce", "oyster sauce", "cornstarch", "sesame oil"],
-            "carbs": ["rice"],
-            "others": ["oil"],
-        },
-        time_minutes=18,
-        diet={"omnivore"},
-        steps=[
-            "Velvet chicken with soy, cornstarch, pinch of oil.",
-            "Stir-fry garlic, chicken, then broccoli; splash water to steam.",
-            "Finish with sauces; serve over rice.",
-        ],
-    ),
-
-    # ---- ITALIAN ----
-    Recipe(
-        title="Italian Aglio e Olio",
-        cuisine="Italian",
-        ingredients={
-            "veggies": ["garlic", "parsley", "chilli flakes"],
-            "proteins": [],
-            "masalas_spices": ["black pepper", "salt"],
-            "sauces_condiments": [],
-            "carbs": ["spaghetti"],
-            "others": ["olive oil"],
-        },
-        time_minutes=15,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Cook spaghetti al dente.",
-            "Gently sizzle garlic and chilli in olive oil.",
-            "Toss pasta with oil and pasta water; finish with parsley.",
-        ],
-    ),
-    Recipe(
-        title="Penne Arrabbiata",
-        cuisine="Italian",
-        ingredients={
-            "veggies": ["garlic", "chilli flakes", "parsley"],
-            "proteins": [],
-            "masalas_spices": ["black pepper", "salt"],
-            "sauces_condiments": ["tomato paste"],
-            "carbs": ["penne"],
-            "others": ["olive oil"],
-        },
-        time_minutes=18,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Sauté garlic and chilli; add tomato paste and pasta water.",
-            "Simmer; toss with cooked penne; finish with parsley.",
-        ],
-    ),
-    Recipe(
-        title="Creamy Alfredo (no-egg)",
-        cuisine="Italian",
-        ingredients={
-            "veggies": ["garlic", "parsley"],
-            "proteins": [],
-            "masalas_spices": ["black pepper", "salt"],
-            "sauces_condiments": ["cream", "parmesan"],
-            "carbs": ["pasta"],
-            "others": ["butter"],
-        },
-        time_minutes=20,
-        diet={"veg", "omnivore"},
-        steps=[
-            "Melt butter, add garlic, cream; reduce slightly.",
-            "Stir in parmesan; toss pasta; season with pepper.",
-        ],
-    ),
-    Recipe(
-        title="Tomato Basil Pasta",
-        cuisine="Italian",
-        ingredients={
-            "veggies": ["garlic", "tomato", "basil"],
-            "proteins": [],
-            "masalas_spices": ["black pepper", "salt"],
-            "sauces_condiments": [],
-            "carbs": ["pasta"],
-            "others": ["olive oil"],
-        },
-        time_minutes=20,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Sauté garlic in olive oil; add chopped tomatoes; simmer.",
-            "Toss with cooked pasta; season; finish with basil.",
-        ],
-    ),
-
-    # ---- AMERICAN & TEX-MEX ----
-    Recipe(
-        title="American Veggie Omelette",
-        cuisine="American",
-        ingredients={
-            "veggies": ["onion", "capsicum", "mushroom"],
-            "proteins": ["egg"],
-            "masalas_spices": ["black pepper", "salt"],
-            "sauces_condiments": [],
-            "carbs": [],
-            "others": ["butter"],
-        },
-        time_minutes=14,
-        diet={"egg-veg", "omnivore"},
-        steps=[
-            "Sauté onion, pepper, mushrooms in butter.",
-            "Add beaten eggs; cook until set, fold, season.",
-        ],
-    ),
-    Recipe(
-        title="Mac and Cheese (Stovetop)",
-        cuisine="American",
-        ingredients={
-            "veggies": [],
-            "proteins": [],
-            "masalas_spices": ["black pepper", "salt", "paprika"],
-            "sauces_condiments": ["mustard"],
-            "carbs": ["pasta"],
-            "others": ["butter", "milk", "cheddar"],
-        },
-        time_minutes=20,
-        diet={"veg", "omnivore"},
-        steps=[
-            "Cook pasta; make roux with butter and milk.",
-            "Melt in cheddar, mustard; season; toss with pasta.",
-        ],
-    ),
-    Recipe(
-        title="Chicken Fajita Skillet",
-        cuisine="American/Mex-Tex",
-        ingredients={
-            "veggies": ["onion", "capsicum", "garlic"],
-            "proteins": ["chicken"],
-            "masalas_spices": ["paprika", "cumin", "chilli powder", "salt", "black pepper"],
-            "sauces_condiments": ["lime"],
-            "carbs": ["tortilla"],
-            "others": ["oil"],
-        },
-        time_minutes=20,
-        diet={"omnivore"},
-        steps=[
-            "Sear seasoned chicken; remove.",
-            "Sauté peppers and onion; return chicken; finish with lime.",
-        ],
-    ),
-    Recipe(
-        title="Veg Quesadilla",
-        cuisine="Mexican",
-        ingredients={
-            "veggies": ["onion", "capsicum", "corn"],
-            "proteins": ["beans"],
-            "masalas_spices": ["cumin", "paprika", "salt", "black pepper"],
-            "sauces_condiments": ["lime"],
-            "carbs": ["tortilla"],
-            "others": ["cheese", "oil"],
-        },
-        time_minutes=12,
-        diet={"veg", "omnivore"},
-        steps=[
-            "Sauté veg with spices; layer in tortilla with cheese.",
-            "Toast on pan until crisp and melty; finish with lime.",
-        ],
-    ),
-    Recipe(
-        title="Chicken Tacos (Skillet)",
-        cuisine="Mexican",
-        ingredients={
-            "veggies": ["onion", "tomato", "lettuce"],
-            "proteins": ["chicken"],
-            "masalas_spices": ["cumin", "paprika", "chilli powder", "salt"],
-            "sauces_condiments": ["lime", "salsa"],
-            "carbs": ["tortilla"],
-            "others": ["oil"],
-        },
-        time_minutes=18,
-        diet={"omnivore"},
-        steps=[
-            "Sear spiced chicken; slice.",
-            "Warm tortillas; fill with chicken, tomato, lettuce, salsa.",
-        ],
-    ),
-
-    # ---- MEDITERRANEAN ----
-    Recipe(
-        title="Mediterranean Hummus Bowl",
-        cuisine="Mediterranean",
-        ingredients={
-            "veggies": ["cucumber", "tomato", "lettuce", "red onion"],
-            "proteins": ["chickpeas"],
-            "masalas_spices": ["cumin", "paprika", "salt", "black pepper"],
-            "sauces_condiments": ["lemon", "tahini"],
-            "carbs": ["pita", "rice"],
-            "others": ["olive oil", "garlic"],
-        },
-        time_minutes=15,
-        diet={"veg", "vegan", "omnivore"},
-        steps=[
-            "Blend chickpeas with tahini, lemon, garlic, olive oil (hummus).",
-            "Assemble bowl with veg, hummus; season with cumin/paprika.",
-        ],
-    ),
-]
+
+DIET_OPTIONS = ["no preference", "veg", "vegan", "egg-veg", "omnivore"]
+
+
+def current_prefs() -> Prefs:
+    return Prefs(
+        cuisine=tuple(st.session_state.get("cuisine_pref", [])),
+        diet=st.session_state.get("diet_pref", "no preference"),
+        time_limit=st.session_state.get("time_limit", 25),
+        strict=st.session_state.get("strict", False),
+        substitutes=st.session_state.get("substitutes", True),
+        search=st.session_state.get("search", "").strip(),
+    )
+
+
+def current_query():
+    # the pantry and preferences as the sidebar currently has them
+    have = {cat: list(st.session_state.get(key, [])) for key, cat in PANTRY_KEYS.items()}
+    text = st.session_state.get("pantry_text", "")
+    if text.strip():
+        have = engine.parse_pantry(text, have)
+    return have, current_prefs()
+
+
+# ---- Speculative ranking (on_change of every input) ----
+def speculate():
+    # rank the new inputs in the background so a click finds them cached
+    if not st.session_state.get("speculate") or st.session_state.get("live_results"):
+        return
+    session = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    have, prefs = current_query()
+    if any(have.values()):
+        get_speculator().submit(session, have, prefs, st.session_state.get("page_size", PAGE_SIZES[0]))
+    else:
+        get_speculator().cancel(session)
+
 
 # --- Sidebar Filters (keys added) ---
 st.sidebar.header("Your Pantry")
 
+# recipes left per option given the other preferences, from the facet bitmaps
+facet_counts = engine.facets().counts(current_prefs(), CUISINE_OPTIONS, DIET_OPTIONS)
+
 cuisine_pref = st.sidebar.multiselect(
     "Cuisine preferences (optional)",
-    ["Indian", "Chinese", "Italian", "American", "American/Mex-Tex", "Mexican", "Mediterranean"],
+    CUISINE_OPTIONS,
     key="cuisine_pref",
+    format_func=lambda c: f"{c} ({facet_counts['cuisine'][c]})",
+    on_change=speculate,
 )
 
 diet_pref = st.sidebar.selectbox(
     "Diet",
-    ["no preference", "veg", "vegan", "egg-veg", "omnivore"],
+    DIET_OPTIONS,
     key="diet_pref",
+    format_func=lambda d: f"{d} ({facet_counts['diet'][d]})",
+    on_change=speculate,
 )
 
-time_limit = st.sidebar.slider("Time limit (minutes)", 10, 60, 25, key="time_limit")
+time_limit = st.sidebar.slider("Time limit (minutes)", 10, 60, 25, key="time_limit", on_change=speculate)
+
+strict = st.sidebar.checkbox("Only recipes matching all of these", key="strict", on_change=speculate)
+st.sidebar.caption(f"{facet_counts['matching']} recipes match cuisine, diet and time.")
+
+st.sidebar.checkbox(
+    "Count substitutes (butter for ghee, lemon for lime)", value=True, key="substitutes", on_change=speculate
+)
+
+st.sidebar.text_input(
+    "Search titles and steps (optional)",
+    key="search",
+    placeholder="stir-fry, simmer, no oven",
+    on_change=speculate,
+)
 
 st.sidebar.markdown("---")
 
-veggies = sorted({
-    "onion","red onion","spring onion","garlic","ginger","green chilli","chilli flakes",
-    "tomato","bell pepper","capsicum","carrot","peas","corn","mushroom",
-    "broccoli","cauliflower","spinach","lettuce","cucumber","potato","cilantro",
-    "parsley","basil"
-})
-proteins = sorted({"egg","paneer","tofu","chickpeas","lentils","beans","chicken","shrimp","minced beef"})
-masalas  = sorted({"cumin","coriander","turmeric","garam masala","kasuri methi","mustard seeds",
-                   "asafoetida","curry leaves","chilli powder","paprika","black pepper","white pepper","salt"})
-sauces   = sorted({"light soy sauce","oyster sauce","sesame oil","tomato paste","salsa",
-                   "ketchup","mustard","vinegar","lime","lemon","tahini","cream","parmesan"})
-carbs    = sorted({"rice","pasta","spaghetti","penne","pita","naan","tortilla"})
-others   = sorted({"oil","olive oil","butter","ghee","milk","cheddar","parmesan","cornstarch","peanuts","cheese"})
-
-sel_veggies  = st.sidebar.multiselect("Veggies", veggies, key="veggies")
-sel_proteins = st.sidebar.multiselect("Proteins (meat/egg/tofu)", proteins, key="proteins")
-sel_masalas  = st.sidebar.multiselect("Masalas / Spices", masalas, key="masalas")
-sel_sauces   = st.sidebar.multiselect("Sauces & Condiments", sauces, key="sauces")
-sel_carbs    = st.sidebar.multiselect("Carbs / Base", carbs, key="carbs")
-sel_others   = st.sidebar.multiselect("Others", others, key="others")
+veggies  = PANTRY_OPTIONS["veggies"]
+proteins = PANTRY_OPTIONS["proteins"]
+masalas  = PANTRY_OPTIONS["masalas_spices"]
+sauces   = PANTRY_OPTIONS["sauces_condiments"]
+carbs    = PANTRY_OPTIONS["carbs"]
+others   = PANTRY_OPTIONS["others"]
+
+sel_veggies  = st.sidebar.multiselect("Veggies", veggies, key="veggies", on_change=speculate)
+sel_proteins = st.sidebar.multiselect("Proteins (meat/egg/tofu)", proteins, key="proteins", on_change=speculate)
+sel_masalas  = st.sidebar.multiselect("Masalas / Spices", masalas, key="masalas", on_change=speculate)
+sel_sauces   = st.sidebar.multiselect("Sauces & Condiments", sauces, key="sauces", on_change=speculate)
+sel_carbs    = st.sidebar.multiselect("Carbs / Base", carbs, key="carbs", on_change=speculate)
+sel_others   = st.sidebar.multiselect("Others", others, key="others", on_change=speculate)
+
+pantry_text = st.sidebar.text_area(
+    "…or just type what you have",
+    key="pantry_text",
+    placeholder="2 green onions, some bell peppers, soya sauce",
+    on_change=speculate,
+)
 
 # ---- Defaults & state checks ----
 DEFAULTS = {
     "cuisine_pref": [],
     "diet_pref": "no preference",
     "time_limit": 25,
+    "strict": False,
+    "substitutes": True,
+    "search": "",
     "veggies": [], "proteins": [], "masalas": [], "sauces": [], "carbs": [], "others": [],
+    "pantry_text": "",
 }
 
 def is_all_default() -> bool:
@@ -481,11 +168,18 @@ def is_all_default() -> bool:
         st.session_state.get("cuisine_pref", []) == DEFAULTS["cuisine_pref"]
         and st.session_state.get("diet_pref", DEFAULTS["diet_pref"]) == DEFAULTS["diet_pref"]
         and st.session_state.get("time_limit", DEFAULTS["time_limit"]) == DEFAULTS["time_limit"]
+        and st.session_state.get("strict", DEFAULTS["strict"]) == DEFAULTS["strict"]
+        and st.session_state.get("substitutes", DEFAULTS["substitutes"]) == DEFAULTS["substitutes"]
+        and not st.session_state.get("search", "").strip()
         and all(len(st.session_state.get(k, [])) == 0 for k in ["veggies","proteins","masalas","sauces","carbs","others"])
+        and not st.session_state.get("pantry_text", "").strip()
     )
 
 def has_any_ingredient_selected() -> bool:
-    return any(len(st.session_state.get(k, [])) > 0 for k in ["veggies","proteins","masalas","sauces","carbs","others"])
+    return (
+        any(len(st.session_state.get(k, [])) > 0 for k in ["veggies","proteins","masalas","sauces","carbs","others"])
+        or bool(st.session_state.get("pantry_text", "").strip())
+    )
 
 # If everything is default/blank → both buttons disabled
 disable_both = is_all_default()
@@ -504,6 +198,8 @@ st.sidebar.button(
 )
 
 # ---- Suggest button ----
+live_results = st.sidebar.checkbox("Update results as I pick", key="live_results")
+st.sidebar.checkbox("Precompute while I pick", key="speculate", on_change=speculate)
 run = st.sidebar.button(
     "Suggest Recipes",
     use_container_width=True,
@@ -511,61 +207,49 @@ run = st.sidebar.button(
 )
 
 
-def coverage_score(have: Set[str], need: List[str]) -> float:
-    if not need:
-        return 0.0
-    hits = sum(1 for n in need if norm(n) in have)
-    return hits / len(need)
-
-
-def score_recipe(recipe: Recipe, have_by_cat: Dict[str, Set[str]]) -> float:
-    weights = {
-        "veggies": 0.30,
-        "proteins": 0.30,
-        "masalas_spices": 0.20,
-        "sauces_condiments": 0.10,
-        "carbs": 0.08,
-        "others": 0.02,
-    }
-    s = 0.0
-    for cat, w in weights.items():
-        need = [norm(x) for x in recipe.ingredients.get(cat, [])]
-        have = {norm(x) for x in have_by_cat.get(cat, set())}
-        s += w * coverage_score(have, need)
-
-    if cuisine_pref and recipe.cuisine in cuisine_pref:
-        s += 0.08
-
-    if diet_pref != "no preference" and diet_pref not in recipe.diet:
-        s -= 0.5
-
-    if recipe.time_minutes <= time_limit:
-        s += 0.05
-    else:
-        s -= 0.05
+def first_page():
+    st.session_state["page"] = 0
+
 
-    return s
+def turn_page(delta: int):
+    st.session_state["page"] = max(0, st.session_state.get("page", 0) + delta)
 
 
-def youtube_link(recipe_title: str, cuisine: str) -> str:
-    q = urllib.parse.quote_plus(f"{recipe_title} {cuisine} recipe")
-    return f"https://www.youtube.com/results?search_query={q}"
+page_size = st.sidebar.selectbox("Results per page", PAGE_SIZES, key="page_size", on_change=first_page)
+
+# ---- Debug (opt-in) ----
+st.sidebar.markdown("---")
+show_perf = st.sidebar.checkbox("Show performance panel", key="show_perf")
+# one request only: the rerun after a profiled request unchecks the box
+# (a widget's state can only be set before it is drawn)
+if st.session_state.pop("profiled", False):
+    st.session_state["profile_next"] = False
+profile_next = show_perf and st.sidebar.checkbox("Profile the next request (cProfile)", key="profile_next")
 
 
-def render_recipe(r: Recipe, have_by_cat: Dict[str, Set[str]]):
+def render_recipe(s: Suggestion, similar: List[Suggestion] = ()):
+    r = s.recipe
     st.subheader(f"{r.title} · {r.cuisine} · ~{r.time_minutes} min")
 
-    have_flat = {norm(x) for cat in CATEGORIES for x in have_by_cat.get(cat, set())}
-    need_flat = {norm(x) for cat in CATEGORIES for x in r.ingredients.get(cat, [])}
-    missing = sorted(list(need_flat - have_flat))
-    if missing:
-        st.markdown("**You might be missing:** " + ", ".join(missing))
+    if s.missing:
+        st.markdown(
+            "**You might be missing:** "
+            + ", ".join(f"{x} (your {s.substitutes[x]} could do)" if x in s.substitutes else x for x in s.missing)
+        )
 
     with st.expander("How to make it (steps)", expanded=True):
         for i, step in enumerate(r.steps, 1):
             st.markdown(f"**{i}.** {step}")
 
-    st.markdown(f"[🔗 Related YouTube videos]({youtube_link(r.title, r.cuisine)})")
+    if similar:
+        with st.expander("More like this"):
+            for m in similar:
+                st.markdown(
+                    f"**{m.recipe.title}** · {m.recipe.cuisine} · ~{m.recipe.time_minutes} min"
+                    f" ({m.score:.0%} same ingredients)"
+                )
+
+    st.markdown(f"[🔗 Related YouTube videos]({s.youtube})")
 
 
 col1, col2 = st.columns([1, 2])
@@ -581,31 +265,99 @@ with col1:
             "others": sel_others,
         }
     )
+    if pantry_text.strip():
+        found = engine.pantry_parser().extract(pantry_text)
+        st.markdown("**Recognized from your text:** " + (", ".join(found) if found else "nothing yet"))
+
+    if has_any_ingredient_selected() and st.checkbox("What should I buy next?", key="show_unlock"):
+        catalog = engine.catalog()
+        have_now, prefs_now = current_query()
+        unlocks = engine.unlock(have_now, prefs_now, UNLOCK_SIZE, limit=UNLOCK_LIMIT, catalog=catalog)
+        if not unlocks:
+            st.caption("Nothing small would open up new recipes.")
+        for u in unlocks:
+            d = u.to_dict(catalog.index)
+            st.markdown(
+                f"**+ {' + '.join(d['ingredients'])}** → {d['recipes']} more recipe{'s' if d['recipes'] != 1 else ''}"
+                f" ({', '.join(d['examples'])})"
+            )
+
+    if st.checkbox("Plan my week", key="show_plan"):
+        days = st.select_slider("Meals", list(PLAN_DAYS), value=7, key="plan_days")
+        have_now, prefs_now = current_query()
+        plan = engine.plan(have_now, prefs_now, days)
+        if not plan.meals:
+            st.caption("No recipes fit your cuisine, diet and time choices.")
+        for day, s in enumerate(plan.meals, 1):
+            r = s.recipe
+            st.markdown(f"**{day}.** {r.title} · {r.cuisine} · ~{r.time_minutes} min")
+            if s.missing:
+                st.caption("You might be missing: " + ", ".join(s.missing))
+        if plan.shopping:
+            st.markdown(
+                "**Shopping list:** " + ", ".join(x if n == 1 else f"{x} (×{n})" for x, n in plan.shopping)
+            )
+        elif plan.meals:
+            st.caption("Nothing to buy: your pantry covers every meal.")
 
 with col2:
-    if run:
-        have = {
-            "veggies": set(map(norm, sel_veggies)),
-            "proteins": set(map(norm, sel_proteins)),
-            "masalas_spices": set(map(norm, sel_masalas)),
-            "sauces_condiments": set(map(norm, sel_sauces)),
-            "carbs": set(map(norm, sel_carbs)),
-            "others": set(map(norm, sel_others)),
-        }
-
-        ranked = sorted(
-            RECIPES,
-            key=lambda r: score_recipe(r, have),
-            reverse=True,
-        )
-        top = [r for r in ranked if score_recipe(r, have) > 0]
-
-        if not top:
-            st.info("No strong matches yet — try adding basics like salt/oil or a protein/carb.")
-        else:
-            st.markdown("### Best Matches")
-            for r in top[:3]:
-                render_recipe(r, have)
+    have, prefs = current_query()
+    live = live_results and has_any_ingredient_selected()
+
+    # Results stay with the session while the inputs that produced them do,
+    # so paging only describes the next page; any input change drops them.
+    query = pantry_fingerprint(normalize_pantry(have), prefs)
+    if st.session_state.get("results_query") != query:
+        st.session_state.pop("results", None)
+        st.session_state["results_query"] = query
+        st.session_state["page"] = 0
+
+    trace = RequestTrace(profiler=cProfile.Profile() if profile_next else None)
+    if live and not prefs.search:
+        # the session's ranker only re-scores what changed since the last rerun
+        ranker = engine.live_ranker(st.session_state.get("live_ranker"), prefs, page_size)
+        st.session_state["live_ranker"] = ranker
+        results = engine.live_results(ranker, have, trace=trace)
+    elif live or run:
+        # the incremental ranker scores ingredients only, so live results
+        # for a search are ranked in full on every change
+        results = st.session_state["results"] = engine.results(have, prefs, trace=trace)
+        if run:
+            st.session_state["page"] = 0
+    else:
+        results = st.session_state.get("results")
+        if results is not None and results.version != engine.catalog().version:
+            # ranked against a catalog since reloaded: rank again rather than
+            # page through the old one
+            results = st.session_state["results"] = engine.results(have, prefs, trace=trace)
+            st.session_state["page"] = 0
+
+    if results is not None:
+        page = st.session_state.get("page", 0)
+        top = results.page(page, page_size, trace)
+        with trace.stage("render"):
+            if not top:
+                st.info("No strong matches yet — try adding basics like salt/oil or a protein/carb.")
+            else:
+                st.markdown("### Best Matches")
+                # ids from results of an older catalog would point elsewhere
+                catalog = engine.catalog()
+                current = results.version == catalog.version
+                for s in top:
+                    render_recipe(s, engine.similar(s.rid, have, prefs, SIMILAR_K, catalog=catalog) if current else ())
+                if page or results.has_next(page, page_size):
+                    prev_col, at_col, next_col = st.columns([1, 2, 1])
+                    prev_col.button("← Previous", on_click=turn_page, args=(-1,), disabled=page == 0)
+                    pages = results.page_count(page_size)
+                    at_col.caption(f"Page {page + 1}" + (f" of {pages}" if pages else ""))
+                    next_col.button("Next →", on_click=turn_page, args=(1,), disabled=not results.has_next(page, page_size))
+        # reruns that only re-render stored results (no ranking fetched) are
+        # not rank requests and would skew the percentiles
+        if "fetched" in trace.counters:
+            st.session_state["last_trace"] = engine.perf.record(trace)
+            if trace.profiler is not None:
+                st.session_state["last_profile"] = profile_report(trace.profiler)
+                st.session_state["profiled"] = True
     else:
         st.markdown(
             "> Use the sidebar to select ingredients and click **Suggest Recipes**."
@@ -613,3 +365,21 @@ with col2:
 
 st.markdown("---")
 
+# Percentiles are over recent requests from every session in this process
+if show_perf:
+    with st.sidebar.expander("Performance", expanded=True):
+        rows = engine.perf.summary()
+        if rows:
+            st.table(rows)
+            st.caption("Counters over the same window")
+            st.json(engine.perf.counter_totals())
+        else:
+            st.caption("No requests recorded yet.")
+        if "last_trace" in st.session_state:
+            st.caption("Your last request")
+            st.json(st.session_state["last_trace"])
+        if "last_profile" in st.session_state:
+            st.caption("Profile of your last profiled request")
+            st.code(st.session_state["last_profile"], language="text")
+        st.caption("Speculative ranking")
+        st.json(vars(get_speculator().stats))
@@ -0,0 +1,132 @@
+# Offline batch ranking: reads pantry queries as JSONL, ranks each against
+# the catalog and writes one JSON result per line, in input order.
+#
+#     python batch.py pantries.jsonl [-o results.jsonl] [--catalog recipes.jsonl] [-j 8]
+#
+# Each input line is a query object as accepted by engine.query_from_dict,
+# optionally with an "id" that is echoed back:
+#     {"id": "u1", "pantry": {"veggies": ["onion"]}, "diet": "veg", "k": 5}
+# Output lines carry either "results" (Suggestion.to_dict() each) or "error".
+#
+# Work is spread over a process pool. The parent opens the catalog (and, with
+# NumPy installed, builds the matrix scorer) before forking, so workers inherit
+# it read-only; with a snapshot the records themselves stay in the shared,
+# mmapped page cache. Workers also parse and serialize their own lines, so the
+# parent only moves text around.
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from catalog import CATALOG_PATH, CatalogStore
+from engine import Engine, query_from_dict
+from result_cache import ResultCache
+
+DEFAULT_CHUNKSIZE = 64
+
+logger = logging.getLogger("recipe_bot.batch")
+
+_engine: Optional[Engine] = None
+
+
+def make_engine(catalog_path: str) -> Engine:
+    # a batch run ranks against one catalog from start to finish
+    engine = Engine(CatalogStore(catalog_path, check_interval=float("inf")), ResultCache(max_entries=4096, ttl=float("inf")))
+    engine.warm()
+    return engine
+
+
+def _init_worker(catalog_path: str):
+    global _engine
+    if _engine is None:  # not inherited (spawn/forkserver start methods)
+        _engine = make_engine(catalog_path)
+
+
+def rank_line(line: str, k: int = 3) -> Optional[str]:
+    line = line.strip()
+    if not line:
+        return None
+    qid = None
+    try:
+        d = json.loads(line)
+        if isinstance(d, dict):
+            qid = d.get("id")
+        pantry, prefs, n = query_from_dict(d, default_k=k, parse_text=_engine.parse_pantry)
+        results = [s.to_dict() for s in _engine.rank(pantry, prefs, n)]
+    except ValueError as e:
+        return json.dumps({"id": qid, "error": str(e)})
+    except Exception as e:  # a failing line must not abort the rest of the run
+        logger.exception("ranking failed")
+        return json.dumps({"id": qid, "error": f"internal error: {e}"})
+    return json.dumps({"id": qid, "results": results}, ensure_ascii=False)
+
+
+def _rank_line_k(args):
+    return rank_line(*args)
+
+
+def run_batch(
+    lines: Iterable[str],
+    out: TextIO,
+    catalog_path: str = CATALOG_PATH,
+    workers: int = 0,
+    k: int = 3,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> int:
+    # Returns the number of result lines written. workers=0 means one per core;
+    # workers=1 ranks in this process without a pool.
+    global _engine
+    workers = workers or os.cpu_count() or 1
+    _engine = make_engine(catalog_path)
+    jobs = ((line, k) for line in lines)
+    written = 0
+    if workers == 1:
+        results: Iterator[Optional[str]] = map(_rank_line_k, jobs)
+        written = _write(results, out)
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(catalog_path,)) as pool:
+            # imap streams: input is read lazily and results come back in order
+            written = _write(pool.imap(_rank_line_k, jobs, chunksize), out)
+    return written
+
+
+def _write(results: Iterable[Optional[str]], out: TextIO) -> int:
+    n = 0
+    for line in results:
+        if line is not None:
+            out.write(line)
+            out.write("\n")
+            n += 1
+    out.flush()
+    return n
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rank recipes for a JSONL file of pantries.")
+    parser.add_argument("input", nargs="?", default="-", help="pantry queries, one JSON object per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="where to write results (default: stdout)")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("-j", "--workers", type=int, default=0, help="worker processes (default: one per core)")
+    parser.add_argument("-k", type=int, default=3, help="suggestions per query unless the query sets k")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        n = run_batch(src, dst, args.catalog, args.workers, args.k, args.chunksize)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"ranked {n} pantries", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# Benchmarks for the recommender on synthetic catalogs.
+#
+#     python bench.py [--sizes 1000,10000,100000] [--queries 200] [-o bench.json] [--compare old.json]
+#
+# For every catalog size this generates a catalog with the shape of the real
+# one (per-category ingredient counts, Zipf-like ingredient popularity,
+# cuisines, diets, cooking times), writes it as JSONL and measures:
+#   - load/index build time and the resident memory it adds
+#   - snapshot compile time, file size and open time
+#   - Streamlit-free startup: a fresh interpreter opening the catalog through
+#     the engine, with and without a snapshot on disk
+#   - per-query ranking latency (p50/p90/p99) for each ranking strategy,
+#     including the original score-everything-then-sort path
+# and checks that all strategies return the same top k.
+#
+# The report is one JSON document; --compare prints p50 ratios against an
+# earlier report and --max-regression turns them into a failing exit code.
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from catalog import CATEGORIES, CUISINE_OPTIONS, DIETS, PANTRY_OPTIONS, IngredientIndex, Recipe, load_catalog, iter_recipes
+from engine import Engine
+from ranking import Prefs, rank_recipes, score_recipe, top_k
+from result_cache import ResultCache
+
+# Ingredients per category, as (count, weight) -- the mix found in data/recipes.jsonl
+SIZE_DIST = {
+    "veggies": [(0, 1), (2, 2), (3, 10), (4, 4), (5, 2), (6, 1)],
+    "proteins": [(0, 6), (1, 13), (2, 1)],
+    "masalas_spices": [(2, 8), (3, 3), (4, 3), (5, 3), (6, 3)],
+    "sauces_condiments": [(0, 7), (1, 4), (2, 6), (3, 1), (4, 2)],
+    "carbs": [(0, 2), (1, 15), (2, 3)],
+    "others": [(1, 14), (2, 5), (3, 1)],
+}
+# Distinct ingredients per category: the sidebar options plus a long tail
+VOCAB_SIZES = {"veggies": 300, "proteins": 80, "masalas_spices": 150, "sauces_condiments": 120, "carbs": 80, "others": 100}
+DIET_SETS = [
+    ({"vegan", "veg", "omnivore"}, 7),
+    ({"omnivore"}, 5),
+    ({"veg", "omnivore"}, 4),
+    ({"egg-veg", "omnivore"}, 3),
+    ({"egg-veg", "veg", "omnivore"}, 1),
+]
+TIMES = [10, 12, 14, 15, 18, 20, 25, 30, 40, 45, 60]
+ZIPF_S = 1.0
+
+STRATEGIES = ["sort_filter", "index", "top_k", "matrix", "engine"]
+
+
+# ---- Generators ----
+def synthetic_vocabulary() -> Dict[str, List[str]]:
+    # most popular first: the real sidebar options, then numbered tail items
+    vocab = {}
+    for cat in CATEGORIES:
+        names = list(PANTRY_OPTIONS.get(cat, []))
+        names += [f"{cat.split('_')[0]} {i}" for i in range(VOCAB_SIZES[cat] - len(names))]
+        vocab[cat] = names
+    return vocab
+
+
+def _cum(weights: List[float]) -> List[float]:
+    out, total = [], 0.0
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def _zipf_cum(n: int) -> List[float]:
+    return _cum([1.0 / (i + 1) ** ZIPF_S for i in range(n)])
+
+
+def _sample_distinct(rng: random.Random, names: List[str], cum: List[float], count: int) -> List[str]:
+    count = min(count, len(names))
+    picked: Dict[str, None] = {}
+    while len(picked) < count:
+        for x in rng.choices(names, cum_weights=cum, k=count - len(picked)):
+            picked[x] = None
+    return list(picked)
+
+
+def synthetic_recipes(n: int, seed: int = 0) -> Iterator[Recipe]:
+    rng = random.Random(seed)
+    vocab = synthetic_vocabulary()
+    vocab_cum = {cat: _zipf_cum(len(names)) for cat, names in vocab.items()}
+    size_choices = {cat: ([c for c, _ in d], _cum([w for _, w in d])) for cat, d in SIZE_DIST.items()}
+    diet_sets, diet_cum = [d for d, _ in DIET_SETS], _cum([w for _, w in DIET_SETS])
+    for i in range(n):
+        ingredients = {}
+        for cat in CATEGORIES:
+            counts, cum = size_choices[cat]
+            count = rng.choices(counts, cum_weights=cum)[0]
+            ingredients[cat] = _sample_distinct(rng, vocab[cat], vocab_cum[cat], count)
+        cuisine = rng.choice(CUISINE_OPTIONS)
+        yield Recipe(
+            title=f"{cuisine} dish {i}",
+            cuisine=cuisine,
+            ingredients=ingredients,
+            time_minutes=rng.choice(TIMES),
+            diet=set(rng.choices(diet_sets, cum_weights=diet_cum)[0]),
+            steps=[f"Step {j + 1}." for j in range(rng.randint(2, 3))],
+        )
+
+
+def random_pantries(n: int, seed: int = 1) -> List[Tuple[Dict[str, Set[str]], Prefs]]:
+    # pantries lean towards popular ingredients, like real kitchens
+    rng = random.Random(seed)
+    vocab = synthetic_vocabulary()
+    vocab_cum = {cat: _zipf_cum(len(names)) for cat, names in vocab.items()}
+    out = []
+    for _ in range(n):
+        have = {cat: set(_sample_distinct(rng, vocab[cat], vocab_cum[cat], rng.randint(0, 6))) for cat in CATEGORIES}
+        prefs = Prefs(
+            cuisine=tuple(rng.sample(CUISINE_OPTIONS, rng.randint(0, 2))),
+            diet=rng.choice(["no preference"] * 3 + sorted(DIETS)),
+            time_limit=rng.choice([10, 15, 25, 40, 60]),
+        )
+        out.append((have, prefs))
+    return out
+
+
+def write_catalog(recipes: Iterator[Recipe], path: str) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for r in recipes:
+            row = {
+                "title": r.title,
+                "cuisine": r.cuisine,
+                "ingredients": r.ingredients,
+                "time_minutes": r.time_minutes,
+                "diet": sorted(r.diet),
+                "steps": r.steps,
+            }
+            f.write(json.dumps(row))
+            f.write("\n")
+            n += 1
+    return n
+
+
+# ---- Measurements ----
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+
+    def pick(p: float) -> float:
+        return s[min(len(s) - 1, int(p / 100 * len(s)))] * 1000
+
+    return {
+        "p50_ms": pick(50),
+        "p90_ms": pick(90),
+        "p99_ms": pick(99),
+        "mean_ms": sum(s) / len(s) * 1000,
+        "max_ms": s[-1] * 1000,
+    }
+
+
+def measure_startup(catalog_path: str) -> Dict[str, Any]:
+    # a fresh interpreter, as a worker or the service would start
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "from catalog import CatalogStore\n"
+        "from engine import Engine\n"
+        f"e = Engine(CatalogStore({catalog_path!r}))\n"
+        "e.warm()\n"
+        "print(time.perf_counter() - t, 'streamlit' in sys.modules)\n"
+    )
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return {"wall_s": time.perf_counter() - start, "open_s": float(out[0]), "imports_streamlit": out[1] == "True"}
+
+
+def strategy_runners(
+    index: IngredientIndex, recipes: Optional[List[Recipe]], k: int, names: List[str]
+) -> Tuple[Dict[str, Callable], Dict[str, float]]:
+    # query functions per strategy, plus any one-off setup time they need
+    runners: Dict[str, Callable] = {}
+    setup: Dict[str, float] = {}
+    if recipes is not None:
+        def sort_filter(have, prefs):
+            # what the page did originally: score everything, filter, sort
+            scored = [(rid, score_recipe(r, have, prefs)) for rid, r in enumerate(recipes)]
+            scored = [t for t in scored if t[1] > 0]
+            scored.sort(key=lambda t: t[1], reverse=True)
+            return scored[:k]
+        runners["sort_filter"] = sort_filter
+    runners["index"] = lambda have, prefs: rank_recipes(index, have, prefs)[:k]
+    runners["top_k"] = lambda have, prefs: top_k(index, have, k, prefs)[0]
+    if "matrix" in names:
+        try:
+            from vector_scoring import MatrixScorer
+        except ImportError:
+            pass
+        else:
+            t = time.perf_counter()
+            scorer = MatrixScorer(index)
+            setup["matrix"] = time.perf_counter() - t
+            runners["matrix"] = lambda have, prefs: scorer.rank(have, prefs, k=k)
+    return runners, setup
+
+
+def time_queries(fn: Callable, queries, budget: float) -> Tuple[List[float], List[Any]]:
+    samples, results = [], []
+    fn(*queries[0])  # warm-up
+    spent = 0.0
+    for have, prefs in queries:
+        t = time.perf_counter()
+        results.append(fn(have, prefs))
+        dt = time.perf_counter() - t
+        samples.append(dt)
+        spent += dt
+        if spent > budget:
+            break
+    return samples, results
+
+
+def bench_size(n: int, args, workdir: str) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"recipes": n}
+    path = os.path.join(workdir, f"synthetic_{n}.jsonl")
+    t = time.perf_counter()
+    write_catalog(synthetic_recipes(n, args.seed), path)
+    out["generate_s"] = time.perf_counter() - t
+    out["catalog_bytes"] = os.path.getsize(path)
+
+    gc.collect()
+    before = rss_bytes()
+    t = time.perf_counter()
+    index = load_catalog(path)
+    out["build_s"] = time.perf_counter() - t
+    gc.collect()
+    after = rss_bytes()
+    out["index_rss_bytes"] = after - before if before is not None and after is not None else None
+    out["vocabulary"] = len(index.vocab)
+
+    from snapshot import open_snapshot, snapshot_path_for, source_digest, write_snapshot
+    snap = snapshot_path_for(path)
+    out["startup_cold"] = measure_startup(path)  # parses and compiles the snapshot
+    digest = source_digest(path)
+    t = time.perf_counter()
+    write_snapshot(index, snap, digest)
+    out["snapshot_write_s"] = time.perf_counter() - t
+    out["snapshot_bytes"] = os.path.getsize(snap)
+    t = time.perf_counter()
+    open_snapshot(snap, digest)
+    out["snapshot_open_s"] = time.perf_counter() - t
+    out["startup_warm"] = measure_startup(path)
+
+    recipes = list(iter_recipes(path)) if n <= args.sort_filter_max else None
+    queries = random_pantries(args.queries, args.seed + 1)
+    runners, setup = strategy_runners(index, recipes, args.k, args.strategies)
+    if "engine" in args.strategies:
+        from catalog import CatalogStore
+        # no result cache: every query pays for ranking, missing lists and links
+        engine = Engine(CatalogStore(path, check_interval=float("inf")), ResultCache(max_entries=0))
+        t = time.perf_counter()
+        engine.warm()
+        setup["engine"] = time.perf_counter() - t
+        runners["engine"] = lambda have, prefs: engine.rank(have, prefs, args.k)
+
+    strategies: Dict[str, Any] = {}
+    reference: Optional[List[Any]] = None
+    for name in args.strategies:
+        if name not in runners:
+            strategies[name] = {"skipped": True}
+            continue
+        samples, results = time_queries(runners[name], queries, args.budget)
+        entry: Dict[str, Any] = {"queries": len(samples)}
+        if name in setup:
+            entry["setup_s"] = setup[name]
+        entry.update(percentiles(samples))
+        if name != "engine":
+            results = [list(r) for r in results]
+            if reference is None:
+                reference = results
+            else:
+                m = min(len(reference), len(results))
+                entry["mismatches"] = sum(1 for a, b in zip(reference[:m], results[:m]) if a != b)
+        strategies[name] = entry
+        print(f"  {n:>9} {name:<12} p50 {entry['p50_ms']:9.3f} ms  p99 {entry['p99_ms']:9.3f} ms  ({len(samples)} queries)",
+              file=sys.stderr)
+    out["strategies"] = strategies
+    os.remove(snap)
+    os.remove(path)
+    return out
+
+
+def compare(report: Dict[str, Any], old: Dict[str, Any]) -> float:
+    # prints p50 ratios (new/old) per size and strategy; returns the worst one
+    prev = {r["recipes"]: r for r in old.get("results", [])}
+    worst = 0.0
+    for r in report["results"]:
+        o = prev.get(r["recipes"])
+        if o is None:
+            continue
+        for name, entry in r["strategies"].items():
+            oe = o["strategies"].get(name)
+            if not oe or "p50_ms" not in oe or "p50_ms" not in entry or not oe["p50_ms"]:
+                continue
+            ratio = entry["p50_ms"] / oe["p50_ms"]
+            worst = max(worst, ratio)
+            print(f"  {r['recipes']:>9} {name:<12} p50 {oe['p50_ms']:9.3f} -> {entry['p50_ms']:9.3f} ms  x{ratio:.2f}",
+                  file=sys.stderr)
+    return worst
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark ranking on synthetic recipe catalogs.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated catalog sizes")
+    parser.add_argument("--queries", type=int, default=200, help="random pantries per size")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--budget", type=float, default=20.0, help="max seconds of queries per strategy and size")
+    parser.add_argument("--sort-filter-max", type=int, default=100000,
+                        help="largest catalog to run the sort-and-filter baseline on (it keeps every Recipe in memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="-", help="where to write the JSON report (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON report to compare p50 latencies against")
+    parser.add_argument("--max-regression", type=float, help="exit with status 1 if any p50 grew by more than this factor")
+    args = parser.parse_args(argv)
+    args.strategies = [s for s in args.strategies.split(",") if s]
+    unknown = set(args.strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "queries": args.queries,
+            "k": args.k,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="recipe-bench-") as workdir:
+        for n in (int(x) for x in args.sizes.split(",")):
+            report["results"].append(bench_size(n, args, workdir))
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            worst = compare(report, json.load(f))
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"p50 regression x{worst:.2f} exceeds x{args.max_regression:.2f}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+import csv
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Dict, Set, FrozenSet, Iterable, Iterator, Optional, Sequence, TextIO, Tuple
+
+@dataclass
+class Recipe:
+    title: str
+    cuisine: str
+    ingredients: Dict[str, List[str]]  # by category
+    time_minutes: int
+    diet: Set[str]  # {"veg", "egg-veg", "vegan", "omnivore"}
+    steps: List[str]
+
+CATEGORIES = [
+    "veggies",
+    "proteins",
+    "masalas_spices",
+    "sauces_condiments",
+    "carbs",
+    "others",
+]
+
+# Coverage weight of each category in the recipe score
+WEIGHTS = {
+    "veggies": 0.30,
+    "proteins": 0.30,
+    "masalas_spices": 0.20,
+    "sauces_condiments": 0.10,
+    "carbs": 0.08,
+    "others": 0.02,
+}
+
+# Normalization helpers
+synonyms = {
+    "scallion": "spring onion",
+    "green onion": "spring onion",
+    "chili": "chilli",
+    "chilies": "chilli",
+    "chilies green": "chilli",
+    "soy sauce": "light soy sauce",
+    "soya sauce": "light soy sauce",
+    "paneer cheese": "paneer",
+    "bell pepper": "capsicum",
+    "fenugreek leaves": "kasuri methi",
+    "cilantro leaves": "cilantro",
+    "lemon juice": "lemon",
+}
+
+def norm(x: str) -> str:
+    x = x.strip().lower()
+    return synonyms.get(x, x)
+
+# ---- Substitutions (partial credit) ----
+# recipe ingredient -> pantry ingredients that can stand in for it, with the
+# share of a match they earn. Credit only counts within a category, and
+# chains compound (olive oil for butter for ghee), down to MIN_CREDIT.
+substitutes = {
+    "ghee": {"butter": 0.75, "oil": 0.5},
+    "butter": {"ghee": 0.75, "olive oil": 0.5, "oil": 0.5},
+    "oil": {"olive oil": 0.875, "ghee": 0.5},
+    "olive oil": {"oil": 0.75},
+    "lime": {"lemon": 0.75},
+    "lemon": {"lime": 0.75, "vinegar": 0.25},
+    "cheese": {"cheddar": 0.875, "parmesan": 0.5},
+    "cheddar": {"cheese": 0.75},
+    "parmesan": {"cheese": 0.5},
+    "cream": {"milk": 0.5},
+    "onion": {"red onion": 0.875, "spring onion": 0.5},
+    "red onion": {"onion": 0.875},
+    "spring onion": {"onion": 0.5},
+    "cilantro": {"parsley": 0.5},
+    "parsley": {"cilantro": 0.5},
+    "black pepper": {"white pepper": 0.75},
+    "white pepper": {"black pepper": 0.75},
+    "chilli powder": {"paprika": 0.5},
+    "paprika": {"chilli powder": 0.5},
+    "paneer": {"tofu": 0.5},
+    "tofu": {"paneer": 0.5},
+    "chickpeas": {"beans": 0.5},
+    "beans": {"chickpeas": 0.5},
+    "pasta": {"spaghetti": 0.875, "penne": 0.875},
+    "spaghetti": {"pasta": 0.875, "penne": 0.75},
+    "penne": {"pasta": 0.875, "spaghetti": 0.75},
+    "naan": {"roti": 0.75, "pita": 0.5},
+    "roti": {"naan": 0.75, "tortilla": 0.5},
+    "pita": {"naan": 0.5, "tortilla": 0.5},
+    "tortilla": {"roti": 0.5, "pita": 0.5},
+}
+
+MIN_CREDIT = 0.25
+# Credits are rounded down to multiples of this, so sums of them are exact
+# in floating point and every scoring path adds them up to the same value
+CREDIT_STEP = 1 / 64
+
+
+def substitute_closure(graph: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    # pantry ingredient -> {recipe ingredient: best credit over any chain};
+    # credits only shrink along a chain, so a best-first walk settles each
+    # ingredient the first time it is popped
+    out: Dict[str, Dict[str, float]] = {}
+    edges: Dict[str, Dict[str, float]] = {}
+    for need, subs in graph.items():
+        for sub, credit in subs.items():
+            edges.setdefault(norm(need), {})[norm(sub)] = credit
+    for need in edges:
+        best: Dict[str, float] = {}
+        heap = [(-1.0, need)]
+        while heap:
+            neg, x = heapq.heappop(heap)
+            if x in best:
+                continue
+            if x != need:
+                best[x] = -neg
+            for sub, credit in edges.get(x, {}).items():
+                c = -neg * credit
+                if c >= MIN_CREDIT and sub != need and sub not in best:
+                    heapq.heappush(heap, (-c, sub))
+        for sub, c in best.items():
+            c = c // CREDIT_STEP * CREDIT_STEP
+            if c >= MIN_CREDIT:
+                out.setdefault(sub, {})[need] = c
+    return out
+
+
+class Substitutions:
+    # The closure as a lookup keyed by what the pantry has, so a query only
+    # looks up its own ingredients and never walks the graph
+    def __init__(self, graph: Dict[str, Dict[str, float]]):
+        self.stands_for = substitute_closure(graph)
+
+    def credits_for(self, have: Iterable[str]) -> Dict[str, float]:
+        # recipe ingredient -> best credit one category's pantry earns for
+        # it, for ingredients the pantry does not have itself
+        have = {norm(x) for x in have}
+        out: Dict[str, float] = {}
+        for sub in have:
+            for x, c in self.stands_for.get(sub, {}).items():
+                if c > out.get(x, 0.0) and x not in have:
+                    out[x] = c
+        return out
+
+    def credits(self, have_by_cat: Dict[str, Set[str]]) -> List[Tuple[int, str, float]]:
+        # (category index, recipe ingredient, credit), sorted
+        return [
+            (ci, x, c)
+            for ci, cat in enumerate(CATEGORIES)
+            for x, c in sorted(self.credits_for(have_by_cat.get(cat, ())).items())
+        ]
+
+    def stand_in(self, x: str, have: Iterable[str]) -> Optional[str]:
+        # the pantry ingredient earning the most credit for x (first by name on ties)
+        best, best_credit = None, 0.0
+        for sub in sorted(norm(h) for h in have):
+            c = self.stands_for.get(sub, {}).get(x, 0.0)
+            if c > best_credit:
+                best, best_credit = sub, c
+        return best
+
+
+SUBSTITUTIONS = Substitutions(substitutes)
+
+# ---- Compact representation (interned ingredient ids + bitsets) ----
+def bit_ids(mask: int) -> List[int]:
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+class Vocabulary:
+    __slots__ = ("ids", "names")
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for x in names:
+            self.intern(x)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, x: str) -> int:
+        x = norm(x)
+        i = self.ids.get(x)
+        if i is None:
+            i = self.ids[x] = len(self.names)
+            self.names.append(x)
+        return i
+
+    def mask(self, items: Iterable[str]) -> int:
+        # unknown ingredients cannot match any recipe, so they are just dropped
+        m = 0
+        for x in items:
+            i = self.ids.get(norm(x))
+            if i is not None:
+                m |= 1 << i
+        return m
+
+    def decode(self, mask: int) -> List[str]:
+        return [self.names[i] for i in bit_ids(mask)]
+
+
+def id_layers(ids: Iterable[int]) -> Tuple[int, Tuple[int, ...]]:
+    # first-occurrence mask plus one mask per further repeat, so hit counts
+    # still match coverage_score for ingredients listed more than once
+    layers = [0]
+    for i in ids:
+        bit = 1 << i
+        depth = 0
+        while layers[depth] & bit:
+            depth += 1
+            if depth == len(layers):
+                layers.append(0)
+        layers[depth] |= bit
+    return layers[0], tuple(layers[1:])
+
+
+class CompactRecipe:
+    __slots__ = ("title", "cuisine", "time_minutes", "diet", "steps", "masks", "repeats", "sizes", "need")
+
+    def __init__(
+        self,
+        title: str,
+        cuisine: str,
+        time_minutes: int,
+        diet: FrozenSet[str],
+        steps: Tuple[str, ...],
+        masks: Tuple[int, ...],
+        repeats: Optional[Tuple[Tuple[int, ...], ...]],
+        sizes: Tuple[int, ...],
+    ):
+        self.title = title
+        self.cuisine = cuisine
+        self.time_minutes = time_minutes
+        self.diet = diet
+        self.steps = steps
+        self.masks = masks
+        self.repeats = repeats
+        self.sizes = sizes
+        self.need = 0
+        for m in masks:
+            self.need |= m
+
+    @classmethod
+    def from_recipe(cls, recipe: Recipe, vocab: Vocabulary, diets: Dict[FrozenSet[str], FrozenSet[str]]) -> "CompactRecipe":
+        masks, repeats = [], []
+        for cat in CATEGORIES:
+            mask, extra = id_layers(vocab.intern(x) for x in recipe.ingredients.get(cat, []))
+            masks.append(mask)
+            repeats.append(extra)
+        diet = frozenset(recipe.diet)
+        return cls(
+            title=recipe.title,
+            cuisine=sys.intern(recipe.cuisine),
+            time_minutes=recipe.time_minutes,
+            diet=diets.setdefault(diet, diet),
+            steps=tuple(recipe.steps),
+            masks=tuple(masks),
+            repeats=tuple(repeats) if any(repeats) else None,
+            sizes=tuple(len(recipe.ingredients.get(cat, [])) for cat in CATEGORIES),
+        )
+
+    def ingredient_ids(self, ci: int) -> List[int]:
+        # ids of category ci, repeated as often as the recipe lists them
+        ids = bit_ids(self.masks[ci])
+        if self.repeats:
+            for m in self.repeats[ci]:
+                ids.extend(bit_ids(m))
+        return ids
+
+    def hits(self, have_masks: Sequence[int]) -> List[int]:
+        h = [(m & have).bit_count() for m, have in zip(self.masks, have_masks)]
+        if self.repeats:
+            for ci, layers in enumerate(self.repeats):
+                h[ci] += sum((m & have_masks[ci]).bit_count() for m in layers)
+        return h
+
+    def missing(self, have_all: int) -> int:
+        return self.need & ~have_all
+
+
+def pantry_masks(vocab: Vocabulary, have_by_cat: Dict[str, Set[str]]) -> List[int]:
+    return [vocab.mask(have_by_cat.get(cat, set())) for cat in CATEGORIES]
+
+
+# ---- Ingredient index ----
+# Sequences are lists when built in memory and zero-copy array views when
+# opened from a compiled snapshot (see snapshot.py).
+@dataclass
+class IngredientIndex:
+    vocab: Vocabulary
+    records: Sequence[CompactRecipe]  # recipe id -> compact record
+    postings: Dict[str, Dict[str, Sequence[int]]]  # category -> normalized ingredient -> recipe ids
+    bounds: Dict[str, Dict[str, float]]  # category -> ingredient -> max weighted coverage it adds to any recipe
+    peaks: Sequence[float]  # recipe id -> most weighted coverage a single ingredient hit can add
+    groups: Dict[Tuple[str, FrozenSet[str], int], Sequence[int]]  # (cuisine, diet, time) -> recipe ids
+
+
+class IndexBuilder:
+    # Grows an IngredientIndex one recipe at a time, so a catalog can be
+    # indexed while it is streamed in and the Recipe objects dropped.
+    def __init__(self):
+        self.index = IngredientIndex(
+            vocab=Vocabulary(),
+            records=[],
+            postings={cat: {} for cat in CATEGORIES},
+            bounds={cat: {} for cat in CATEGORIES},
+            peaks=[],
+            groups={},
+        )
+        self.diets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+
+    def add(self, r: Recipe) -> int:
+        index = self.index
+        rid = len(index.records)
+        # ids in first-seen order; common ingredients show up early, so they
+        # sit in the low bits and most masks stay one or two machine words
+        rec = CompactRecipe.from_recipe(r, index.vocab, self.diets)
+        index.records.append(rec)
+        for cat in CATEGORIES:
+            need = r.ingredients.get(cat, [])
+            postings, bounds = index.postings[cat], index.bounds[cat]
+            counts: Dict[str, int] = {}
+            # one entry per occurrence so hit counts match coverage_score;
+            # keys are the vocabulary's own strings so they are shared
+            for x in need:
+                x = index.vocab.names[index.vocab.ids[norm(x)]]
+                postings.setdefault(x, []).append(rid)
+                counts[x] = counts.get(x, 0) + 1
+            for x, c in counts.items():
+                bounds[x] = max(bounds.get(x, 0.0), WEIGHTS[cat] * c / len(need))
+        index.peaks.append(max((WEIGHTS[cat] / n for cat, n in zip(CATEGORIES, rec.sizes) if n), default=0.0))
+        index.groups.setdefault((rec.cuisine, rec.diet, rec.time_minutes), []).append(rid)
+        return rid
+
+
+def build_index(recipes: Iterable[Recipe]) -> IngredientIndex:
+    builder = IndexBuilder()
+    for r in recipes:
+        builder.add(r)
+    return builder.index
+
+
+# ---- Sidebar pantry choices (sorted once per process) ----
+CUISINE_OPTIONS = ["Indian", "Chinese", "Italian", "American", "American/Mex-Tex", "Mexican", "Mediterranean"]
+
+PANTRY_OPTIONS = {
+    "veggies": sorted({
+        "onion","red onion","spring onion","garlic","ginger","green chilli","chilli flakes",
+        "tomato","bell pepper","capsicum","carrot","peas","corn","mushroom",
+        "broccoli","cauliflower","spinach","lettuce","cucumber","potato","cilantro",
+        "parsley","basil"
+    }),
+    "proteins": sorted({"egg","paneer","tofu","chickpeas","lentils","beans","chicken","shrimp","minced beef"}),
+    "masalas_spices": sorted({"cumin","coriander","turmeric","garam masala","kasuri methi","mustard seeds",
+                              "asafoetida","curry leaves","chilli powder","paprika","black pepper","white pepper","salt"}),
+    "sauces_condiments": sorted({"light soy sauce","oyster sauce","sesame oil","tomato paste","salsa",
+                                 "ketchup","mustard","vinegar","lime","lemon","tahini","cream","parmesan"}),
+    "carbs": sorted({"rice","pasta","spaghetti","penne","pita","naan","tortilla"}),
+    "others": sorted({"oil","olive oil","butter","ghee","milk","cheddar","parmesan","cornstarch","peanuts","cheese"}),
+}
+
+
+# ---- Catalog files (JSONL or CSV) ----
+CATALOG_PATH = os.environ.get("RECIPE_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recipes.jsonl"))
+
+DIETS = {"veg", "egg-veg", "vegan", "omnivore"}
+
+# CSV list cells (ingredients per category, diet, steps) are "|"-separated
+CSV_LIST_SEP = "|"
+
+
+def _str_list(value, what: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+        raise ValueError(f"{what} must be a list of strings")
+    return [x.strip() for x in value if x.strip()]
+
+
+def parse_recipe(row: Any) -> Recipe:
+    if not isinstance(row, dict):
+        raise ValueError("expected one recipe object per line")
+    title = row.get("title")
+    cuisine = row.get("cuisine")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("missing title")
+    if not isinstance(cuisine, str) or not cuisine.strip():
+        raise ValueError("missing cuisine")
+
+    ingredients = row.get("ingredients") or {}
+    if not isinstance(ingredients, dict):
+        raise ValueError("ingredients must be an object keyed by category")
+    unknown = set(ingredients) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"unknown ingredient categories: {', '.join(sorted(unknown))}")
+
+    time_minutes = row.get("time_minutes")
+    try:
+        time_minutes = int(time_minutes)
+    except (TypeError, ValueError):
+        raise ValueError(f"time_minutes must be an integer, got {time_minutes!r}") from None
+    if time_minutes < 0:
+        raise ValueError("time_minutes must not be negative")
+
+    diet = {d.lower() for d in _str_list(row.get("diet", []), "diet")}
+    if diet - DIETS:
+        raise ValueError(f"unknown diet tags: {', '.join(sorted(diet - DIETS))}")
+
+    return Recipe(
+        title=title.strip(),
+        cuisine=cuisine.strip(),
+        ingredients={cat: [norm(x) for x in _str_list(ingredients.get(cat, []), cat)] for cat in CATEGORIES},
+        time_minutes=time_minutes,
+        diet=diet,
+        steps=_str_list(row.get("steps", []), "steps"),
+    )
+
+
+def _split(cell: Optional[str]) -> List[str]:
+    return (cell or "").split(CSV_LIST_SEP)
+
+
+def _jsonl_rows(f: TextIO) -> Iterator[Tuple[int, Any]]:
+    for lineno, line in enumerate(f, 1):
+        if line.strip():
+            yield lineno, line
+
+
+def _csv_rows(f: TextIO) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, {
+            "title": row.get("title"),
+            "cuisine": row.get("cuisine"),
+            "ingredients": {cat: _split(row.get(cat)) for cat in CATEGORIES},
+            "time_minutes": row.get("time_minutes"),
+            "diet": _split(row.get("diet")),
+            "steps": _split(row.get("steps")),
+        }
+
+
+def iter_recipes(path: str) -> Iterator[Recipe]:
+    # Streams validated, normalized recipes; nothing but the current row is
+    # held, so arbitrarily large catalogs can be ingested.
+    is_csv = path.lower().endswith(".csv")
+    with open(path, encoding="utf-8", newline="") as f:
+        for lineno, row in (_csv_rows(f) if is_csv else _jsonl_rows(f)):
+            try:
+                recipe = parse_recipe(row if is_csv else json.loads(row))
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+            yield recipe
+
+
+def load_catalog(path: str = CATALOG_PATH) -> IngredientIndex:
+    return build_index(iter_recipes(path))
+
+
+@dataclass
+class Catalog:
+    index: IngredientIndex
+    version: str  # content digest of the source catalog, synonyms, substitutes and weights
+    signature: Tuple[int, int]  # (mtime_ns, size) of the source when it was loaded
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def open_catalog(path: str = CATALOG_PATH) -> Catalog:
+    # the compiled snapshot when it matches the source, else parse and compile
+    from snapshot import open_or_compile
+    signature = file_signature(path)
+    index, digest = open_or_compile(path)
+    return Catalog(index=index, version=digest.hex(), signature=signature)
+
+
+class CatalogStore:
+    # Process-wide holder of the current Catalog. Readers just take
+    # current(); a changed source file is reloaded off to the side and
+    # swapped in with a single reference assignment, so a session sees
+    # either the old catalog or the new one, never a mix.
+    def __init__(self, path: str = CATALOG_PATH, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalog = open_catalog(path)
+        self._checked = time.monotonic()
+        self._failed: Optional[Tuple[int, int]] = None
+
+    def current(self) -> Catalog:
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            self.reload_if_changed()
+        return self._catalog
+
+    def reload_if_changed(self) -> bool:
+        try:
+            signature = file_signature(self.path)
+        except OSError:
+            return False
+        if signature in (self._catalog.signature, self._failed):
+            return False
+        # someone else is already reloading: keep serving the old catalog
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            catalog = open_catalog(self.path)
+        except (OSError, ValueError):
+            # a broken edit must not take the app down; retry on the next change
+            self._failed = signature
+            return False
+        finally:
+            self._lock.release()
+        self._catalog = catalog
+        return True
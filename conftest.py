@@ -0,0 +1,82 @@
+# Shared test fixtures: a seeded synthetic catalog built from the bundled
+# recipes (ingredients, cuisines, times, diets and steps reshuffled), big
+# enough for ties, substitutes and strict filters to all show up, and
+# random pantries and preferences to rank it with.
+import json
+import random
+from typing import Dict, List, Set, Tuple
+
+import pytest
+
+from catalog import CATALOG_PATH, CATEGORIES, CUISINE_OPTIONS, DIETS, PANTRY_OPTIONS, iter_recipes, load_catalog
+from ranking import Prefs
+
+CATALOG_SIZE = 400
+QUERIES = 60
+
+STEPS = [
+    "Stir-fry the vegetables.",
+    "Simmer for 10 minutes.",
+    "Bake in the oven until golden.",
+    "Do not stir while it sets.",
+    "Grill the paneer.",
+    "Boil the noodles.",
+    "Fry onions until golden.",
+    "Slow cook the curry.",
+    "Serve hot (no-egg version: skip the glaze).",
+]
+
+
+def write_catalog(path: str, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    base = list(iter_recipes(CATALOG_PATH))
+    with open(path, "w") as f:
+        for i in range(n):
+            r = base[i % len(base)]
+            ingredients = {}
+            for cat in CATEGORIES:
+                own = [x for x in r.ingredients.get(cat, []) if rng.random() < 0.8]
+                ingredients[cat] = own + rng.sample(PANTRY_OPTIONS[cat], rng.randint(0, 2))
+            f.write(json.dumps({
+                "title": f"{r.title} {i}",
+                "cuisine": rng.choice(CUISINE_OPTIONS),
+                "ingredients": ingredients,
+                "time_minutes": rng.choice([10, 15, 20, 25, 30, 45]),
+                "diet": sorted(rng.sample(sorted(DIETS), rng.randint(1, 2))),
+                "steps": rng.sample(STEPS, rng.randint(1, 4)),
+            }) + "\n")
+
+
+@pytest.fixture(scope="session")
+def catalog_path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("catalog") / "recipes.jsonl")
+    write_catalog(path, CATALOG_SIZE)
+    return path
+
+
+@pytest.fixture(scope="session")
+def index(catalog_path):
+    return load_catalog(catalog_path)
+
+
+@pytest.fixture(scope="session")
+def recipes(catalog_path):
+    return list(iter_recipes(catalog_path))
+
+
+def random_query(rng: random.Random) -> Tuple[Dict[str, Set[str]], Prefs]:
+    have = {cat: set(rng.sample(PANTRY_OPTIONS[cat], rng.randint(0, 4))) for cat in CATEGORIES}
+    prefs = Prefs(
+        cuisine=tuple(rng.sample(CUISINE_OPTIONS, rng.randint(0, 2))),
+        diet=rng.choice(["no preference", "veg", "vegan"]),
+        time_limit=rng.choice([15, 25, 40]),
+        strict=rng.random() < 0.3,
+        substitutes=rng.random() < 0.7,
+    )
+    return have, prefs
+
+
+@pytest.fixture(scope="session")
+def queries() -> List[Tuple[Dict[str, Set[str]], Prefs]]:
+    rng = random.Random(1)
+    return [random_query(rng) for _ in range(QUERIES)]
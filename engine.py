@@ -0,0 +1,644 @@
+# Headless recommendation engine: everything the page needs to rank and
+# describe recipes, with preferences passed in explicitly. Imports no UI
+# code, so workers, benchmarks and services can use it without Streamlit.
+import heapq
+import importlib.util
+import threading
+import urllib.parse
+from collections import OrderedDict
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, List, Dict, Iterable, Optional, Set, Tuple
+
+from catalog import CATALOG_PATH, CATEGORIES, SUBSTITUTIONS, Catalog, CatalogStore, CompactRecipe, IngredientIndex, norm
+from facets import FacetIndex
+from incremental import IncrementalRanker
+from pantry_text import PantryParser
+from perf import PerfRecorder, RequestTrace, profiling
+from planner import DEFAULT_BUDGET, DEFAULT_DAYS, PlanStats, plan_meals
+from ranking import Prefs, allows, rank_recipes, score_ids, top_k
+from result_cache import ResultCache, pantry_fingerprint
+from similar import SimilarIndex
+from text_search import TextIndex, TextMatch
+from unlock import DEFAULT_THRESHOLD, Unlock, UnlockIndex
+
+# The NumPy matrix scorer beats walking postings in Python at every catalog
+# size bench.py covers (p50 0.08 vs 0.14 ms at 200 recipes, 0.10 vs 0.71 ms
+# at 1k, 0.28 vs 4.6 ms at 6k, 1.8 vs 59 ms at 50k), so it is used whenever
+# NumPy is installed; the postings paths are the fallback.
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# Without NumPy: below this catalog size one pass over the postings
+# (rank_recipes) is faster than top_k's pruning (p50 1.4 vs 2.0 ms at 2k
+# recipes, 9.9 vs 12.4 ms at 12k); from about 25k recipes top_k wins, mostly
+# in the tail (p99 49 vs 199 ms at 25k, 100 vs 384 ms at 50k).
+TOP_K_MIN_RECIPES = 20000
+
+# Rankings longer than this (deep pages) are not kept in the shared result
+# cache: each would hold a large share of the catalog
+CACHE_MAX_K = 100
+
+
+@dataclass
+class Suggestion:
+    recipe: CompactRecipe
+    score: float
+    missing: List[str]  # recipe ingredients not in the pantry, sorted
+    substitutes: Dict[str, str]  # missing ingredient -> pantry ingredient that stands in for it
+    youtube: str
+    rid: int  # recipe id in the catalog version it came from
+
+    def to_dict(self) -> Dict[str, Any]:
+        r = self.recipe
+        return {
+            "id": self.rid,
+            "title": r.title,
+            "cuisine": r.cuisine,
+            "time_minutes": r.time_minutes,
+            "diet": sorted(r.diet),
+            "score": self.score,
+            "missing": self.missing,
+            "substitutes": self.substitutes,
+            "steps": list(r.steps),
+            "youtube": self.youtube,
+        }
+
+
+@dataclass
+class MealPlan:
+    meals: List[Suggestion]  # in the order planned
+    shopping: List[Tuple[str, int]]  # (ingredient, meals needing it), most needed first
+    stats: PlanStats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "meals": [s.to_dict() for s in self.meals],
+            "shopping": [{"ingredient": x, "meals": n} for x, n in self.shopping],
+        }
+
+
+def query_from_dict(
+    d: Any,
+    default_k: int = 3,
+    parse_text: Optional[Callable[[str, Dict[str, List[str]]], Dict[str, List[str]]]] = None,
+) -> Tuple[Dict[str, List[str]], Prefs, int]:
+    # {"pantry": {category: [ingredient, ...]}, "text": "free text pantry",
+    #  "cuisine": [...], "diet": "...", "time_limit": 25, "strict": false, "substitutes": true,
+    #  "search": "stir-fry, no oven", "k": 3} -- all optional;
+    # "text" needs a parse_text (Engine.parse_pantry) to be merged into the pantry
+    if not isinstance(d, dict):
+        raise ValueError("query must be an object")
+    pantry = d.get("pantry") or {}
+    if not isinstance(pantry, dict) or not all(
+        isinstance(v, list) and all(isinstance(x, str) for x in v) for v in pantry.values()
+    ):
+        raise ValueError("pantry must map categories to lists of ingredients")
+    unknown = set(pantry) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"unknown pantry categories: {', '.join(sorted(unknown))}")
+    cuisine = d.get("cuisine") or []
+    if isinstance(cuisine, str):
+        cuisine = [cuisine]
+    if not isinstance(cuisine, list) or not all(isinstance(c, str) for c in cuisine):
+        raise ValueError("cuisine must be a list of strings")
+    diet = d.get("diet") or "no preference"
+    if not isinstance(diet, str):
+        raise ValueError("diet must be a string")
+    try:
+        time_limit = int(d.get("time_limit", Prefs.time_limit))
+        k = int(d.get("k", default_k))
+    except (TypeError, ValueError, OverflowError):  # 1e400 is valid JSON
+        raise ValueError("time_limit and k must be integers") from None
+    if k < 0:
+        raise ValueError("k must not be negative")
+    strict = d.get("strict", False)
+    substitutes = d.get("substitutes", True)
+    if not isinstance(strict, bool) or not isinstance(substitutes, bool):
+        raise ValueError("strict and substitutes must be true or false")
+    search = d.get("search") or ""
+    if not isinstance(search, str):
+        raise ValueError("search must be a string")
+    text = d.get("text")
+    if text is not None:
+        if not isinstance(text, str):
+            raise ValueError("text must be a string")
+        if parse_text is None:
+            raise ValueError("free-text pantries are not supported here")
+        pantry = parse_text(text, pantry)
+    prefs = Prefs(
+        cuisine=tuple(cuisine),
+        diet=diet,
+        time_limit=time_limit,
+        strict=strict,
+        substitutes=substitutes,
+        search=search,
+    )
+    return pantry, prefs, k
+
+
+def normalize_pantry(pantry: Dict[str, Iterable[str]]) -> Dict[str, Set[str]]:
+    return {cat: {norm(x) for x in pantry.get(cat, ())} for cat in CATEGORIES}
+
+
+def missing_ingredients(index: IngredientIndex, recipe: CompactRecipe, have_by_cat: Dict[str, Set[str]]) -> List[str]:
+    have_flat = index.vocab.mask(x for cat in CATEGORIES for x in have_by_cat.get(cat, set()))
+    return sorted(index.vocab.decode(recipe.missing(have_flat)))
+
+
+def stand_ins(index: IngredientIndex, recipe: CompactRecipe, have_by_cat: Dict[str, Set[str]]) -> Dict[str, str]:
+    # missing ingredient -> the pantry ingredient (same category) earning
+    # the most substitution credit for it
+    have_flat = index.vocab.mask(x for cat in CATEGORIES for x in have_by_cat.get(cat, set()))
+    out: Dict[str, str] = {}
+    for ci, cat in enumerate(CATEGORIES):
+        have = have_by_cat.get(cat)
+        if have:
+            for x in index.vocab.decode(recipe.masks[ci] & ~have_flat):
+                sub = SUBSTITUTIONS.stand_in(x, have)
+                if sub is not None:
+                    out.setdefault(x, sub)
+    return out
+
+
+def describe(
+    index: IngredientIndex, ranked: Iterable[Tuple[int, float]], have_by_cat: Dict[str, Set[str]], prefs: Prefs
+) -> List[Suggestion]:
+    # stand-ins are only named when prefs count substitutes, as the score did
+    out = []
+    for rid, score in ranked:
+        r = index.records[rid]
+        missing = missing_ingredients(index, r, have_by_cat)
+        subs = stand_ins(index, r, have_by_cat) if missing and prefs.substitutes else {}
+        out.append(Suggestion(r, score, missing, subs, youtube_link(r.title, r.cuisine), rid))
+    return out
+
+
+def youtube_link(recipe_title: str, cuisine: str) -> str:
+    q = urllib.parse.quote_plus(f"{recipe_title} {cuisine} recipe")
+    return f"https://www.youtube.com/results?search_query={q}"
+
+
+class RankedResults:
+    # One query's ranking, read a page at a time. The (recipe id, score)
+    # prefix is fetched as deep as the pages asked for, doubling each time,
+    # and only the page being shown is described (missing lists, links), so
+    # a page costs about the same wherever it is in the ranking.
+    def __init__(
+        self,
+        index: IngredientIndex,
+        version: str,
+        have_by_cat: Dict[str, Set[str]],
+        prefs: Prefs,
+        fetch: Callable[[int, RequestTrace], List[Tuple[int, float]]],
+    ):
+        self.index = index
+        self.version = version  # the catalog version recipe ids refer to
+        self.have = have_by_cat
+        self.prefs = prefs
+        self._fetch = fetch  # k -> best k (recipe id, score) pairs, best first
+        self.rids = array("I")
+        self.scores = array("d")
+        self.complete = False  # every matching recipe has been fetched
+
+    def __len__(self) -> int:
+        return len(self.rids)
+
+    def _ensure(self, n: int, trace: RequestTrace):
+        if self.complete or n <= len(self.rids):
+            return
+        k = max(n, 2 * len(self.rids))
+        ranked = self._fetch(k, trace)
+        self.rids = array("I", [rid for rid, _ in ranked])
+        self.scores = array("d", [score for _, score in ranked])
+        self.complete = len(ranked) < k
+        trace.count("fetched", len(ranked))
+
+    def page(self, number: int, size: int, trace: Optional[RequestTrace] = None) -> List[Suggestion]:
+        trace = trace or RequestTrace()
+        start, end = number * size, (number + 1) * size
+        with profiling(trace.profiler):
+            # one past the page, so has_next() needs no further fetch
+            self._ensure(end + 1, trace)
+            with trace.stage("describe"):
+                out = describe(self.index, zip(self.rids[start:end], self.scores[start:end]), self.have, self.prefs)
+        trace.count("results", len(out))
+        return out
+
+    def has_next(self, number: int, size: int) -> bool:
+        return len(self.rids) > (number + 1) * size
+
+    def page_count(self, size: int) -> Optional[int]:
+        # None until the end of the ranking has been seen
+        return -(-len(self.rids) // size) if self.complete else None
+
+
+class LiveRanker(IncrementalRanker):
+    # An IncrementalRanker that keeps the catalog it ranks, so pantries are
+    # resolved against that catalog's vocabulary even after a reload
+    def __init__(self, catalog: Catalog, prefs: Prefs, k: int, members: Optional[bytes]):
+        super().__init__(catalog.index, catalog.version, prefs, k, members)
+        self.catalog = catalog
+
+
+class VersionCache:
+    # A structure derived from the catalog, built on first use per catalog
+    # version. Each cache has its own lock, so a slow build (a big similar
+    # index after a reload) only holds up requests needing that structure.
+    # The last `keep` versions used stay built, so requests still holding
+    # the catalog from before a reload (a session paging old results) do not
+    # evict the current one and rebuild it every time they alternate.
+    # build(catalog, previous) gets the most recently built structure, or
+    # None, to reuse what it can.
+    def __init__(self, build: Callable[[Catalog, Any], Any], keep: int = 2):
+        self.build = build
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._built: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, catalog: Catalog) -> Any:
+        with self._lock:
+            value = self._built.get(catalog.version)
+            if value is None:
+                previous = next(reversed(self._built.values()), None)
+                value = self._built[catalog.version] = self.build(catalog, previous)
+                while len(self._built) > self.keep:
+                    self._built.popitem(last=False)
+            self._built.move_to_end(catalog.version)
+            return value
+
+
+def _matrix_scorer(catalog: Catalog, previous: Any):
+    from vector_scoring import MatrixScorer  # optional, needs numpy
+
+    return MatrixScorer(catalog.index)
+
+
+def _similar_index(catalog: Catalog, previous: Optional[SimilarIndex]) -> SimilarIndex:
+    # a catalog that only appended recipes to the previous one reuses its
+    # buckets and hashes just the new recipes
+    index = previous.extended(catalog.index) if previous is not None else None
+    return index or SimilarIndex(catalog.index)
+
+
+class Engine:
+    def __init__(self, store: Optional[CatalogStore] = None, cache: Optional[ResultCache] = None):
+        self.store = store or CatalogStore(CATALOG_PATH)
+        self.cache = cache or ResultCache()
+        self._matrix = VersionCache(_matrix_scorer)
+        self._parser = VersionCache(lambda catalog, _: PantryParser(catalog.index))
+        self._facets = VersionCache(lambda catalog, _: FacetIndex(catalog.index))
+        self._unlocker = VersionCache(lambda catalog, _: UnlockIndex(catalog.index))
+        self._similar = VersionCache(_similar_index)
+        self._text = VersionCache(lambda catalog, _: TextIndex(catalog.index))
+        self.perf = PerfRecorder()
+
+    def catalog(self) -> Catalog:
+        return self.store.current()
+
+    def matrix_scorer(self, catalog: Catalog):
+        return self._matrix.get(catalog)
+
+    def scorer(self, catalog: Catalog):
+        # the matrix scorer, or None without NumPy
+        return self.matrix_scorer(catalog) if HAVE_NUMPY else None
+
+    def pantry_parser(self, catalog: Optional[Catalog] = None) -> PantryParser:
+        return self._parser.get(catalog or self.catalog())
+
+    def facets(self, catalog: Optional[Catalog] = None) -> FacetIndex:
+        return self._facets.get(catalog or self.catalog())
+
+    def unlocker(self, catalog: Optional[Catalog] = None) -> UnlockIndex:
+        return self._unlocker.get(catalog or self.catalog())
+
+    def similar_index(self, catalog: Optional[Catalog] = None) -> SimilarIndex:
+        return self._similar.get(catalog or self.catalog())
+
+    def text_index(self, catalog: Optional[Catalog] = None) -> TextIndex:
+        return self._text.get(catalog or self.catalog())
+
+    def members(self, catalog: Catalog, prefs: Prefs) -> Optional[bytes]:
+        # the strict filter for prefs, or None when prefs are not strict
+        return self.facets(catalog).members(prefs) if prefs.strict else None
+
+    def corrections(self, pantry: Dict[str, Iterable[str]], catalog: Optional[Catalog] = None) -> Dict[str, str]:
+        # typo corrections rank() and friends apply to this pantry (see
+        # PantryParser.corrections)
+        return self.pantry_parser(catalog).corrections(normalize_pantry(pantry))
+
+    def parse_pantry(self, text: str, pantry: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, List[str]]:
+        # free text ("2 green onions, soya sauce") -> pantry by category, merged into `pantry`
+        return self.pantry_parser().parse(text, pantry)
+
+    def warm(self):
+        # build what the first request would otherwise pay for
+        catalog = self.catalog()
+        self.pantry_parser(catalog)
+        self.facets(catalog)
+        self.similar_index(catalog)
+        self.scorer(catalog)
+
+    def ranked(
+        self,
+        catalog: Catalog,
+        have_by_cat: Dict[str, Set[str]],
+        prefs: Prefs,
+        k: int,
+        trace: Optional[RequestTrace] = None,
+    ) -> List[Tuple[int, float]]:
+        # (recipe id, score) pairs for the best k, best first
+        trace = trace or RequestTrace()
+        key = (k, pantry_fingerprint(have_by_cat, prefs))
+        # The result cache holds one catalog version; a request for one
+        # since reloaded skips it rather than clearing it for everyone else
+        cacheable = k <= CACHE_MAX_K and catalog.version == self.catalog().version
+        ranked = self.cache.get(catalog.version, key) if cacheable else None
+        if ranked is not None:
+            trace.count("cache_hits")
+            trace.labels["strategy"] = "cache"
+            return list(ranked)
+        trace.count("cache_misses")
+        members = None
+        if prefs.strict:
+            with trace.stage("filter"):
+                members = self.members(catalog, prefs)
+        match = None
+        if prefs.search:
+            with trace.stage("search"):
+                match = self.text_index(catalog).search(prefs.search)
+        if match is not None and match.filtered:
+            ranked = self.blended(catalog, have_by_cat, prefs, k, members, match, trace)
+        else:
+            if match is not None:  # exclusions only: a filter like strict's
+                members = match.exclude(members, len(catalog.index.records))
+            ranked = self.ingredient_ranked(catalog, have_by_cat, prefs, k, members, trace)
+        if cacheable:
+            self.cache.put(catalog.version, key, tuple(ranked))
+        return list(ranked)
+
+    def ingredient_ranked(
+        self,
+        catalog: Catalog,
+        have_by_cat: Dict[str, Set[str]],
+        prefs: Prefs,
+        k: int,
+        members: Optional[bytes],
+        trace: RequestTrace,
+    ) -> List[Tuple[int, float]]:
+        scorer = self.scorer(catalog)
+        if scorer is not None:
+            trace.labels["strategy"] = "matrix"
+            with trace.stage("score"):
+                scores = scorer.scores(have_by_cat, prefs, members)
+            with trace.stage("sort"):
+                ranked = scorer.select(scores, k)
+            trace.count("scored", len(catalog.index.records))
+        elif len(catalog.index.records) < TOP_K_MIN_RECIPES:
+            trace.labels["strategy"] = "index"
+            with trace.stage("score"):
+                ranked = rank_recipes(catalog.index, have_by_cat, prefs, members)[:k]
+            trace.count("scored", len(catalog.index.records))
+        else:
+            # scoring and selection are interleaved in top_k's heap
+            trace.labels["strategy"] = "top_k"
+            with trace.stage("score"):
+                ranked, stats = top_k(catalog.index, have_by_cat, k, prefs, members)
+            trace.count("scored", stats.scored)
+            trace.count("candidates", stats.candidates)
+            trace.count("pruned", stats.pruned)
+            trace.count("filtered", stats.filtered)
+        return ranked
+
+    def blended(
+        self,
+        catalog: Catalog,
+        have_by_cat: Dict[str, Set[str]],
+        prefs: Prefs,
+        k: int,
+        members: Optional[bytes],
+        match: TextMatch,
+        trace: RequestTrace,
+    ) -> List[Tuple[int, float]]:
+        # Only recipes matching the search, each scored by its ingredients
+        # plus its text match (see text_search.py); ties in catalog order
+        index = catalog.index
+        rids = [rid for rid in match.scores if allows(members, rid)]
+        scorer = self.scorer(catalog)
+        if scorer is not None:
+            trace.labels["strategy"] = "matrix+text"
+            with trace.stage("score"):
+                base = dict(zip(rids, scorer.scores(have_by_cat, prefs, members)[rids].tolist()))
+        else:
+            trace.labels["strategy"] = "text"
+            with trace.stage("score"):
+                base = score_ids(index, have_by_cat, prefs, rids)
+        with trace.stage("sort"):
+            scored = [(rid, base[rid] + match.scores[rid]) for rid in rids]
+            ranked = heapq.nsmallest(k, ((rid, s) for rid, s in scored if s > 0), key=lambda t: (-t[1], t[0]))
+        trace.count("scored", len(rids))
+        trace.count("candidates", len(match.scores))
+        return ranked
+
+    def rank(
+        self,
+        pantry: Dict[str, Iterable[str]],
+        prefs: Prefs = Prefs(),
+        k: int = 3,
+        catalog: Optional[Catalog] = None,
+        trace: Optional[RequestTrace] = None,
+    ) -> List[Suggestion]:
+        # One catalog for the whole call, even if a reload lands meanwhile;
+        # callers ranking several pantries together can pin one themselves.
+        # Callers passing a trace record it (they may time more stages);
+        # otherwise the request is recorded here.
+        own_trace = trace is None
+        trace = trace or RequestTrace()
+        catalog = catalog or self.catalog()
+        index = catalog.index
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                # names the catalog does not know get a typo-tolerant lookup
+                have = self.pantry_parser(catalog).resolve_pantry(normalize_pantry(pantry))
+            ranked = self.ranked(catalog, have, prefs, k, trace)
+            with trace.stage("describe"):
+                out = describe(index, ranked, have, prefs)
+        trace.count("results", len(out))
+        if own_trace:
+            self.perf.record(trace)
+        return out
+
+    def results(
+        self,
+        pantry: Dict[str, Iterable[str]],
+        prefs: Prefs = Prefs(),
+        catalog: Optional[Catalog] = None,
+        trace: Optional[RequestTrace] = None,
+    ) -> RankedResults:
+        # rank() for paging: nothing is ranked until the first page is read.
+        # The caller records the trace.
+        trace = trace or RequestTrace()
+        catalog = catalog or self.catalog()
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                have = self.pantry_parser(catalog).resolve_pantry(normalize_pantry(pantry))
+        return RankedResults(catalog.index, catalog.version, have, prefs, lambda k, t: self.ranked(catalog, have, prefs, k, t))
+
+    def unlock(
+        self,
+        pantry: Dict[str, Iterable[str]],
+        prefs: Prefs = Prefs(),
+        size: int = 2,
+        threshold: float = DEFAULT_THRESHOLD,
+        limit: int = 5,
+        catalog: Optional[Catalog] = None,
+        trace: Optional[RequestTrace] = None,
+    ) -> List[Unlock]:
+        # What to buy: sets of up to `size` ingredients by how many recipes
+        # they lift to `threshold` coverage (see unlock.py). Strict prefs
+        # limit it to recipes in their filter.
+        own_trace = trace is None
+        trace = trace or RequestTrace()
+        catalog = catalog or self.catalog()
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                have = self.pantry_parser(catalog).resolve_pantry(normalize_pantry(pantry))
+            scorer = self.scorer(catalog)
+            with trace.stage("unlock"):
+                out = self.unlocker(catalog).analyze(have, size, threshold, limit, self.members(catalog, prefs), scorer)
+        trace.labels["strategy"] = "matrix" if scorer is not None else "postings"
+        trace.count("results", len(out))
+        if own_trace:
+            self.perf.record(trace, "unlock")
+        return out
+
+    def similar(
+        self,
+        rid: int,
+        pantry: Dict[str, Iterable[str]],
+        prefs: Prefs = Prefs(),
+        k: int = 5,
+        catalog: Optional[Catalog] = None,
+        trace: Optional[RequestTrace] = None,
+    ) -> List[Suggestion]:
+        # "More like this" for recipe rid of `catalog`: the k recipes with
+        # the most similar ingredient sets (see similar.py), scored by their
+        # Jaccard similarity, missing lists against the pantry. Strict prefs
+        # limit it to recipes in their filter.
+        own_trace = trace is None
+        trace = trace or RequestTrace()
+        catalog = catalog or self.catalog()
+        if not 0 <= rid < len(catalog.index.records):
+            raise ValueError(f"no recipe {rid} in catalog {catalog.version}")
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                have = self.pantry_parser(catalog).resolve_pantry(normalize_pantry(pantry))
+            with trace.stage("similar"):
+                ranked = self.similar_index(catalog).similar(rid, k, self.members(catalog, prefs))
+            with trace.stage("describe"):
+                out = describe(catalog.index, ranked, have, prefs)
+        trace.count("results", len(out))
+        if own_trace:
+            self.perf.record(trace, "similar")
+        return out
+
+    def plan(
+        self,
+        pantry: Dict[str, Iterable[str]],
+        prefs: Prefs = Prefs(),
+        days: int = DEFAULT_DAYS,
+        budget: float = DEFAULT_BUDGET,
+        catalog: Optional[Catalog] = None,
+        trace: Optional[RequestTrace] = None,
+    ) -> MealPlan:
+        # `days` recipes with the shortest combined shopping list (see
+        # planner.py). Cuisine, diet and time always filter here, strict or
+        # not: a plan has no ranking to push the rest down in.
+        own_trace = trace is None
+        trace = trace or RequestTrace()
+        catalog = catalog or self.catalog()
+        index = catalog.index
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                have = self.pantry_parser(catalog).resolve_pantry(normalize_pantry(pantry))
+            strict = Prefs(prefs.cuisine, prefs.diet, prefs.time_limit, strict=True)
+            with trace.stage("filter"):
+                facets = self.facets(catalog)
+                members = facets.members(strict)
+                candidates = facets.ids(strict)
+            # scores only break ties between equally short lists
+            with trace.stage("score"):
+                scorer = self.scorer(catalog)
+                if scorer is not None:
+                    score = scorer.scores(have, prefs, members).tolist().__getitem__
+                    trace.labels["strategy"] = "matrix"
+                else:
+                    ranked = dict(rank_recipes(index, have, prefs, members))
+                    score = lambda rid: ranked.get(rid, 0.0)
+                    trace.labels["strategy"] = "postings"
+            with trace.stage("plan"):
+                plan = plan_meals(index, have, candidates, score, days, budget)
+            with trace.stage("describe"):
+                meals = describe(index, [(rid, score(rid)) for rid in plan.recipes], have, prefs)
+                needed: Dict[str, int] = {}
+                for s in meals:
+                    for x in s.missing:
+                        needed[x] = needed.get(x, 0) + 1
+                shopping = sorted(needed.items(), key=lambda t: (-t[1], t[0]))
+        trace.count("candidates", plan.stats.candidates)
+        trace.count("evaluations", plan.stats.evaluations)
+        trace.count("swaps", plan.stats.swaps)
+        trace.count("results", len(meals))
+        if own_trace:
+            self.perf.record(trace, "plan")
+        return MealPlan(meals, shopping, plan.stats)
+
+    def live_ranker(self, ranker: Optional[LiveRanker], prefs: Prefs, k: int) -> LiveRanker:
+        # A session's incremental ranker: kept across reruns, replaced when
+        # the catalog (or k) changes, re-scored in place when prefs change.
+        catalog = self.catalog()
+        members = self.members(catalog, prefs)
+        if ranker is None or ranker.version != catalog.version or ranker.k != k:
+            ranker = LiveRanker(catalog, prefs, k, members)
+        ranker.set_prefs(prefs, members)
+        return ranker
+
+    def live_results(
+        self,
+        ranker: LiveRanker,
+        pantry: Dict[str, Iterable[str]],
+        trace: Optional[RequestTrace] = None,
+    ) -> RankedResults:
+        # Like results(), but only the ingredients that changed since the
+        # ranker's last call are re-scored. Pages read the ranker as it is
+        # then, so read them before the ranker's next update.
+        trace = trace or RequestTrace()
+        trace.labels["strategy"] = "incremental"
+        with profiling(trace.profiler):
+            with trace.stage("normalize"):
+                have = self.pantry_parser(ranker.catalog).resolve_pantry(normalize_pantry(pantry))
+            before = ranker.stats.rescored
+            with trace.stage("score"):
+                ranker.update(have)
+            trace.count("scored", ranker.stats.rescored - before)
+
+        def fetch(k: int, t: RequestTrace) -> List[Tuple[int, float]]:
+            with t.stage("sort"):
+                return ranker.top(k)
+
+        return RankedResults(ranker.index, ranker.version, have, ranker.prefs, fetch)
+
+
+_default_engine: Optional[Engine] = None
+_default_lock = threading.Lock()
+
+
+def default_engine() -> Engine:
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = Engine()
+        return _default_engine
+
+
+def rank(pantry: Dict[str, Iterable[str]], prefs: Prefs = Prefs(), k: int = 3) -> List[Suggestion]:
+    return default_engine().rank(pantry, prefs, k)
@@ -0,0 +1,86 @@
+# Facet bitmaps for strict filtering: one bitmap over recipe ids per cuisine,
+# per diet tag and per cooking time (cumulative: "ready in at most t
+# minutes"), held as Python ints so filters combine with C-speed & and |.
+# A query's filter is the intersection of its facets, taken before anything
+# is scored; counts per option are popcounts of the same intersections.
+from bisect import bisect_right
+from typing import Dict, Iterable, List
+
+from catalog import IngredientIndex
+from ranking import Prefs
+
+NO_DIET = "no preference"
+
+
+def _bitmap(bits: bytearray) -> int:
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex:
+    def __init__(self, index: IngredientIndex):
+        n = len(index.records)
+        self.size = n
+        self.nbytes = (n + 7) // 8
+        self.all = (1 << n) - 1
+
+        cuisine: Dict[str, bytearray] = {}
+        diet: Dict[str, bytearray] = {}
+        time: Dict[int, bytearray] = {}
+        # recipes in a (cuisine, diet, time) group share every facet, so
+        # the bitmaps to set are looked up once per group
+        for (c, tags, t), rids in index.groups.items():
+            targets = [cuisine.setdefault(c, bytearray(self.nbytes)), time.setdefault(t, bytearray(self.nbytes))]
+            targets += [diet.setdefault(d, bytearray(self.nbytes)) for d in tags]
+            for rid in rids:
+                byte, bit = rid >> 3, 1 << (rid & 7)
+                for bits in targets:
+                    bits[byte] |= bit
+
+        self.cuisine: Dict[str, int] = {c: _bitmap(b) for c, b in sorted(cuisine.items())}
+        self.diet: Dict[str, int] = {d: _bitmap(b) for d, b in sorted(diet.items())}
+        self.times: List[int] = sorted(time)
+        self.at_most: List[int] = []  # at_most[i]: recipes taking <= times[i] minutes
+        acc = 0
+        for t in self.times:
+            acc |= _bitmap(time[t])
+            self.at_most.append(acc)
+
+    def cuisine_mask(self, cuisines: Iterable[str]) -> int:
+        cuisines = tuple(cuisines)
+        if not cuisines:
+            return self.all
+        mask = 0
+        for c in cuisines:
+            mask |= self.cuisine.get(c, 0)
+        return mask
+
+    def diet_mask(self, diet: str) -> int:
+        return self.all if diet == NO_DIET else self.diet.get(diet, 0)
+
+    def time_mask(self, time_limit: int) -> int:
+        i = bisect_right(self.times, time_limit)
+        return self.at_most[i - 1] if i else 0
+
+    def allowed(self, prefs: Prefs) -> int:
+        return self.cuisine_mask(prefs.cuisine) & self.diet_mask(prefs.diet) & self.time_mask(prefs.time_limit)
+
+    def members(self, prefs: Prefs) -> bytes:
+        # the filter as a little-endian bit array: recipe rid passes when
+        # members[rid >> 3] >> (rid & 7) & 1
+        return self.allowed(prefs).to_bytes(self.nbytes, "little")
+
+    def ids(self, prefs: Prefs) -> List[int]:
+        # the filter as ascending recipe ids
+        return [i << 3 | b for i, byte in enumerate(self.members(prefs)) if byte for b in range(8) if byte >> b & 1]
+
+    def counts(self, prefs: Prefs, cuisines: Iterable[str] = (), diets: Iterable[str] = ()) -> Dict[str, object]:
+        # Recipes left per option if it were picked, given the other facets
+        # as they are; the cuisine picks are OR-ed, so each cuisine counts
+        # alone. Options the catalog lacks count 0.
+        by_cuisine = self.diet_mask(prefs.diet) & self.time_mask(prefs.time_limit)
+        by_diet = self.cuisine_mask(prefs.cuisine) & self.time_mask(prefs.time_limit)
+        return {
+            "cuisine": {c: (self.cuisine.get(c, 0) & by_cuisine).bit_count() for c in (cuisines or self.cuisine)},
+            "diet": {d: (self.diet_mask(d) & by_diet).bit_count() for d in (diets or [NO_DIET, *self.diet])},
+            "matching": self.allowed(prefs).bit_count(),
+        }
@@ -0,0 +1,104 @@
+# Typo-tolerant lookup ("tumeric" -> "turmeric") over a fixed vocabulary.
+# Names are indexed by padded character trigrams; a query only verifies the
+# names sharing enough trigrams with it (each edit destroys at most a few),
+# using an edit distance that gives up as soon as it exceeds the bound.
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Q = 3
+PAD = "\0"
+
+
+def trigrams(s: str) -> List[str]:
+    p = PAD * (Q - 1) + s + PAD * (Q - 1)
+    return [p[i:i + Q] for i in range(len(p) - Q + 1)]
+
+
+def auto_distance(term: str) -> int:
+    # edits allowed for a term of this length: none below five letters,
+    # where one edit turns too many real words into others (pear -> peas)
+    n = len(term)
+    return 0 if n < 5 else 1 if n < 7 else 2
+
+
+def bounded_distance(a: str, b: str, bound: int) -> int:
+    # Edit distance with adjacent transpositions (optimal string alignment),
+    # or bound + 1 as soon as it is certain to exceed bound.
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    if a == b:
+        return 0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        lo = max(1, i - bound)
+        hi = min(len(b), i + bound)
+        if lo > 1:
+            cur[lo - 1] = bound + 1
+        row_min = cur[lo - 1] if lo > 1 else i
+        ai = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = 0 if ai == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ai == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            if d < row_min:
+                row_min = d
+        if hi < len(b):
+            for j in range(hi + 1, len(b) + 1):
+                cur[j] = bound + 1
+        if row_min > bound:
+            return bound + 1
+        prev2, prev = prev, cur
+    return min(prev[len(b)], bound + 1)
+
+
+class TrigramIndex:
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = []
+        self.postings: Dict[str, List[int]] = {}
+        seen = set()
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+            i = len(self.names)
+            self.names.append(name)
+            for g in set(trigrams(name)):
+                self.postings.setdefault(g, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def matches(self, term: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[str, int]]:
+        # (name, distance) pairs within max_distance, closest first
+        bound = auto_distance(term) if max_distance is None else max_distance
+        grams = set(trigrams(term))
+        shared = Counter()
+        for g in grams:
+            shared.update(self.postings.get(g, ()))
+        found: List[Tuple[int, int, int, int, str]] = []
+        # Most shared grams first. An edit touches at most Q grams (Q + 1 for
+        # a transposition), so once `limit` names are found the bound tightens
+        # to the worst of them and the gram requirement rises with it. One
+        # shared gram is always required, so a lookup never becomes a scan.
+        for i, c in shared.most_common():
+            if c < max(1, len(grams) - (Q + 1) * bound):
+                break
+            name = self.names[i]
+            dist = bounded_distance(term, name, bound)
+            if dist > bound:
+                continue
+            found.append((dist, -c, abs(len(name) - len(term)), i, name))
+            if len(found) >= limit:
+                found.sort()
+                del found[limit:]
+                bound = found[-1][0]
+        found.sort()
+        return [(name, dist) for dist, _, _, _, name in found[:limit]]
+
+    def best(self, term: str, max_distance: Optional[int] = None) -> Optional[str]:
+        m = self.matches(term, max_distance, limit=1)
+        return m[0][0] if m else None
@@ -0,0 +1,167 @@
+# Stateful ranking for one session. Keeps per-recipe, per-category hit counts
+# for the current pantry; adding or removing an ingredient only touches the
+# recipes in its postings and moves them within a sorted list, and the top k
+# is read off the head of that list merged with the recipes that have no
+# hits (which score their group's preference-only value). Returns exactly
+# what top_k would for the same pantry and preferences. Substitution credit
+# is kept the same way: a pantry change only touches the ingredients whose
+# credit it changed, by the difference. Under a strict
+# filter, hits are still counted for every recipe (so a preference change
+# only rescores), but only recipes in the filter are scored and ordered.
+import heapq
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from itertools import groupby, islice, takewhile
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from catalog import CATEGORIES, SUBSTITUTIONS, IngredientIndex, norm
+from ranking import Prefs, allows, apply_prefs, score_from_hits
+
+# Above this many touched recipes the sorted list is rebuilt by merging
+# instead of shifted once per recipe
+BISECT_MAX = 64
+
+
+@dataclass
+class IncrementalStats:
+    added: int = 0
+    removed: int = 0
+    rescored: int = 0  # recipes rescored because an ingredient they use changed
+    rebuilds: int = 0  # full rescoring of hit recipes after a preference change
+
+
+class IncrementalRanker:
+    def __init__(
+        self,
+        index: IngredientIndex,
+        version: str = "",
+        prefs: Prefs = Prefs(),
+        k: int = 3,
+        members: Optional[bytes] = None,
+    ):
+        self.index = index
+        self.version = version
+        self.k = k
+        self.have: Dict[str, Set[str]] = {cat: set() for cat in CATEGORIES}
+        # per category: ingredient -> credit the pantry earns for it (1 for
+        # the pantry's own)
+        self.credit: Dict[str, Dict[str, float]] = {cat: {} for cat in CATEGORIES}
+        self.hits: Dict[int, List[float]] = {}  # recipes with at least one hit or credit
+        self.scores: Dict[int, float] = {}
+        self.order: List[Tuple[float, int]] = []  # (-score, rid) of hit recipes, ascending
+        self.stats = IncrementalStats()
+        self.prefs = prefs
+        self.members = members  # FacetIndex.members() for strict prefs, else None
+        self._rebuild()
+
+    def _rebuild(self):
+        prefs, records = self.prefs, self.index.records
+        members = self.members
+        group_adj = [
+            (apply_prefs(0.0, records[rids[0]], prefs), rids)
+            for rids in self.index.groups.values()
+            if allows(members, rids[0])
+        ]
+        group_adj.sort(key=lambda t: t[0], reverse=True)
+        self.group_adj = group_adj
+        self.scores = {rid: self._score(rid) for rid in self.hits if allows(members, rid)}
+        self.order = sorted((-s, rid) for rid, s in self.scores.items())
+
+    def _score(self, rid: int) -> float:
+        rec = self.index.records[rid]
+        return apply_prefs(score_from_hits(self.hits[rid], rec.sizes), rec, self.prefs)
+
+    def set_prefs(self, prefs: Prefs, members: Optional[bytes] = None):
+        # members must be the filter for these prefs (None unless strict)
+        if prefs != self.prefs:
+            recount = prefs.substitutes != self.prefs.substitutes
+            self.prefs = prefs
+            self.members = members
+            self.stats.rebuilds += 1
+            if recount:
+                for cat in CATEGORIES:
+                    self._sync(cat)
+            self._rebuild()
+
+    def add(self, cat: str, x: str):
+        x = norm(x)
+        if x not in self.have[cat]:
+            self.have[cat].add(x)
+            self.stats.added += 1
+            self._sync(cat)
+
+    def remove(self, cat: str, x: str):
+        x = norm(x)
+        if x in self.have[cat]:
+            self.have[cat].discard(x)
+            self.stats.removed += 1
+            self._sync(cat)
+
+    def update(self, have_by_cat: Dict[str, Iterable[str]]):
+        # bring the pantry in line with have_by_cat, one ingredient at a time
+        for cat in CATEGORIES:
+            want = {norm(x) for x in have_by_cat.get(cat, ())}
+            for x in self.have[cat] - want:
+                self.remove(cat, x)
+            for x in want - self.have[cat]:
+                self.add(cat, x)
+
+    def _sync(self, cat: str):
+        # bring the category's credits in line with its pantry
+        new = SUBSTITUTIONS.credits_for(self.have[cat]) if self.prefs.substitutes else {}
+        new.update((x, 1) for x in self.have[cat])
+        old = self.credit[cat]
+        for x in sorted(old.keys() | new.keys()):
+            delta = new.get(x, 0) - old.get(x, 0)
+            if delta:
+                self._touch(cat, x, delta)
+        self.credit[cat] = new
+
+    def _touch(self, cat: str, x: str, delta: float):
+        postings = self.index.postings[cat].get(x)
+        if not postings:
+            return
+        ci = CATEGORIES.index(cat)
+        for rid in postings:  # one entry per occurrence, like coverage_score counts
+            h = self.hits.get(rid)
+            if h is None:
+                h = self.hits[rid] = [0] * len(CATEGORIES)
+            h[ci] += delta
+        touched = set(postings)
+        stale, fresh = [], []
+        for rid in touched:
+            old = self.scores.pop(rid, None)
+            if old is not None:
+                stale.append((-old, rid))
+            if not any(self.hits[rid]):
+                del self.hits[rid]
+            elif allows(self.members, rid):
+                s = self.scores[rid] = self._score(rid)
+                fresh.append((-s, rid))
+        self.stats.rescored += len(fresh)
+        if len(touched) <= BISECT_MAX:
+            for key in stale:
+                del self.order[bisect_left(self.order, key)]
+            for key in fresh:
+                insort(self.order, key)
+        else:
+            # many recipes moved: one linear merge beats that many list shifts
+            fresh.sort()
+            kept = [t for t in self.order if t[1] not in touched]
+            self.order = list(heapq.merge(kept, fresh))
+
+    def _no_hit_stream(self) -> Iterator[Tuple[float, int]]:
+        # recipes without hits as (-score, rid), best first; groups with the
+        # same adjustment are merged so ties stay in catalog order
+        for adj, same in groupby(self.group_adj, key=lambda t: t[0]):
+            if adj <= 0:
+                return
+            for rid in heapq.merge(*(rids for _, rids in same)):
+                if rid not in self.hits:
+                    yield -adj, rid
+
+    def top(self, k: int = 0) -> List[Tuple[int, float]]:
+        # (recipe id, score) for the best k, best first
+        k = k or self.k
+        best = heapq.merge(self.order, self._no_hit_stream())
+        return [(rid, -ns) for ns, rid in islice(takewhile(lambda t: t[0] < 0, best), k)]
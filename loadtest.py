@@ -0,0 +1,115 @@
+# Load generator for service.py: keeps N keep-alive connections busy with
+# /rank requests and reports throughput and latency percentiles.
+#
+#     python loadtest.py [--url http://127.0.0.1:8080/rank] [-c 32] [-n 5000] [--queries pantries.jsonl]
+#
+# Without --queries it sends random pantries drawn from the sidebar options.
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional
+
+from catalog import CUISINE_OPTIONS, DIETS, PANTRY_OPTIONS
+
+
+def random_query(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "pantry": {cat: rng.sample(opts, rng.randint(0, min(5, len(opts)))) for cat, opts in PANTRY_OPTIONS.items()},
+        "cuisine": rng.sample(CUISINE_OPTIONS, rng.randint(0, 2)),
+        "diet": rng.choice(["no preference"] + sorted(DIETS)),
+        "time_limit": rng.choice([10, 15, 25, 40, 60]),
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[i]
+
+
+async def _client(host: str, port: int, path: str, bodies: List[bytes], counter: List[int], total: int,
+                  latencies: List[float], errors: List[int]):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < total:
+            body = bodies[counter[0] % len(bodies)]
+            counter[0] += 1
+            request = (
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode("latin-1") + body
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[0] += 1
+    finally:
+        writer.close()
+
+
+async def run(url: str, queries: List[Dict[str, Any]], concurrency: int, total: int) -> Dict[str, Any]:
+    u = urllib.parse.urlsplit(url)
+    bodies = [json.dumps(q).encode("utf-8") for q in queries]
+    counter, errors, latencies = [0], [0], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(u.hostname or "127.0.0.1", u.port or 80, u.path or "/rank", bodies, counter, total, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    latency_ms = {name: percentile(latencies, p) * 1000 for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("p999", 99.9))}
+    latency_ms["max"] = latencies[-1] * 1000 if latencies else 0.0
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": latency_ms,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure requests per second and tail latency of service.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/rank")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-n", "--requests", type=int, default=5000)
+    parser.add_argument("--queries", help="JSONL file of query objects to replay (default: random pantries)")
+    parser.add_argument("--distinct", type=int, default=1000, help="random pantries to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        rng = random.Random(args.seed)
+        queries = [random_query(rng) for _ in range(args.distinct)]
+
+    report = asyncio.run(run(args.url, queries, args.concurrency, args.requests))
+    if args.json:
+        print(json.dumps(report))
+        return
+    lat = report["latency_ms"]
+    print(f"{report['requests']} requests, {report['errors']} errors, {report['concurrency']} connections, {report['seconds']:.2f}s")
+    print(f"{report['rps']:.0f} req/s")
+    print("latency ms: " + "  ".join(f"{k} {v:.2f}" for k, v in lat.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# Free-text pantry parsing: "2 green onions, some bell peppers, soya sauce"
+# -> {"veggies": ["spring onion", "capsicum"], "sauces_condiments": ["light soy sauce"]}.
+#
+# Every known ingredient name and synonym is compiled into a trie over
+# stemmed word tokens. Parsing splits the text into entries (commas,
+# semicolons, lines), tokenizes each once and takes the longest phrase
+# starting at each position (leftmost-longest, non-overlapping); the walk
+# from a position is bounded by the longest phrase, so a pass is linear in
+# the input. In short entries, words that match nothing exactly get a
+# typo-tolerant lookup in a trigram index over the same names (see fuzzy.py).
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog import CATEGORIES, PANTRY_OPTIONS, IngredientIndex, norm, synonyms
+from fuzzy import TrigramIndex
+
+WORD_RE = re.compile(r"[^\W\d_]+")
+PARSE_CACHE_SIZE = 1024
+RESOLVE_CACHE_SIZE = 1 << 14
+MIN_FUZZY_LEN = 5  # shorter words are too easy to "correct" into something else
+# Free text is only typo-corrected in list entries (split on commas,
+# semicolons and lines) of at most this many words: in prose, ordinary words
+# are near misses of ingredients ("better" -> butter, "price" -> rice)
+FUZZY_MAX_WORDS = 4
+ENTRY_RE = re.compile(r"[,;\n]+")
+
+_END = ""  # trie key holding the canonical name of a phrase ending here
+
+
+@lru_cache(maxsize=1 << 16)
+def stem(word: str) -> str:
+    # Light plural folding; applied to patterns and input alike, so it only
+    # has to be consistent, not linguistically right.
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def tokens(text: str) -> List[str]:
+    return [stem(w) for w in words(text)]
+
+
+class PantryParser:
+    def __init__(self, index: IngredientIndex, options: Dict[str, Iterable[str]] = PANTRY_OPTIONS):
+        # canonical name -> categories it is used in (catalog first, then sidebar options)
+        self.categories: Dict[str, List[str]] = {}
+        for cat in CATEGORIES:
+            for name in index.postings[cat]:
+                self._add_category(name, cat)
+            for name in options.get(cat, ()):
+                self._add_category(norm(name), cat)
+
+        self.trie: Dict[str, dict] = {}
+        self.max_phrase = 0
+        # stemmed phrase -> canonical name; canonical names win over synonyms
+        # that stem the same way
+        self.aliases: Dict[str, str] = {}
+        for name in self.categories:
+            self._add_phrase(name, name)
+        for alias, target in synonyms.items():
+            if target in self.categories:
+                self._add_phrase(alias, target)
+        self.fuzzy = TrigramIndex(self.aliases)
+        self._extract = lru_cache(maxsize=PARSE_CACHE_SIZE)(self._extract_uncached)
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._resolve_uncached)
+        self._fuzzy_cached = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._fuzzy)
+
+    def _add_category(self, name: str, cat: str):
+        cats = self.categories.setdefault(sys.intern(name), [])
+        if cat not in cats:
+            cats.append(cat)
+
+    def _add_phrase(self, phrase: str, canonical: str):
+        stems = tokens(phrase)
+        if not stems:
+            return
+        self.aliases.setdefault(" ".join(stems), canonical)
+        node = self.trie
+        for w in stems:
+            node = node.setdefault(w, {})
+        node.setdefault(_END, canonical)
+        self.max_phrase = max(self.max_phrase, len(stems))
+
+    def _exact(self, stems: List[str]) -> Optional[str]:
+        node = self.trie
+        for w in stems:
+            node = node.get(w)
+            if node is None:
+                return None
+        return node.get(_END)
+
+    def _fuzzy(self, phrase: str) -> Optional[str]:
+        if len(phrase) < MIN_FUZZY_LEN:
+            return None
+        hit = self.fuzzy.best(phrase)
+        return self.aliases[hit] if hit is not None else None
+
+    def _resolve_uncached(self, term: str) -> Optional[str]:
+        # one pantry entry -> canonical name: exact, then plural-folded, then typo-tolerant
+        t = norm(term)
+        if t in self.categories:
+            return t
+        stems = tokens(t)
+        return self._exact(stems) or self._fuzzy(" ".join(stems))
+
+    def resolve_pantry(self, have_by_cat: Dict[str, Iterable[str]]) -> Dict[str, Set[str]]:
+        # unknown entries are replaced by what they resolve to (or kept as typed)
+        return {cat: {self.resolve(x) or norm(x) for x in items} for cat, items in have_by_cat.items()}
+
+    def corrections(self, have_by_cat: Dict[str, Iterable[str]]) -> Dict[str, str]:
+        # entries resolve_pantry only matched by typo tolerance: as typed ->
+        # the ingredient used instead, so callers can show what was assumed
+        out = {}
+        for items in have_by_cat.values():
+            for x in items:
+                t = norm(x)
+                if t not in self.categories and self._exact(tokens(t)) is None:
+                    hit = self.resolve(x)
+                    if hit is not None:
+                        out[x] = hit
+        return out
+
+    def _extract_uncached(self, text: str) -> Tuple[str, ...]:
+        found: Dict[str, None] = {}
+        for entry in ENTRY_RE.split(text):
+            self._extract_entry(tokens(entry), found)
+        return tuple(found)
+
+    def _extract_entry(self, stems: List[str], found: Dict[str, None]):
+        fuzzy = len(stems) <= FUZZY_MAX_WORDS
+        i, n = 0, len(stems)
+        while i < n:
+            node, match, end = self.trie, None, i
+            for j in range(i, min(n, i + self.max_phrase)):
+                node = node.get(stems[j])
+                if node is None:
+                    break
+                if _END in node:
+                    match, end = node[_END], j + 1
+            if match is None and fuzzy:
+                # no exact phrase here: try the longest window that is a near miss
+                for end in range(min(n, i + self.max_phrase), i, -1):
+                    match = self._fuzzy_cached(" ".join(stems[i:end]))
+                    if match is not None:
+                        break
+            if match is None:
+                i += 1
+            else:
+                found[match] = None
+                i = end
+
+    def extract(self, text: str) -> List[str]:
+        # canonical ingredient names in order of first mention
+        return list(self._extract(text))
+
+    def parse(self, text: str, pantry: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, List[str]]:
+        # Pantry by category, added to a copy of `pantry` if given; an
+        # ingredient goes in every category recipes use it in.
+        pantry = {cat: list(items) for cat, items in (pantry or {}).items()}
+        for name in self._extract(text):
+            for cat in self.categories[name]:
+                items = pantry.setdefault(cat, [])
+                if name not in items:
+                    items.append(name)
+        return pantry
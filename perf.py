@@ -0,0 +1,145 @@
+# Per-request timing: each ranking request carries a RequestTrace that stages
+# time themselves into and counters are added to. Finished traces go to a
+# PerfRecorder, which logs them as one JSON line each (logger "recipe_bot.perf",
+# INFO) and keeps a window of recent ones for percentiles. Traces are recorded
+# under an event ("rank", "similar", "plan", ...) and summarized per event, so
+# cheap lookups never skew the ranking percentiles.
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("recipe_bot.perf")
+
+DEFAULT_WINDOW = 500  # recent requests kept for percentiles
+
+
+class Cancelled(Exception):
+    pass
+
+
+class RequestTrace:
+    # profiler: anything with enable()/disable() (cProfile.Profile) or
+    # start()/stop() (sampling profilers such as pyinstrument's); it runs
+    # for the ranking part of this one request only.
+    # cancelled: checked as each stage starts; once it returns True the
+    # stage raises Cancelled instead, so abandoned work stops early.
+    __slots__ = ("stages", "counters", "labels", "profiler", "cancelled", "_start")
+
+    def __init__(self, profiler: Any = None, cancelled: Optional[Callable[[], bool]] = None):
+        self.stages: Dict[str, float] = {}  # seconds
+        self.counters: Dict[str, int] = {}
+        self.labels: Dict[str, str] = {}
+        self.profiler = profiler
+        self.cancelled = cancelled
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled(name)
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round(self.total() * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            **self.labels,
+        }
+
+
+@contextmanager
+def profiling(profiler: Any) -> Iterator[None]:
+    if profiler is None:
+        yield
+        return
+    start, stop = (profiler.enable, profiler.disable) if hasattr(profiler, "enable") else (profiler.start, profiler.stop)
+    start()
+    try:
+        yield
+    finally:
+        stop()
+
+
+def profile_report(profiler: Any, limit: int = 25) -> str:
+    # cProfile gets a cumulative-time table; other profilers their own text output
+    if hasattr(profiler, "getstats"):
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    if hasattr(profiler, "output_text"):
+        return profiler.output_text()
+    return str(profiler)
+
+
+def _pick(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+class PerfRecorder:
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, trace: RequestTrace, event: str = "rank") -> Dict[str, Any]:
+        d = {"event": event, **trace.to_dict()}
+        with self._lock:
+            self._traces.append(d)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(d, sort_keys=True))
+        return d
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._traces)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        # one row per event and stage (and "total"): sample count and
+        # p50/p90/p99 in ms
+        samples: Dict[Tuple[str, str], List[float]] = {}
+        for d in sorted(self.recent(), key=lambda d: d["event"]):
+            samples.setdefault((d["event"], "total"), []).append(d["total_ms"])
+            for name, ms in d["stages_ms"].items():
+                samples.setdefault((d["event"], name), []).append(ms)
+        rows = []
+        for (event, name), values in samples.items():
+            values.sort()
+            rows.append({
+                "event": event,
+                "stage": name,
+                "n": len(values),
+                "p50_ms": _pick(values, 50),
+                "p90_ms": _pick(values, 90),
+                "p99_ms": _pick(values, 99),
+            })
+        return rows
+
+    def counter_totals(self) -> Dict[str, Dict[str, int]]:
+        # event -> counter -> total
+        totals: Dict[str, Dict[str, int]] = {}
+        for d in self.recent():
+            event = totals.setdefault(d["event"], {})
+            for name, n in d["counters"].items():
+                event[name] = event.get(name, 0) + n
+        return totals
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
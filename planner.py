@@ -0,0 +1,117 @@
+# Meal planning: pick n recipes whose combined missing ingredients (what the
+# page lists under "You might be missing") make the shortest shopping list.
+#
+# Greedy, evaluated lazily: each step takes the recipe adding the fewest new
+# ingredients to the list, better scores first on ties. What a recipe adds
+# only shrinks as the list grows, so a heap key stores "adds + list size"
+# from when it was counted, which bounds the same sum now from below. A
+# popped recipe whose recount matches its key therefore beats everything
+# still in the heap; otherwise it goes back with the fresh key. Missing sets
+# are bitsets over the vocabulary, so a recount is an & and a popcount.
+# Whatever remains of the time budget goes to swapping planned recipes for
+# candidates that shorten the list.
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Set
+
+from catalog import CATEGORIES, IngredientIndex
+
+DEFAULT_DAYS = 7
+DEFAULT_BUDGET = 0.5  # seconds
+SWAP_POOL = 512  # candidates with the fewest missing ingredients, tried in swaps
+
+
+@dataclass
+class PlanStats:
+    candidates: int = 0
+    evaluations: int = 0  # missing-set recounts during the greedy pass
+    swaps: int = 0
+    rounds: int = 0  # swap rounds over the whole plan
+    timed_out: bool = False
+
+
+@dataclass
+class Plan:
+    recipes: List[int]  # recipe ids in the order picked
+    shopping: int  # ingredient id mask of everything to buy
+    stats: PlanStats
+
+
+def plan_meals(
+    index: IngredientIndex,
+    have_by_cat: Dict[str, Set[str]],
+    candidates: Iterable[int],
+    score: Callable[[int], float],
+    n: int = DEFAULT_DAYS,
+    budget: float = DEFAULT_BUDGET,
+) -> Plan:
+    # candidates: recipe ids allowed in the plan; score: recipe id -> its
+    # ranking score for this pantry (breaks ties between equal lists)
+    deadline = time.perf_counter() + budget
+    stats = PlanStats()
+    records = index.records
+    have_all = index.vocab.mask(x for cat in CATEGORIES for x in have_by_cat.get(cat, ()))
+
+    missing: Dict[int, int] = {}
+    heap = []
+    for rid in candidates:
+        m = missing[rid] = records[rid].missing(have_all)
+        heap.append((m.bit_count(), -score(rid), rid))
+    heapq.heapify(heap)
+    stats.candidates = len(heap)
+
+    picked: List[int] = []
+    titles: Set[str] = set()  # one of each dish per plan
+    shopping = 0
+    size = 0
+    while heap and len(picked) < n:
+        key, neg_score, rid = heapq.heappop(heap)
+        if records[rid].title in titles:
+            continue
+        stats.evaluations += 1
+        key_now = (missing[rid] & ~shopping).bit_count() + size
+        if key_now != key:
+            heapq.heappush(heap, (key_now, neg_score, rid))
+            continue
+        picked.append(rid)
+        titles.add(records[rid].title)
+        shopping |= missing[rid]
+        size = shopping.bit_count()
+
+    if len(picked) > 1 and time.perf_counter() < deadline:
+        pool = heapq.nsmallest(SWAP_POOL, missing, key=lambda rid: (missing[rid].bit_count(), -score(rid), rid))
+        shopping = _improve(picked, pool, missing, records, deadline, stats)
+    else:
+        stats.timed_out = len(picked) > 1
+    return Plan(picked, shopping, stats)
+
+
+def _improve(picked: List[int], pool: List[int], missing: Dict[int, int], records, deadline: float, stats: PlanStats) -> int:
+    # first-improvement swaps until a full round changes nothing (or time
+    # runs out); returns the final shopping mask
+    improved = True
+    while improved:
+        improved = False
+        stats.rounds += 1
+        for i, rid in enumerate(picked):
+            rest = 0
+            for j, other in enumerate(picked):
+                if j != i:
+                    rest |= missing[other]
+            current = (rest | missing[rid]).bit_count()
+            taken = {records[other].title for j, other in enumerate(picked) if j != i}
+            for c in pool:
+                if (rest | missing[c]).bit_count() < current and c not in picked and records[c].title not in taken:
+                    picked[i] = c
+                    stats.swaps += 1
+                    improved = True
+                    break
+            if time.perf_counter() >= deadline:
+                stats.timed_out = True
+                improved = False
+                break
+    shopping = 0
+    for rid in picked:
+        shopping |= missing[rid]
+    return shopping
@@ -0,0 +1,292 @@
+import heapq
+from collections import Counter
+from dataclasses import dataclass
+from itertools import chain
+from typing import List, Dict, Iterable, Optional, Set, Sequence, Tuple, Union
+
+from catalog import (
+    CATEGORIES,
+    SUBSTITUTIONS,
+    WEIGHTS,
+    CompactRecipe,
+    IngredientIndex,
+    Recipe,
+    Vocabulary,
+    norm,
+    pantry_masks,
+)
+
+# Slack when comparing score upper bounds against the heap threshold, so float
+# rounding in the bound sums can never prune a recipe that belongs in the top k
+BOUND_EPS = 1e-9
+
+
+@dataclass(frozen=True)
+class Prefs:
+    cuisine: Tuple[str, ...] = ()
+    diet: str = "no preference"
+    time_limit: int = 25
+    # Only rank recipes meeting all three preferences, instead of scoring
+    # the rest lower (see facets.py)
+    strict: bool = False
+    # Give partial credit for pantry ingredients that can stand in for a
+    # recipe's (butter for ghee; see catalog.substitutes)
+    substitutes: bool = True
+    # Full-text search over titles and steps ("stir-fry", "no oven"); the
+    # engine applies it (see text_search.py), the functions here ignore it
+    search: str = ""
+
+
+def allows(members: Optional[bytes], rid: int) -> bool:
+    # members: a FacetIndex.members() bit array, or None for no filter
+    return members is None or bool(members[rid >> 3] >> (rid & 7) & 1)
+
+
+def apply_prefs(s: float, recipe: Union[Recipe, CompactRecipe], prefs: Prefs) -> float:
+    if prefs.cuisine and recipe.cuisine in prefs.cuisine:
+        s += 0.08
+
+    if prefs.diet != "no preference" and prefs.diet not in recipe.diet:
+        s -= 0.5
+
+    if recipe.time_minutes <= prefs.time_limit:
+        s += 0.05
+    else:
+        s -= 0.05
+
+    return s
+
+
+def coverage_score(have: Set[str], need: List[str], credit: Optional[Dict[str, float]] = None) -> float:
+    # credit: partial credit for ingredients not in `have` (Substitutions.credits_for)
+    if not need:
+        return 0.0
+    credit = credit or {}
+    hits = sum(1 if norm(n) in have else credit.get(norm(n), 0.0) for n in need)
+    return hits / len(need)
+
+
+def score_recipe(recipe: Recipe, have_by_cat: Dict[str, Set[str]], prefs: Prefs) -> float:
+    # Reference scoring straight from the recipe's ingredient lists; the
+    # index-based paths below must produce exactly these values.
+    s = 0.0
+    for cat, w in WEIGHTS.items():
+        need = [norm(x) for x in recipe.ingredients.get(cat, [])]
+        have = {norm(x) for x in have_by_cat.get(cat, set())}
+        credit = SUBSTITUTIONS.credits_for(have) if prefs.substitutes else None
+        s += w * coverage_score(have, need, credit)
+    return apply_prefs(s, recipe, prefs)
+
+
+def score_from_hits(hits: Sequence[float], sizes: Sequence[int]) -> float:
+    # hits: per category, matches plus substitution credit
+    s = 0.0
+    for ci, cat in enumerate(CATEGORIES):
+        s += WEIGHTS[cat] * (hits[ci] / sizes[ci] if sizes[ci] else 0.0)
+    return s
+
+
+def pantry_terms(have_by_cat: Dict[str, Set[str]]) -> List[Tuple[int, str]]:
+    return [(ci, x) for ci, cat in enumerate(CATEGORIES) for x in sorted({norm(x) for x in have_by_cat.get(cat, set())})]
+
+
+def credit_terms(have_by_cat: Dict[str, Set[str]], prefs: Prefs) -> List[Tuple[int, str, float]]:
+    # (category index, recipe ingredient, credit) the pantry earns through
+    # substitutes, when prefs count them
+    return SUBSTITUTIONS.credits(have_by_cat) if prefs.substitutes else []
+
+
+def credit_masks(vocab: Vocabulary, credits: List[Tuple[int, str, float]]) -> List[Tuple[int, float, int]]:
+    # credit_terms grouped by category and credit: (category index, credit, id mask)
+    masks: Dict[Tuple[int, float], int] = {}
+    for ci, x, c in credits:
+        i = vocab.ids.get(x)
+        if i is not None:
+            masks[ci, c] = masks.get((ci, c), 0) | 1 << i
+    return [(ci, c, m) for (ci, c), m in sorted(masks.items())]
+
+
+def credited_hits(rec: CompactRecipe, have_masks: Sequence[int], levels: List[Tuple[int, float, int]]) -> List[float]:
+    # rec.hits plus substitution credit; credits are multiples of
+    # CREDIT_STEP, so these sums are exact whatever order they come in
+    h = rec.hits(have_masks)
+    for ci, c, m in levels:
+        got = rec.masks[ci] & m
+        if got:
+            n = got.bit_count()
+            if rec.repeats:
+                n += sum((layer & m).bit_count() for layer in rec.repeats[ci])
+            h[ci] += c * n
+    return h
+
+
+def score_ids(
+    index: IngredientIndex, have_by_cat: Dict[str, Set[str]], prefs: Prefs, rids: Iterable[int]
+) -> Dict[int, float]:
+    # score_recipe for just the given recipes, from their ingredient bitsets
+    have_masks = pantry_masks(index.vocab, have_by_cat)
+    levels = credit_masks(index.vocab, credit_terms(have_by_cat, prefs))
+    out = {}
+    for rid in rids:
+        rec = index.records[rid]
+        out[rid] = apply_prefs(score_from_hits(credited_hits(rec, have_masks, levels), rec.sizes), rec, prefs)
+    return out
+
+
+def rank_recipes(
+    index: IngredientIndex,
+    have_by_cat: Dict[str, Set[str]],
+    prefs: Prefs,
+    members: Optional[bytes] = None,
+) -> List[Tuple[int, float]]:
+    # Same result as sorting recipes by score_recipe and keeping scores > 0,
+    # but ingredient hits come from the index postings, so only recipes sharing
+    # an ingredient (or a substitute's) with the pantry are looked at, each
+    # scored exactly once.
+    hits: Dict[int, List[float]] = {}
+    terms = [(ci, x, 1) for ci, x in pantry_terms(have_by_cat)] + credit_terms(have_by_cat, prefs)
+    for ci, x, c in terms:
+        for rid in index.postings[CATEGORIES[ci]].get(x, ()):
+            hits.setdefault(rid, [0] * len(CATEGORIES))[ci] += c
+
+    scored = []
+    for rid, r in enumerate(index.records):
+        if not allows(members, rid):
+            continue
+        h = hits.get(rid)
+        s = score_from_hits(h, r.sizes) if h is not None else 0.0
+        # recipes without any overlap only carry the preference adjustments
+        s = apply_prefs(s, r, prefs)
+        if s > 0:
+            scored.append((rid, s))
+
+    scored.sort(key=lambda t: t[1], reverse=True)
+    return scored
+
+
+@dataclass
+class TopKStats:
+    terms: int = 0  # pantry ingredients that have postings
+    essential_terms: int = 0  # terms whose postings were walked
+    candidates: int = 0  # recipes reached through essential postings
+    scored: int = 0  # recipes given an exact score
+    pruned: int = 0  # candidates skipped because their upper bound was below the threshold
+    groups: int = 0  # (cuisine, diet, time) groups visited for recipes with no overlap
+    filtered: int = 0  # candidates dropped by a strict filter before scoring
+
+
+def top_k(
+    index: IngredientIndex,
+    have_by_cat: Dict[str, Set[str]],
+    k: int,
+    prefs: Prefs,
+    members: Optional[bytes] = None,
+) -> Tuple[List[Tuple[int, float]], TopKStats]:
+    # MaxScore-style top k: returns rank_recipes(...)[:k] without scoring every
+    # recipe. Ties are broken by catalog order, like the stable full sort.
+    # With members, only recipes in that filter are considered.
+    stats = TopKStats()
+    if k <= 0:
+        return [], stats
+
+    # A recipe's score with no ingredient hits depends only on its
+    # (cuisine, diet, time) group, and hits can only raise it. A filter can
+    # drop single recipes (a search's exclusions), so groups keep only the
+    # recipes it allows.
+    groups = index.groups.values()
+    if members is not None:
+        groups = [[rid for rid in rids if allows(members, rid)] for rids in groups]
+    group_adj = sorted(
+        ((apply_prefs(0.0, index.records[rids[0]], prefs), rids) for rids in groups if rids),
+        key=lambda t: t[0],
+        reverse=True,
+    )
+    max_adj = group_adj[0][0] if group_adj else 0.0
+
+    # k-th best preference-only score over all recipes is a lower bound for the
+    # final k-th best score, so anything that cannot reach it can be skipped.
+    floor = 0.0
+    seen = 0
+    for adj, rids in group_adj:
+        if adj <= 0:
+            break
+        seen += len(rids)
+        if seen >= k:
+            floor = adj
+            break
+
+    # a substitute's credit scales what its postings can add
+    credits = credit_terms(have_by_cat, prefs)
+    terms = []
+    for ci, x, c in [(ci, x, 1) for ci, x in pantry_terms(have_by_cat)] + credits:
+        cat = CATEGORIES[ci]
+        postings = index.postings[cat].get(x)
+        if postings:
+            terms.append((c * index.bounds[cat][x], ci, postings))
+    terms.sort(key=lambda t: t[0])
+    stats.terms = len(terms)
+
+    # Non-essential terms: the cheapest prefix whose bounds together (plus the
+    # best preference bonus) cannot lift a recipe to the floor on their own.
+    split = 0
+    rest = 0.0
+    while split < len(terms) and rest + terms[split][0] + max_adj + BOUND_EPS < floor:
+        rest += terms[split][0]
+        split += 1
+    essential = terms[split:]
+    stats.essential_terms = len(essential)
+
+    # One C-level pass over the essential postings counts ingredient hits per
+    # recipe; each hit adds at most index.peaks[rid] to the coverage part
+    # (a substitute's, less).
+    counts = Counter(chain.from_iterable(postings for _, _, postings in essential))
+    if members is not None:
+        reached = len(counts)
+        counts = Counter({rid: c for rid, c in counts.items() if members[rid >> 3] >> (rid & 7) & 1})
+        stats.filtered = reached - len(counts)
+    stats.candidates = len(counts)
+    bounded = sorted(((c * index.peaks[rid], rid) for rid, c in counts.items()), reverse=True)
+    have_masks = pantry_masks(index.vocab, have_by_cat)
+    levels = credit_masks(index.vocab, credits)
+    touch_masks = list(have_masks)  # anything earning a recipe credit
+    for ci, _, m in levels:
+        touch_masks[ci] |= m
+
+    heap: List[Tuple[float, int]] = []  # (score, -rid); heap[0] is the current k-th best
+
+    def push(s: float, rid: int):
+        item = (s, -rid)
+        if s <= 0:
+            return
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    for i, (ub, rid) in enumerate(bounded):
+        threshold = max(floor, heap[0][0]) if len(heap) == k else floor
+        if ub + rest + max_adj + BOUND_EPS < threshold:
+            stats.pruned = len(bounded) - i
+            break
+        rec = index.records[rid]
+        stats.scored += 1
+        s = apply_prefs(score_from_hits(credited_hits(rec, have_masks, levels), rec.sizes), rec, prefs)
+        push(s, rid)
+
+    # Recipes sharing no ingredient with the pantry score their group's
+    # preference-only value; walk groups best first and stop once they lose.
+    in_heap = {-nrid for _, nrid in heap}
+    for adj, rids in group_adj:
+        if adj <= 0 or (len(heap) == k and adj < heap[0][0]):
+            break
+        stats.groups += 1
+        for rid in rids:
+            if len(heap) == k and (adj, -rid) <= heap[0]:
+                break
+            if rid in in_heap or any(m & have for m, have in zip(index.records[rid].masks, touch_masks)):
+                continue
+            push(adj, rid)
+            in_heap.add(rid)
+
+    ranked = sorted(heap, reverse=True)
+    return [(-nrid, s) for s, nrid in ranked], stats
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+from catalog import CATEGORIES, norm
+from ranking import Prefs
+from text_search import parse_query
+
+
+def pantry_fingerprint(have_by_cat: Dict[str, Set[str]], prefs: Prefs) -> Tuple:
+    # Same ranking inputs -> same key, whatever the selection order, case or synonym used.
+    return (
+        tuple(tuple(sorted({norm(x) for x in have_by_cat.get(cat, set())})) for cat in CATEGORIES),
+        tuple(sorted(set(prefs.cuisine))),
+        prefs.diet,
+        int(prefs.time_limit),
+        bool(prefs.strict),
+        bool(prefs.substitutes),
+        parse_query(prefs.search),
+    )
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # dropped to stay within max_entries
+    expirations: int = 0  # dropped because they outlived the TTL
+    invalidations: int = 0  # full clears on a catalog version change
+
+
+class ResultCache:
+    # Bounded LRU + TTL cache of ranked results, shared across sessions.
+    # Entries belong to one catalog version; a lookup or store under a new
+    # version clears everything cached for the old one.
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            stored, value = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, version: str, key: Hashable, value: Any):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,343 @@
+# JSON recommendation service for clients that cannot drive the Streamlit
+# page: a small asyncio HTTP/1.1 server (keep-alive, no dependencies beyond
+# the standard library) in front of the headless engine.
+#
+#     python service.py [--host 127.0.0.1] [--port 8080] [--catalog recipes.jsonl]
+#
+#   POST /rank        query object (see engine.query_from_dict)
+#                     -> {"version": ..., "results": [suggestion, ...], "corrections": {typed: ingredient}}
+#                     (pantry entries the catalog does not know are matched
+#                     typo-tolerantly; "corrections" lists those guesses)
+#   POST /rank/batch  {"queries": [query, ...]}
+#                     -> {"version": ..., "results": [{"results": [...]} | {"error": "..."}, ...]}
+#   POST /unlock      query object plus "size" (1-3, default 2) and "threshold"
+#                     (coverage, default 0.6); "k" is how many sets per size
+#                     -> {"version": ..., "results": [{"ingredients": [...], "recipes": n, "examples": [...]}, ...]}
+#   POST /similar     query object plus "id" (a suggestion's) and the "version"
+#                     it came with; 409 once that version is gone. "k"
+#                     (default 5) recipes with the most similar ingredients,
+#                     scored by Jaccard similarity
+#                     -> {"version": ..., "results": [suggestion, ...]}
+#   POST /plan        query object plus "days" (default 7): that many recipes
+#                     with the shortest combined shopping list; cuisine, diet
+#                     and time always filter
+#                     -> {"version": ..., "meals": [suggestion, ...], "shopping": [{"ingredient": ..., "meals": n}, ...]}
+#   GET  /health      -> {"status": "ok", "version": ..., "recipes": n}
+#   GET  /stats       -> per-stage latency percentiles and counters over recent requests
+#
+# Suggestions carry the score, the missing-ingredient list and the YouTube
+# search link, exactly as the page renders them.
+#
+# Ranking is CPU-bound and must not stall the event loop, so requests are
+# queued to a micro-batcher: everything waiting (up to MAX_BATCH) is ranked in
+# one executor call, which keeps thread hand-offs per request low under load
+# and lets repeated pantries in a burst hit the result cache.
+import argparse
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import CATALOG_PATH, CatalogStore
+from engine import Engine, query_from_dict
+from planner import DEFAULT_DAYS
+from unlock import DEFAULT_THRESHOLD
+
+# Seconds to hold a batch open for more requests. 0 still batches: whatever
+# queued up while the previous batch was ranking goes out together.
+BATCH_WINDOW = 0.0
+MAX_BATCH = 64
+MAX_BATCH_QUERIES = 1000  # per /rank/batch request
+MAX_BODY = 1 << 20
+MAX_PLAN_DAYS = 31
+MAX_HEADER = 16 << 10
+
+logger = logging.getLogger("recipe_bot.service")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class BatcherStats:
+    requests: int = 0
+    batches: int = 0
+
+
+class Batcher:
+    # Collects queries from concurrent requests and ranks them together in
+    # the default executor; each caller awaits its own future.
+    def __init__(self, engine: Engine, window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = BatcherStats()
+        self._queue: "asyncio.Queue[Tuple[Any, asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def rank(self, query: Any) -> Dict[str, Any]:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.stats.requests += len(batch)
+            self.stats.batches += 1
+            try:
+                results = await loop.run_in_executor(None, self._rank_all, [q for q, _ in batch])
+            except Exception as e:  # never leave a caller hanging
+                logger.exception("batch failed")
+                results = [{"error": f"internal error: {e}", "status": 500}] * len(batch)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def _rank_all(self, queries: List[Any]) -> List[Dict[str, Any]]:
+        # one catalog for the whole batch, so a reload never splits it
+        catalog = self.engine.catalog()
+        out = []
+        for q in queries:
+            try:
+                pantry, prefs, k = query_from_dict(q, parse_text=self.engine.parse_pantry)
+                results = [s.to_dict() for s in self.engine.rank(pantry, prefs, k, catalog=catalog)]
+                corrections = self.engine.corrections(pantry, catalog)
+                out.append({"version": catalog.version, "results": results, "corrections": corrections})
+            except ValueError as e:
+                out.append({"error": str(e)})
+            except Exception as e:  # a failing query must not fail the rest of the batch
+                logger.exception("ranking failed")
+                out.append({"error": f"internal error: {e}", "status": 500})
+        return out
+
+
+class Service:
+    def __init__(self, engine: Engine, batch_window: float = BATCH_WINDOW):
+        self.engine = engine
+        self.batcher = Batcher(engine, batch_window)
+
+    async def handle(self, method: str, path: str, body: bytes) -> Dict[str, Any]:
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            catalog = self.engine.catalog()
+            return {"status": "ok", "version": catalog.version, "recipes": len(catalog.index.records)}
+        if path == "/stats":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return {
+                "stages": self.engine.perf.summary(),
+                "counters": self.engine.perf.counter_totals(),
+                "batches": vars(self.batcher.stats),
+            }
+        if path not in ("/rank", "/rank/batch", "/unlock", "/similar", "/plan"):
+            raise HTTPError(404, f"no such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"invalid JSON: {e}") from None
+
+        if path == "/unlock":
+            # rarer and heavier than /rank, so it skips the batcher
+            return await asyncio.get_running_loop().run_in_executor(None, self._unlock, payload)
+        if path == "/similar":
+            return await asyncio.get_running_loop().run_in_executor(None, self._similar, payload)
+        if path == "/plan":
+            return await asyncio.get_running_loop().run_in_executor(None, self._plan, payload)
+
+        if path == "/rank":
+            result = await self.batcher.rank(payload)
+            if "error" in result:
+                raise HTTPError(result.get("status", 400), result["error"])
+            return result
+
+        queries = payload.get("queries") if isinstance(payload, dict) else None
+        if not isinstance(queries, list):
+            raise HTTPError(400, "expected {\"queries\": [...]}")
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise HTTPError(413, f"at most {MAX_BATCH_QUERIES} queries per batch")
+        results = await asyncio.gather(*(self.batcher.rank(q) for q in queries))
+        versions = {r.get("version") for r in results} - {None}
+        return {
+            "version": versions.pop() if len(versions) == 1 else None,
+            "results": [{k: v for k, v in r.items() if k not in ("version", "status")} for r in results],
+        }
+
+    def _unlock(self, payload: Any) -> Dict[str, Any]:
+        catalog = self.engine.catalog()
+        try:
+            pantry, prefs, k = query_from_dict(payload, default_k=5, parse_text=self.engine.parse_pantry)
+            try:
+                size = int(payload.get("size", 2))
+                threshold = float(payload.get("threshold", DEFAULT_THRESHOLD))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError("size must be an integer and threshold a number") from None
+            if not 0 < threshold <= 1:
+                raise ValueError("threshold must be in (0, 1]")
+            unlocks = self.engine.unlock(pantry, prefs, size, threshold, k, catalog=catalog)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        return {"version": catalog.version, "results": [u.to_dict(catalog.index) for u in unlocks]}
+
+    def _similar(self, payload: Any) -> Dict[str, Any]:
+        catalog = self.engine.catalog()
+        try:
+            pantry, prefs, k = query_from_dict(payload, default_k=5, parse_text=self.engine.parse_pantry)
+            rid, version = payload.get("id"), payload.get("version")
+            if not isinstance(rid, int) or isinstance(rid, bool):
+                raise ValueError("id must be an integer")
+            if version is not None and version != catalog.version:
+                raise HTTPError(409, "the catalog has changed since that suggestion; rank again")
+            results = self.engine.similar(rid, pantry, prefs, k, catalog=catalog)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        return {"version": catalog.version, "results": [s.to_dict() for s in results]}
+
+    def _plan(self, payload: Any) -> Dict[str, Any]:
+        catalog = self.engine.catalog()
+        try:
+            pantry, prefs, _ = query_from_dict(payload, parse_text=self.engine.parse_pantry)
+            try:
+                days = int(payload.get("days", DEFAULT_DAYS))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError("days must be an integer") from None
+            if not 0 < days <= MAX_PLAN_DAYS:
+                raise ValueError(f"days must be between 1 and {MAX_PLAN_DAYS}")
+            plan = self.engine.plan(pantry, prefs, days, catalog=catalog)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        return {"version": catalog.version, **plan.to_dict()}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, {"error": "headers too large"}, keep_alive=False)
+                    break
+                keep_alive = True
+                try:
+                    method, path, headers = parse_head(head)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise HTTPError(400, "bad Content-Length")
+                    if length > MAX_BODY:
+                        keep_alive = False  # the unread body makes the stream unusable
+                        raise HTTPError(413, "request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = 200, await self.handle(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError:
+                    status, payload, keep_alive = 400, {"error": "malformed request"}, False
+                except Exception as e:  # answer rather than drop the connection
+                    logger.exception("request failed")
+                    status, payload = 500, {"error": f"internal error: {e}"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def parse_head(head: bytes) -> Tuple[str, str, Dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target.split("?", 1)[0], headers
+
+
+async def serve(
+    engine: Engine,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    batch_window: float = BATCH_WINDOW,
+    ready: Optional[asyncio.Event] = None,
+):
+    service = Service(engine, batch_window)
+    service.batcher.start()
+    server = await asyncio.start_server(service.serve_client, host, port, limit=MAX_HEADER)
+    try:
+        async with server:
+            if ready is not None:
+                ready.set()
+            await server.serve_forever()
+    finally:
+        await service.batcher.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve recipe suggestions as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="seconds to hold a batch open")
+    parser.add_argument("--log-level", default="WARNING", help="INFO logs per-request timings as JSON lines")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+
+    engine = Engine(CatalogStore(args.catalog))
+    engine.warm()
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(engine, args.host, args.port, args.batch_window))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
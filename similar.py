@@ -0,0 +1,202 @@
+# "More like this": recipes whose ingredient sets (every category together)
+# overlap most with a given recipe's, by Jaccard similarity.
+#
+# Small catalogs are scanned exactly. Larger ones go through MinHash with
+# LSH banding: a recipe's signature is the minimum of each of SIGNATURE
+# hash functions over its ingredient ids, and two recipes share a band's
+# bucket when that band's ROWS signature values all agree, which happens
+# with probability J ** ROWS for Jaccard similarity J. With BANDS bands a
+# pair at J = 0.3 (a typical close neighbour here) meets in some band about
+# 60% of the time and a pair at J = 0.05 (a typical unrelated recipe) 0.4%,
+# so a query only looks at a small slice of the catalog. Candidates are then
+# ranked by their exact Jaccard, read off the ingredient bitsets.
+#
+# Buckets built in bulk (with numpy) are sorted key arrays, binary-searched
+# per band. Recipes indexed one at a time go to per-band dicts until enough
+# pile up to be merged into the arrays; without numpy everything does.
+# Recipes without ingredients resemble nothing and are not bucketed.
+import copy
+import heapq
+import random
+from typing import Dict, List, Optional, Tuple
+
+from catalog import CATEGORIES, IngredientIndex, bit_ids
+from ranking import allows
+
+ROWS = 3
+BANDS = 32
+SIGNATURE = ROWS * BANDS
+EXACT_MAX = 2000  # catalogs up to this size are scanned exactly
+BULK_MIN = 1024  # fewer new recipes than this are bucketed one at a time
+SEED = 20240611
+
+_PRIME = (1 << 31) - 1  # hash values fit in 31 bits, so a * x + b fits in 64
+_MIX = 0x100000001B3
+_MASK = (1 << 64) - 1
+
+_rng = random.Random(SEED)
+_A = [_rng.randrange(1, _PRIME) for _ in range(SIGNATURE)]
+_B = [_rng.randrange(_PRIME) for _ in range(SIGNATURE)]
+del _rng
+
+
+def band_keys(need: int) -> List[int]:
+    # one bucket key per band for a non-empty ingredient id mask
+    ids = bit_ids(need)
+    sig = [min((a * x + b) % _PRIME for x in ids) for a, b in zip(_A, _B)]
+    keys = []
+    for start in range(0, SIGNATURE, ROWS):
+        key = 0
+        for v in sig[start:start + ROWS]:
+            key = ((key * _MIX) & _MASK) ^ v
+        keys.append(key)
+    return keys
+
+
+def jaccard(a: int, b: int) -> float:
+    union = (a | b).bit_count()
+    return (a & b).bit_count() / union if union else 0.0
+
+
+def _bulk_keys(index: IngredientIndex, start: int, stop: int, chunk: int = 4096):
+    # band_keys for the non-empty recipes among start..stop, vectorized:
+    # (recipe ids, keys as an (n, BANDS) uint64 array). The (recipe,
+    # ingredient) pairs come from the postings, so no record is decoded.
+    import numpy as np
+
+    pair_rids, pair_ids = [], []
+    for cat in CATEGORIES:
+        for x, rids in index.postings[cat].items():
+            rids = np.asarray(rids, dtype=np.int64)
+            pair_rids.append(rids)
+            pair_ids.append(np.full(len(rids), index.vocab.ids[x], dtype=np.int64))
+    if not pair_rids:
+        return np.zeros(0, dtype=np.uint32), np.zeros((0, BANDS), dtype=np.uint64)
+    rids, ids = np.concatenate(pair_rids), np.concatenate(pair_ids)
+    keep = (rids >= start) & (rids < stop)
+    rids, ids = rids[keep], ids[keep]
+    order = np.argsort(rids, kind="stable")
+    rids, ids = rids[order], ids[order]
+    firsts = np.flatnonzero(np.concatenate(([True], rids[1:] != rids[:-1]))) if len(rids) else np.zeros(0, dtype=np.int64)
+
+    a = np.array(_A, dtype=np.uint64)
+    b = np.array(_B, dtype=np.uint64)
+    table = ((np.arange(len(index.vocab), dtype=np.uint64)[:, None] * a + b) % np.uint64(_PRIME)).astype(np.uint32)
+    mix = np.uint64(_MIX)
+    keys = np.zeros((len(firsts), BANDS), dtype=np.uint64)
+    bounds = np.append(firsts, len(rids))
+    for lo in range(0, len(firsts), chunk):
+        hi = min(lo + chunk, len(firsts))
+        pairs = slice(bounds[lo], bounds[hi])
+        sig = np.minimum.reduceat(table[ids[pairs]], firsts[lo:hi] - bounds[lo], axis=0).astype(np.uint64)
+        for band in range(BANDS):
+            key = np.zeros(hi - lo, dtype=np.uint64)
+            for j in range(band * ROWS, band * ROWS + ROWS):
+                key = (key * mix) ^ sig[:, j]  # uint64 wraps like & _MASK
+            keys[lo:hi, band] = key
+    return rids[firsts].astype(np.uint32), keys
+
+
+class SimilarIndex:
+    # Covers index.records[:size]; update() takes in whatever was appended
+    # since (IndexBuilder.add), so a growing catalog is never re-hashed.
+    def __init__(self, index: IngredientIndex):
+        self.index = index
+        self.size = 0
+        self.bucketed = 0  # records[:bucketed] are in the buckets
+        # per band: (sorted keys, recipe ids in key order), or None before
+        # the first bulk load
+        self._sorted: Optional[List[Tuple[object, object]]] = None
+        self._recent: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+        self._recent_rids: List[int] = []
+        self.update()
+
+    def update(self):
+        self.size = len(self.index.records)
+        if self.size <= EXACT_MAX:
+            return  # scanned exactly; bucketed once the catalog outgrows that
+        if len(self._recent_rids) + self.size - self.bucketed >= BULK_MIN:
+            try:
+                self._merge()
+                return
+            except ImportError:
+                pass  # no numpy: bucket one at a time
+        for rid in range(self.bucketed, self.size):
+            need = self.index.records[rid].need
+            if need:
+                for buckets, key in zip(self._recent, band_keys(need)):
+                    buckets.setdefault(key, []).append(rid)
+                self._recent_rids.append(rid)
+        self.bucketed = self.size
+
+    def _merge(self):
+        # the recent recipes and everything not yet bucketed, merged into
+        # the arrays
+        import numpy as np
+
+        rids, keys = _bulk_keys(self.index, self.bucketed, self.size)
+        if self._recent_rids:
+            recent_keys = [band_keys(self.index.records[rid].need) for rid in self._recent_rids]
+            rids = np.concatenate((np.array(self._recent_rids, dtype=np.uint32), rids))
+            keys = np.concatenate((np.array(recent_keys, dtype=np.uint64), keys))
+        merged = []
+        for band in range(BANDS):
+            band_rids, by_band = rids, keys[:, band]
+            if self._sorted is not None:
+                prev_keys, prev_rids = self._sorted[band]
+                by_band = np.concatenate((prev_keys, by_band))
+                band_rids = np.concatenate((prev_rids, band_rids))
+            order = np.argsort(by_band, kind="stable")
+            merged.append((by_band[order], band_rids[order]))
+        self._sorted = merged
+        self._recent = [{} for _ in range(BANDS)]
+        self._recent_rids = []
+        self.bucketed = self.size
+
+    def extended(self, index: IngredientIndex) -> Optional["SimilarIndex"]:
+        # An index over `index` reusing these buckets, when its first
+        # self.size recipes have the same ingredient sets as ours (an
+        # appended-to catalog); None otherwise. This one stays as it is.
+        old, new = self.index.records, index.records
+        if len(new) < self.size or any(old[rid].need != new[rid].need for rid in range(self.size)):
+            return None
+        twin = copy.copy(self)
+        twin.index = index
+        twin._recent = [{key: list(rids) for key, rids in buckets.items()} for buckets in self._recent]
+        twin._recent_rids = list(self._recent_rids)
+        twin.update()
+        return twin
+
+    def candidates(self, need: int) -> List[int]:
+        # recipes sharing a bucket with `need` in at least one band
+        if self.size <= EXACT_MAX:
+            return list(range(self.size))
+        if not need:
+            return []
+        found = set()
+        keys = band_keys(need)
+        if self._sorted is not None:
+            import numpy as np
+
+            for (sorted_keys, rids), key in zip(self._sorted, keys):
+                key = np.uint64(key)
+                lo = np.searchsorted(sorted_keys, key, "left")
+                hi = np.searchsorted(sorted_keys, key, "right")
+                if hi > lo:
+                    found.update(rids[lo:hi].tolist())
+        for buckets, key in zip(self._recent, keys):
+            found.update(buckets.get(key, ()))
+        return sorted(found)
+
+    def similar(self, rid: int, k: int = 5, members: Optional[bytes] = None) -> List[Tuple[int, float]]:
+        # (recipe id, Jaccard similarity) for up to k recipes most like rid,
+        # most similar first (ties in catalog order); members as in ranking
+        records = self.index.records
+        need = records[rid].need
+        scored = []
+        for other in self.candidates(need):
+            b = records[other].need
+            shared = (need & b).bit_count()
+            if shared and other != rid and (members is None or allows(members, other)):
+                scored.append((-shared / (need | b).bit_count(), other))
+        return [(other, -nj) for nj, other in heapq.nsmallest(k, scored)]
@@ -0,0 +1,283 @@
+# Compiled catalog snapshots: the normalized catalog, its vocabulary and the
+# ranking index in one versioned binary file. Every section is a flat array,
+# so opening a snapshot only mmaps the file and slices views out of it;
+# recipe records are decoded on first use.
+#
+#     python snapshot.py [catalog.jsonl|catalog.csv] [-o out.rbsnap]
+import argparse
+import collections.abc
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import List, Dict, FrozenSet, Iterator, Optional, Sequence, Tuple
+
+from catalog import (
+    CATALOG_PATH,
+    CATEGORIES,
+    DIETS,
+    WEIGHTS,
+    CompactRecipe,
+    IngredientIndex,
+    Vocabulary,
+    id_layers,
+    load_catalog,
+    substitutes,
+    synonyms,
+)
+
+SNAPSHOT_VERSION = 1
+MAGIC = b"RBSNAP\0\0"
+BYTE_ORDER_MARK = 0x01020304
+
+# magic, version, byte order mark, section count, source digest
+HEADER = struct.Struct("<8sIII32s")
+# name, array typecode, byte offset, item count
+SECTION = struct.Struct("<16s8sQQ")
+
+DIET_ORDER = sorted(DIETS)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def snapshot_path_for(catalog_path: str) -> str:
+    return os.path.splitext(catalog_path)[0] + ".rbsnap"
+
+
+def source_digest(catalog_path: str) -> bytes:
+    # Anything the compiled index depends on goes in here, so editing the
+    # catalog, the synonyms table or the weights invalidates old snapshots.
+    # Substitutions are in too: catalog versions key cached scores.
+    h = hashlib.sha256()
+    h.update(f"v{SNAPSHOT_VERSION}".encode())
+    h.update(json.dumps([synonyms, substitutes, CATEGORIES, WEIGHTS, DIET_ORDER], sort_keys=True).encode())
+    with open(catalog_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+# ---- Writing ----
+def _strings(values: Sequence[str]) -> Tuple[array, array]:
+    blob, offs = bytearray(), array("Q", [0])
+    for v in values:
+        blob += v.encode("utf-8")
+        offs.append(len(blob))
+    return array("B", blob), offs
+
+
+def _diet_bits(diet: FrozenSet[str]) -> int:
+    return sum(1 << i for i, d in enumerate(DIET_ORDER) if d in diet)
+
+
+def write_snapshot(index: IngredientIndex, path: str, digest: bytes):
+    records, vocab = index.records, index.vocab
+    cuisines = sorted({rec.cuisine for rec in records})
+    cuisine_ids = {c: i for i, c in enumerate(cuisines)}
+
+    sections: Dict[str, array] = {}
+    sections["vocab"], sections["vocab_offs"] = _strings(vocab.names)
+    sections["titles"], sections["title_offs"] = _strings([rec.title for rec in records])
+    sections["cuisines"], sections["cuisine_offs"] = _strings(cuisines)
+    sections["steps"], sections["steps_offs"] = _strings([s for rec in records for s in rec.steps])
+
+    step_counts = array("Q", [0])
+    need_offs, need_ids = array("Q", [0]), array("I")
+    for rec in records:
+        step_counts.append(step_counts[-1] + len(rec.steps))
+        for ci in range(len(CATEGORIES)):
+            need_ids.extend(rec.ingredient_ids(ci))
+            need_offs.append(len(need_ids))
+    sections["recipe_steps"] = step_counts
+    sections["need_offs"], sections["need_ids"] = need_offs, need_ids
+    sections["sizes"] = array("I", [n for rec in records for n in rec.sizes])
+    sections["time"] = array("i", [rec.time_minutes for rec in records])
+    sections["cuisine"] = array("I", [cuisine_ids[rec.cuisine] for rec in records])
+    sections["diet"] = array("B", [_diet_bits(rec.diet) for rec in records])
+    sections["peaks"] = array("d", index.peaks)
+
+    # postings and bounds are dense over (category, ingredient id)
+    post_offs, post_rids, bounds = array("Q", [0]), array("I"), array("d")
+    for cat in CATEGORIES:
+        for name in vocab.names:
+            post_rids.extend(index.postings[cat].get(name, ()))
+            post_offs.append(len(post_rids))
+            bounds.append(index.bounds[cat].get(name, 0.0))
+    sections["post_offs"], sections["post_rids"], sections["bounds"] = post_offs, post_rids, bounds
+
+    group_keys, group_offs, group_rids = array("I"), array("Q", [0]), array("I")
+    for (cuisine, diet, time_minutes), rids in index.groups.items():
+        group_keys.extend((cuisine_ids[cuisine], _diet_bits(diet), time_minutes))
+        group_rids.extend(rids)
+        group_offs.append(len(group_rids))
+    sections["group_keys"], sections["group_offs"], sections["group_rids"] = group_keys, group_offs, group_rids
+
+    table_end = HEADER.size + SECTION.size * len(sections)
+    offset = (table_end + 7) & ~7
+    table, layout = [], []
+    for name, arr in sections.items():
+        table.append(SECTION.pack(name.encode(), arr.typecode.encode(), offset, len(arr)))
+        layout.append((offset, arr))
+        offset = (offset + len(arr) * arr.itemsize + 7) & ~7
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, BYTE_ORDER_MARK, len(sections), digest))
+        f.write(b"".join(table))
+        for off, arr in layout:
+            f.write(b"\0" * (off - f.tell()))
+            arr.tofile(f)
+    os.replace(tmp, path)
+
+
+# ---- Reading ----
+class _StringTable:
+    __slots__ = ("blob", "offs")
+
+    def __init__(self, blob: memoryview, offs: memoryview):
+        self.blob, self.offs = blob, offs
+
+    def __len__(self) -> int:
+        return len(self.offs) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.blob[self.offs[i]:self.offs[i + 1]], "utf-8")
+
+
+class SnapshotRecords(collections.abc.Sequence):
+    # Decodes CompactRecipe records straight from the mapped arrays the
+    # first time each one is touched and keeps them after that.
+    def __init__(self, s: Dict[str, memoryview], cuisines: List[str], diets: List[FrozenSet[str]]):
+        self.s = s
+        self.titles = _StringTable(s["titles"], s["title_offs"])
+        self.steps = _StringTable(s["steps"], s["steps_offs"])
+        self.cuisines = cuisines
+        self.diets = diets
+        self.cache: List[Optional[CompactRecipe]] = [None] * len(s["time"])
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def __getitem__(self, rid: int) -> CompactRecipe:
+        rec = self.cache[rid]
+        if rec is None:
+            rec = self.cache[rid] = self._decode(rid)
+        return rec
+
+    def texts(self) -> Iterator[Tuple[str, Tuple[str, ...]]]:
+        # (title, steps) per recipe, read without decoding (or keeping) records
+        bounds = self.s["recipe_steps"]
+        for rid in range(len(self.cache)):
+            yield self.titles[rid], tuple(self.steps[i] for i in range(bounds[rid], bounds[rid + 1]))
+
+    def _decode(self, rid: int) -> CompactRecipe:
+        s, n = self.s, len(CATEGORIES)
+        offs, ids = s["need_offs"], s["need_ids"]
+        masks, repeats = [], []
+        for ci in range(n):
+            mask, extra = id_layers(ids[offs[rid * n + ci]:offs[rid * n + ci + 1]])
+            masks.append(mask)
+            repeats.append(extra)
+        first, last = s["recipe_steps"][rid], s["recipe_steps"][rid + 1]
+        return CompactRecipe(
+            title=self.titles[rid],
+            cuisine=self.cuisines[s["cuisine"][rid]],
+            time_minutes=s["time"][rid],
+            diet=self.diets[s["diet"][rid]],
+            steps=tuple(self.steps[i] for i in range(first, last)),
+            masks=tuple(masks),
+            repeats=tuple(repeats) if any(repeats) else None,
+            sizes=tuple(s["sizes"][rid * n:(rid + 1) * n]),
+        )
+
+
+def open_snapshot(path: str, digest: Optional[bytes] = None) -> IngredientIndex:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise SnapshotError(f"{path}: truncated snapshot")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = memoryview(mm)
+    magic, version, bom, count, stored = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"{path}: not a version {SNAPSHOT_VERSION} snapshot")
+    if bom != BYTE_ORDER_MARK or sys.byteorder != "little":
+        raise SnapshotError(f"{path}: snapshot was written on a different byte order")
+    if digest is not None and stored != digest:
+        raise SnapshotError(f"{path}: snapshot is stale for the current catalog")
+
+    s: Dict[str, memoryview] = {}
+    for i in range(count):
+        name, typecode, offset, n = SECTION.unpack_from(buf, HEADER.size + i * SECTION.size)
+        typecode = typecode.rstrip(b"\0").decode()
+        end = offset + n * array(typecode).itemsize
+        if end > len(buf):
+            raise SnapshotError(f"{path}: truncated snapshot")
+        s[name.rstrip(b"\0").decode()] = buf[offset:end].cast(typecode)
+
+    vocab_names = _StringTable(s["vocab"], s["vocab_offs"])
+    vocab = Vocabulary(vocab_names[i] for i in range(len(vocab_names)))
+    cuisine_names = _StringTable(s["cuisines"], s["cuisine_offs"])
+    cuisines = [sys.intern(cuisine_names[i]) for i in range(len(cuisine_names))]
+    diets = [frozenset(d for i, d in enumerate(DIET_ORDER) if bits >> i & 1) for bits in range(1 << len(DIET_ORDER))]
+
+    postings: Dict[str, Dict[str, Sequence[int]]] = {cat: {} for cat in CATEGORIES}
+    bounds: Dict[str, Dict[str, float]] = {cat: {} for cat in CATEGORIES}
+    post_offs, post_rids, bound_values = s["post_offs"], s["post_rids"], s["bounds"]
+    v = len(vocab)
+    for ci, cat in enumerate(CATEGORIES):
+        for i, name in enumerate(vocab.names):
+            j = ci * v + i
+            if post_offs[j] != post_offs[j + 1]:
+                postings[cat][name] = post_rids[post_offs[j]:post_offs[j + 1]]
+                bounds[cat][name] = bound_values[j]
+
+    groups: Dict[Tuple[str, FrozenSet[str], int], Sequence[int]] = {}
+    keys, group_offs, group_rids = s["group_keys"], s["group_offs"], s["group_rids"]
+    for g in range(len(group_offs) - 1):
+        key = (cuisines[keys[3 * g]], diets[keys[3 * g + 1]], keys[3 * g + 2])
+        groups[key] = group_rids[group_offs[g]:group_offs[g + 1]]
+
+    return IngredientIndex(
+        vocab=vocab,
+        records=SnapshotRecords(s, cuisines, diets),
+        postings=postings,
+        bounds=bounds,
+        peaks=s["peaks"],
+        groups=groups,
+    )
+
+
+def open_or_compile(catalog_path: str, path: Optional[str] = None) -> Tuple[IngredientIndex, bytes]:
+    path = path or snapshot_path_for(catalog_path)
+    digest = source_digest(catalog_path)
+    try:
+        return open_snapshot(path, digest), digest
+    except (OSError, ValueError):
+        pass  # missing, stale or unreadable: rebuild it below
+    index = load_catalog(catalog_path)
+    try:
+        write_snapshot(index, path, digest)
+    except OSError:
+        pass  # read-only deploys just keep running from the source file
+    return index, digest
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile a recipe catalog into a binary snapshot.")
+    parser.add_argument("catalog", nargs="?", default=CATALOG_PATH)
+    parser.add_argument("-o", "--output", help="snapshot path (default: next to the catalog, .rbsnap)")
+    args = parser.parse_args(argv)
+
+    out = args.output or snapshot_path_for(args.catalog)
+    index = load_catalog(args.catalog)
+    write_snapshot(index, out, source_digest(args.catalog))
+    print(f"{out}: {len(index.records)} recipes, {len(index.vocab)} ingredients")
+
+
+if __name__ == "__main__":
+    main()
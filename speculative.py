@@ -0,0 +1,97 @@
+# Speculative ranking: rank a session's pantry in the background while the
+# user is still picking, so the engine's result cache already holds the
+# answer (keyed by the pantry fingerprint) when they ask for it.
+#
+# Each session has at most one job waiting, and a newer submission replaces
+# it, so bursts of widget changes never pile up work: only the latest inputs
+# of a session are ever ranked. A job already running checks, as each of its
+# stages starts (normalize, filter, score, ...), whether a newer submission
+# or a cancel has come in for its session, and stops there if so.
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from engine import Engine
+from perf import Cancelled, RequestTrace
+from ranking import Prefs
+
+DEFAULT_WORKERS = 2
+
+
+@dataclass
+class SpeculatorStats:
+    submitted: int = 0
+    superseded: int = 0  # replaced by a newer submission before it started
+    abandoned: int = 0  # stopped part way through by a newer submission
+    completed: int = 0
+    failed: int = 0
+
+
+class Speculator:
+    def __init__(self, engine: Engine, workers: int = DEFAULT_WORKERS):
+        self.engine = engine
+        self.workers = workers
+        self.stats = SpeculatorStats()
+        self._pending: "OrderedDict[Hashable, Tuple[Dict[str, List[str]], Prefs, int, int]]" = OrderedDict()
+        # session -> generation of its latest submission, while it has one
+        # waiting or running; anything older is stale
+        self._latest: Dict[Hashable, int] = {}
+        self._generations = itertools.count()
+        self._running = 0
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, session: Hashable, pantry: Dict[str, Iterable[str]], prefs: Prefs, k: int):
+        with self._cond:
+            generation = self._latest[session] = next(self._generations)
+            job = ({cat: list(items) for cat, items in pantry.items()}, prefs, k, generation)
+            if self._pending.pop(session, None) is not None:
+                self.stats.superseded += 1
+            self._pending[session] = job
+            self.stats.submitted += 1
+            self._start_workers()
+            self._cond.notify_all()
+
+    def cancel(self, session: Hashable):
+        with self._cond:
+            self._latest.pop(session, None)
+            if self._pending.pop(session, None) is not None:
+                self.stats.superseded += 1
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"speculator-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                session, (pantry, prefs, k, generation) = self._pending.popitem(last=False)
+                self._running += 1
+            outcome = "completed"
+            try:
+                # a private trace keeps background work out of the request
+                # percentiles; reading the first page of k fetches exactly
+                # what the page will ask the cache for
+                trace = RequestTrace(cancelled=lambda: self._latest.get(session) != generation)
+                self.engine.results(pantry, prefs, trace=trace).page(0, k, trace)
+            except Cancelled:
+                outcome = "abandoned"
+            except Exception:
+                outcome = "failed"  # the real request will rank (and report) it again
+            with self._cond:
+                self._running -= 1
+                if self._latest.get(session) == generation:
+                    del self._latest[session]
+                setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+                self._cond.notify_all()
+
+    def idle(self, timeout: Optional[float] = None) -> bool:
+        # True once nothing is waiting or running (for tests and benchmarks)
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._running, timeout)
@@ -0,0 +1,31 @@
+import io
+import json
+
+from batch import run_batch
+from engine import Engine
+
+
+def test_failing_lines_do_not_stop_the_run(catalog_path, monkeypatch):
+    rank = Engine.rank
+
+    def flaky(self, pantry, *args, **kwargs):
+        if "boom" in pantry.get("others", ()):
+            raise KeyError("boom")
+        return rank(self, pantry, *args, **kwargs)
+
+    monkeypatch.setattr(Engine, "rank", flaky)
+    lines = [
+        json.dumps({"id": 1, "pantry": {"veggies": ["onion"]}}),
+        "{not json",
+        json.dumps({"id": 3, "pantry": {"others": ["boom"]}}),
+        "",
+        json.dumps({"id": 5, "k": -1}),
+        json.dumps({"id": 6, "pantry": {"veggies": ["tomato"]}, "k": 2}),
+    ]
+    out = io.StringIO()
+    assert run_batch(lines, out, catalog_path, workers=1) == 5
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["id"] for r in rows] == [1, None, 3, 5, 6]
+    assert [("results" in r, "error" in r) for r in rows] == [(True, False), (False, True), (False, True), (False, True), (True, False)]
+    assert rows[2]["error"].startswith("internal error")
+    assert len(rows[4]["results"]) == 2
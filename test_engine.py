@@ -0,0 +1,106 @@
+import dataclasses
+
+import pytest
+
+import engine as engine_module
+from catalog import CatalogStore
+from engine import Engine, VersionCache, query_from_dict
+from facets import FacetIndex
+from ranking import Prefs, rank_recipes
+from result_cache import ResultCache
+
+
+@pytest.fixture(params=["matrix", "index", "top_k"])
+def strategy(request):
+    return request.param
+
+
+@pytest.fixture
+def engine(strategy, catalog_path, monkeypatch):
+    # one engine per ranking strategy, whatever this machine has installed
+    if strategy == "matrix":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(engine_module, "HAVE_NUMPY", True)
+    else:
+        monkeypatch.setattr(engine_module, "HAVE_NUMPY", False)
+        monkeypatch.setattr(engine_module, "TOP_K_MIN_RECIPES", 0 if strategy == "top_k" else 1 << 30)
+    return Engine(CatalogStore(catalog_path))
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 25])
+def test_ranked_matches_rank_recipes(engine, strategy, queries, k):
+    catalog = engine.catalog()
+    facets = FacetIndex(catalog.index)
+    for have, prefs in queries:
+        trace = engine_module.RequestTrace()
+        got = engine.ranked(catalog, have, prefs, k, trace)
+        assert trace.labels["strategy"] == strategy
+        members = facets.members(prefs) if prefs.strict else None
+        assert got == rank_recipes(catalog.index, have, prefs, members)[:k]
+        assert engine.ranked(catalog, have, prefs, k) == got  # from the cache
+
+
+def test_stale_catalog_skips_the_cache(catalog_path):
+    eng = Engine(CatalogStore(catalog_path), ResultCache())
+    current = eng.catalog()
+    old = dataclasses.replace(current, version="old")
+    have = {"veggies": {"onion"}}
+    eng.ranked(current, have, Prefs(), 3)
+    for _ in range(3):
+        eng.ranked(old, have, Prefs(), 3)
+        eng.ranked(current, have, Prefs(), 3)
+    assert eng.cache.stats.invalidations == 0
+    assert eng.cache.stats.hits == 3
+
+
+def test_version_cache_keeps_recent_versions(catalog_path):
+    builds = []
+    cache = VersionCache(lambda catalog, previous: builds.append((catalog.version, previous)) or catalog.version)
+    current = CatalogStore(catalog_path).current()
+    old = dataclasses.replace(current, version="old")
+    older = dataclasses.replace(current, version="older")
+    for catalog in (old, current, old, current):
+        assert cache.get(catalog) == catalog.version
+    assert builds == [("old", None), (current.version, "old")]
+    cache.get(older)  # evicts old, the least recently used
+    cache.get(current)
+    cache.get(old)
+    assert [v for v, _ in builds] == ["old", current.version, "older", "old"]
+
+
+@pytest.mark.parametrize("d", [{"k": 1e400}, {"time_limit": 1e400}, {"k": "x"}, {"k": -1}, {"pantry": {"x": []}}, 3])
+def test_query_from_dict_rejects(d):
+    with pytest.raises(ValueError):
+        query_from_dict(d)
+
+
+def test_query_from_dict_defaults():
+    pantry, prefs, k = query_from_dict({})
+    assert (pantry, prefs, k) == ({}, Prefs(), 3)
+
+
+def test_stand_ins_follow_the_substitutes_toggle(catalog_path):
+    eng = Engine(CatalogStore(catalog_path))
+    pantry = {"others": ["butter"], "sauces_condiments": ["lemon"]}
+    on = eng.rank(pantry, Prefs(substitutes=True), k=50)
+    assert any(s.substitutes for s in on)
+    for prefs in (Prefs(substitutes=False), Prefs(substitutes=False, search="simmer")):
+        assert not any(s.substitutes for s in eng.rank(pantry, prefs, k=50))
+        assert not any(s.substitutes for s in eng.results(pantry, prefs).page(0, 50))
+
+
+def test_live_results_resolve_against_the_rankers_catalog(catalog_path, monkeypatch):
+    eng = Engine(CatalogStore(catalog_path))
+    catalog = eng.catalog()
+    ranker = eng.live_ranker(None, Prefs(), 5)
+    reloaded = dataclasses.replace(catalog, version="reloaded")
+    monkeypatch.setattr(eng.store, "current", lambda: reloaded)
+    used = []
+    parser = eng.pantry_parser
+    monkeypatch.setattr(eng, "pantry_parser", lambda c=None: used.append(c) or parser(c))
+    results = eng.live_results(ranker, {"veggies": ["tomatto", "onion"]})
+    assert used == [catalog]
+    assert results.version == catalog.version
+    assert [(s.rid, s.score) for s in results.page(0, 5)] == eng.ranked(
+        catalog, {"veggies": {"tomato", "onion"}}, Prefs(), 5
+    )
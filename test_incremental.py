@@ -0,0 +1,36 @@
+import random
+
+from catalog import CATEGORIES, PANTRY_OPTIONS
+from facets import FacetIndex
+from incremental import IncrementalRanker
+from ranking import rank_recipes
+
+
+def test_edits_match_a_fresh_ranking(index, queries):
+    # a session adding and removing ingredients one at a time, changing
+    # preferences now and then, always agrees with ranking from scratch
+    rng = random.Random(2)
+    facets = FacetIndex(index)
+    ranker = IncrementalRanker(index, k=10)
+    for i in range(300):
+        cat = rng.choice(CATEGORIES)
+        x = rng.choice(PANTRY_OPTIONS[cat])
+        if x in ranker.have[cat]:
+            ranker.remove(cat, x)
+        else:
+            ranker.add(cat, x)
+        if i % 25 == 0:
+            _, prefs = queries[i // 25]
+            ranker.set_prefs(prefs, facets.members(prefs) if prefs.strict else None)
+        want = rank_recipes(index, ranker.have, ranker.prefs, ranker.members)
+        assert ranker.top() == want[:10]
+        assert ranker.top(40) == want[:40]
+
+
+def test_update_replaces_the_pantry(index, queries):
+    facets = FacetIndex(index)
+    ranker = IncrementalRanker(index)
+    for have, prefs in queries[:15]:
+        ranker.set_prefs(prefs, facets.members(prefs) if prefs.strict else None)
+        ranker.update(have)
+        assert ranker.top(5) == rank_recipes(index, have, prefs, ranker.members)[:5]
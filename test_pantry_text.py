@@ -0,0 +1,50 @@
+import pytest
+
+from catalog import load_catalog
+from fuzzy import auto_distance
+from pantry_text import PantryParser
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return PantryParser(load_catalog())
+
+
+def test_auto_distance():
+    assert [auto_distance("x" * n) for n in range(3, 9)] == [0, 0, 1, 1, 2, 2]
+
+
+def test_parse(parser):
+    assert parser.parse("2 green onions, some bell peppers, soya sauce") == {
+        "veggies": ["spring onion", "capsicum"],
+        "sauces_condiments": ["light soy sauce"],
+    }
+
+
+def test_typos_are_corrected_and_reported(parser):
+    pantry = {"veggies": ["tomatto", "spinnach", "onion"], "proteins": ["paner"]}
+    assert parser.resolve_pantry(pantry) == {"veggies": {"tomato", "spinach", "onion"}, "proteins": {"paneer"}}
+    assert parser.corrections(pantry) == {"tomatto": "tomato", "spinnach": "spinach", "paner": "paneer"}
+
+
+def test_short_words_are_not_guessed(parser):
+    assert parser.resolve("onin") is None
+    assert parser.corrections({"veggies": ["onin"]}) == {}
+
+
+def test_plurals_are_not_corrections(parser):
+    assert parser.resolve("tomatoes") == "tomato"
+    assert parser.corrections({"veggies": ["tomatoes", "Bell Pepper"]}) == {}
+
+
+def test_typos_in_list_entries(parser):
+    assert parser.extract("tomatos, garlik\n2 green onins; paner") == ["tomato", "garlic", "spring onion", "paneer"]
+
+
+def test_prose_is_not_guessed_at(parser):
+    assert parser.extract("I'd better check the price") == []
+    assert parser.extract("I have onions and some rice but I'd better check the price of paneer") == [
+        "onion",
+        "rice",
+        "paneer",
+    ]
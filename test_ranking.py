@@ -0,0 +1,39 @@
+# Every ranking path must return exactly what sorting the catalog by
+# score_recipe does: same recipes, same floats, ties in catalog order.
+import pytest
+
+from facets import FacetIndex
+from ranking import allows, rank_recipes, score_ids, score_recipe, top_k
+
+
+def reference(recipes, have, prefs, members=None):
+    scored = [(rid, score_recipe(r, have, prefs)) for rid, r in enumerate(recipes) if allows(members, rid)]
+    return sorted([t for t in scored if t[1] > 0], key=lambda t: (-t[1], t[0]))
+
+
+def test_rank_recipes_matches_score_recipe(index, recipes, queries):
+    facets = FacetIndex(index)
+    for have, prefs in queries:
+        members = facets.members(prefs) if prefs.strict else None
+        assert rank_recipes(index, have, prefs, members) == reference(recipes, have, prefs, members)
+
+
+def test_score_ids_matches_score_recipe(index, recipes, queries):
+    rids = range(0, len(recipes), 7)
+    for have, prefs in queries:
+        assert score_ids(index, have, prefs, rids) == {rid: score_recipe(recipes[rid], have, prefs) for rid in rids}
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 50, 1000])
+def test_top_k_is_a_prefix_of_rank_recipes(index, queries, k):
+    facets = FacetIndex(index)
+    for have, prefs in queries:
+        members = facets.members(prefs) if prefs.strict else None
+        ranked, _ = top_k(index, have, k, prefs, members)
+        assert ranked == rank_recipes(index, have, prefs, members)[:k]
+
+
+def test_top_k_of_nothing(index, queries):
+    have, prefs = queries[0]
+    ranked, _ = top_k(index, have, 0, prefs)
+    assert ranked == []
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from catalog import CatalogStore
+from engine import Engine
+from service import MAX_PLAN_DAYS, HTTPError, Service
+
+
+@pytest.fixture(scope="module")
+def engine(catalog_path):
+    return Engine(CatalogStore(catalog_path))
+
+
+def call(engine, method, path, payload=None, body=None):
+    async def go():
+        service = Service(engine)
+        service.batcher.start()
+        try:
+            data = body if body is not None else json.dumps(payload).encode()
+            return await service.handle(method, path, data)
+        finally:
+            await service.batcher.stop()
+
+    return asyncio.run(go())
+
+
+def status(engine, method, path, payload=None, body=None):
+    with pytest.raises(HTTPError) as e:
+        call(engine, method, path, payload, body)
+    return e.value.status
+
+
+def test_rank(engine):
+    out = call(engine, "POST", "/rank", {"pantry": {"veggies": ["onion", "tomatto"]}, "k": 2})
+    assert out["version"] == engine.catalog().version
+    assert len(out["results"]) == 2
+    assert out["corrections"] == {"tomatto": "tomato"}
+
+
+def test_rank_nothing(engine):
+    assert call(engine, "POST", "/rank", {"pantry": {"veggies": ["onion"]}, "k": 0})["results"] == []
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"pantry": ["onion"]},
+    {"pantry": {"fruit": ["apple"]}},
+    {"pantry": {"veggies": "onion"}},
+    {"cuisine": 3},
+    {"diet": ["veg"]},
+    {"k": "three"},
+    {"k": -1},
+    {"k": 1e400},
+    {"time_limit": 1e400},
+    {"strict": "yes"},
+    {"search": 1},
+    {"text": 5},
+])
+def test_rank_rejects_bad_queries(engine, payload):
+    assert status(engine, "POST", "/rank", payload) == 400
+
+
+def test_invalid_json(engine):
+    assert status(engine, "POST", "/rank", body=b"{") == 400
+
+
+def test_batch_keeps_good_queries(engine):
+    out = call(engine, "POST", "/rank/batch", {"queries": [{"k": 1}, {"k": -1}]})
+    good, bad = out["results"]
+    assert len(good["results"]) == 1
+    assert "error" in bad and "status" not in bad
+
+
+@pytest.mark.parametrize("payload", [{}, {"queries": {}}])
+def test_batch_rejects_non_lists(engine, payload):
+    assert status(engine, "POST", "/rank/batch", payload) == 400
+
+
+@pytest.mark.parametrize("path,payload", [
+    ("/unlock", {"size": 0}),
+    ("/unlock", {"size": "two"}),
+    ("/unlock", {"threshold": 0}),
+    ("/unlock", {"threshold": 1e400}),
+    ("/similar", {}),
+    ("/similar", {"id": True}),
+    ("/plan", {"days": 0}),
+    ("/plan", {"days": MAX_PLAN_DAYS + 1}),
+    ("/plan", {"days": 1e400}),
+])
+def test_other_endpoints_reject_bad_queries(engine, path, payload):
+    assert status(engine, "POST", path, payload) == 400
+
+
+def test_similar_after_reload(engine):
+    assert status(engine, "POST", "/similar", {"id": 0, "version": "gone"}) == 409
+
+
+def test_routing(engine):
+    assert status(engine, "GET", "/rank") == 405
+    assert status(engine, "POST", "/health") == 405
+    assert status(engine, "POST", "/nowhere") == 404
+
+
+def test_internal_errors_are_500(engine, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(engine, "rank", fail)
+    assert status(engine, "POST", "/rank", {}) == 500
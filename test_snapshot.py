@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+
+from catalog import CATEGORIES
+from ranking import rank_recipes
+from snapshot import SnapshotError, open_or_compile, open_snapshot, snapshot_path_for, source_digest, write_snapshot
+
+FIELDS = ("title", "cuisine", "time_minutes", "diet", "steps", "masks", "repeats", "sizes")
+
+
+@pytest.fixture
+def snapshot(index, catalog_path, tmp_path):
+    path = str(tmp_path / "recipes.rbsnap")
+    digest = source_digest(catalog_path)
+    write_snapshot(index, path, digest)
+    return path, digest
+
+
+def test_round_trip(index, snapshot, queries):
+    path, digest = snapshot
+    opened = open_snapshot(path, digest)
+    assert opened.vocab.names == index.vocab.names
+    assert len(opened.records) == len(index.records)
+    for a, b in zip(opened.records, index.records):
+        assert [getattr(a, f) for f in FIELDS] == [getattr(b, f) for f in FIELDS]
+    assert list(opened.records.texts()) == [(r.title, r.steps) for r in index.records]
+    for cat in CATEGORIES:
+        assert {x: list(rids) for x, rids in opened.postings[cat].items()} == index.postings[cat]
+        assert opened.bounds[cat] == index.bounds[cat]
+    assert {key: list(rids) for key, rids in opened.groups.items()} == index.groups
+    for have, prefs in queries:
+        assert rank_recipes(opened, have, prefs) == rank_recipes(index, have, prefs)
+
+
+def test_digest_mismatch(snapshot):
+    path, digest = snapshot
+    with pytest.raises(SnapshotError, match="stale"):
+        open_snapshot(path, bytes(len(digest)))
+
+
+def test_truncated(snapshot):
+    path, digest = snapshot
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+    with pytest.raises(SnapshotError, match="truncated"):
+        open_snapshot(path, digest)
+
+
+def test_stale_snapshot_is_rebuilt(catalog_path, tmp_path):
+    source = str(tmp_path / "recipes.jsonl")
+    shutil.copy(catalog_path, source)
+    _, first = open_or_compile(source)
+    with open(source) as f:
+        lines = f.readlines()
+    with open(source, "w") as f:
+        f.writelines(lines[:-1])
+    index, digest = open_or_compile(source)
+    assert digest != first
+    assert len(index.records) == len(lines) - 1
+    assert len(open_snapshot(snapshot_path_for(source), digest).records) == len(lines) - 1
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from snapshot import SnapshotRecords, open_snapshot, source_digest, write_snapshot
+from text_search import TEXT_WEIGHT, TextIndex, doc_terms, parse_query
+
+
+def test_parse_query():
+    assert parse_query("Stir-fry the onions") == (("onion", "stir fry"), ())
+    assert parse_query("no oven, curry") == (("curry",), ("oven",))
+    assert parse_query("without-eggs") == ((), ("egg",))
+    assert parse_query("the") == ((), ())
+
+
+def test_negated_words_are_not_indexed():
+    assert doc_terms("Serve hot (no-egg version)") == ["serve", "hot", "serve hot", "version"]
+    assert "stir" not in doc_terms("Do not stir while it sets")
+
+
+@pytest.fixture(scope="module")
+def text(index):
+    return TextIndex(index)
+
+
+def steps_with(index, *phrases):
+    return {
+        rid
+        for rid, r in enumerate(index.records)
+        if any(p in s.lower() for s in (r.title,) + tuple(r.steps) for p in phrases)
+    }
+
+
+def test_phrase_matches_only_the_phrase(index, text):
+    match = text.search("stir-fry")
+    assert set(match.scores) == steps_with(index, "stir-fry", "stir fry")
+    assert max(match.scores.values()) == TEXT_WEIGHT
+    assert match.filtered
+
+
+def test_negation_excludes(index, text):
+    match = text.search("no egg")
+    # "Creamy Alfredo (no-egg)" and "Serve hot (no-egg version ...)" use no egg
+    egg = re.compile(r"(?<!no-)\begg")
+    assert match.excluded == {rid for rid, r in enumerate(index.records) if egg.search(r.title.lower())}
+    assert match.excluded
+    assert not match.filtered and not match.scores
+    assert text.search("without oven").excluded == steps_with(index, "oven")
+
+
+def test_nothing_to_search(text):
+    assert text.search("the and of") is None
+
+
+def test_snapshot_index_decodes_no_records(index, catalog_path, tmp_path):
+    path = str(tmp_path / "recipes.rbsnap")
+    write_snapshot(index, path, source_digest(catalog_path))
+    opened = open_snapshot(path)
+    assert isinstance(opened.records, SnapshotRecords)
+    assert TextIndex(opened).search("simmer").scores == TextIndex(index).search("simmer").scores
+    assert opened.records.cache.count(None) == len(opened.records)
@@ -0,0 +1,77 @@
+# UnlockIndex against brute force: add the ingredients to the pantry and
+# recompute every recipe's coverage.
+import random
+
+import pytest
+
+from catalog import CATEGORIES
+from ranking import score_from_hits
+from unlock import REACHABLE_CACHE_SIZE, UnlockIndex
+
+THRESHOLD = 0.5
+
+
+def coverage(index, rid, owned):
+    rec = index.records[rid]
+    names = index.vocab.names
+    hits = [sum(names[i] in owned for i in rec.ingredient_ids(ci)) for ci in range(len(CATEGORIES))]
+    return score_from_hits(hits, rec.sizes)
+
+
+def lifted(index, owned, extra):
+    return [
+        rid
+        for rid in range(len(index.records))
+        if coverage(index, rid, owned) < THRESHOLD <= coverage(index, rid, owned | set(extra))
+    ]
+
+
+def pantries(index, n):
+    rng = random.Random(3)
+    names = list(index.vocab.names)
+    for _ in range(n):
+        owned = set(rng.sample(names, 6))
+        yield {cat: set(owned) for cat in CATEGORIES}, owned
+
+
+@pytest.fixture(scope="module", params=["postings", "matrix"])
+def scorer(request, index):
+    if request.param == "postings":
+        return None
+    pytest.importorskip("numpy")
+    from vector_scoring import MatrixScorer
+
+    return MatrixScorer(index)
+
+
+def test_single_ingredients_are_the_best(index, scorer):
+    ux = UnlockIndex(index)
+    for have, owned in pantries(index, 6):
+        got = ux.analyze(have, size=1, threshold=THRESHOLD, scorer=scorer)
+        # ties go to the ingredient seen first in the catalog
+        want = sorted(
+            ((x, lifted(index, owned, [x])) for x in index.vocab.names if x not in owned),
+            key=lambda t: (-len(t[1]), index.vocab.ids[t[0]]),
+        )
+        assert [(u.ingredients, u.recipes) for u in got] == [((x,), r) for x, r in want if r][:5]
+
+
+def test_sets_lift_what_they_claim(index, scorer):
+    ux = UnlockIndex(index)
+    for have, owned in pantries(index, 6):
+        for u in ux.analyze(have, size=3, threshold=THRESHOLD, scorer=scorer):
+            assert not owned & set(u.ingredients)
+            assert u.recipes == lifted(index, owned, u.ingredients)
+
+
+def test_size_is_checked(index):
+    with pytest.raises(ValueError):
+        UnlockIndex(index).analyze({}, size=0)
+
+
+def test_reachable_cache_is_bounded(index):
+    ux = UnlockIndex(index)
+    have = {"veggies": {"onion"}}
+    for i in range(1, 50):
+        ux.analyze(have, size=1, threshold=i / 50)
+    assert ux.reachable.cache_info().currsize <= REACHABLE_CACHE_SIZE
@@ -0,0 +1,34 @@
+import pytest
+
+from facets import FacetIndex
+from ranking import rank_recipes, score_recipe
+
+pytest.importorskip("numpy")
+from vector_scoring import MatrixScorer
+
+
+@pytest.fixture(scope="module")
+def scorer(index):
+    return MatrixScorer(index)
+
+
+def test_scores_match_score_recipe(scorer, recipes, queries):
+    for have, prefs in queries:
+        assert scorer.scores(have, prefs).tolist() == [score_recipe(r, have, prefs) for r in recipes]
+
+
+def test_members_zero_the_rest(scorer, index, queries):
+    facets = FacetIndex(index)
+    for have, prefs in queries:
+        members = facets.members(prefs)
+        full = scorer.scores(have, prefs).tolist()
+        got = scorer.scores(have, prefs, members).tolist()
+        assert got == [s if facets.allowed(prefs) >> rid & 1 else 0.0 for rid, s in enumerate(full)]
+
+
+@pytest.mark.parametrize("k", [None, 0, 1, 3, 50])
+def test_rank_matches_rank_recipes(scorer, index, queries, k):
+    facets = FacetIndex(index)
+    for have, prefs in queries:
+        members = facets.members(prefs) if prefs.strict else None
+        assert scorer.rank(have, prefs, k, members) == rank_recipes(index, have, prefs, members)[:k]
@@ -0,0 +1,180 @@
+# Full-text search over recipe titles and steps: "stir-fry", "simmer",
+# "no oven". Built on the first search of a catalog version: every title and
+# step is tokenized like the pantry parser does (lowercase words, light
+# plural folding) into postings of (recipe id, term frequency), so a query
+# only reads the postings of its own terms and never the step text. Snapshot
+# catalogs are read straight from their string tables, without decoding
+# recipe records.
+#
+# Matches are scored with BM25 over one document per recipe, title terms
+# counting TITLE_WEIGHT times, and the engine adds the score, scaled so the
+# best match gets TEXT_WEIGHT, to the ingredient score (see Engine.ranked).
+# A search keeps only recipes matching at least one of its terms. A
+# hyphenated term is a phrase: "stir-fry" matches "stir-fry" and "stir fry",
+# not "stir in" plus "fry" elsewhere. Adjacent word pairs are indexed for
+# that. A word after "no"/"without" excludes recipes using it instead ("no
+# oven"); a search with nothing but exclusions just filters. Documents are
+# read the same way, so "(no-egg)" or "do not stir" index neither word.
+import math
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog import IngredientIndex
+from pantry_text import stem
+from snapshot import SnapshotRecords
+
+TITLE_WEIGHT = 2.0
+TEXT_WEIGHT = 0.4
+K1 = 1.2
+B = 0.75
+
+NEGATIONS = {"no", "without", "not"}
+STOPWORDS = {"a", "an", "and", "or", "the", "with", "in", "on", "of", "for", "to", "recipe", "recipes", "dish"}
+
+# a word, or words joined by hyphens ("stir-fry", "no-egg")
+COMPOUND_RE = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+
+def doc_terms(text: str) -> List[str]:
+    # Indexed terms of a title or step: stemmed words, except negations and
+    # the word each negates, plus "a b" for every pair of adjacent words kept
+    out = []
+    prev = None
+    negate = False
+    for compound in COMPOUND_RE.findall(text.lower()):
+        for w in compound.split("-"):
+            if w in NEGATIONS:
+                negate, prev = True, None
+            elif negate:
+                negate, prev = False, None
+            else:
+                t = stem(w)
+                out.append(t)
+                if prev is not None:
+                    out.append(f"{prev} {t}")
+                prev = t
+    return out
+
+
+def parse_query(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    # (terms, excluded terms), each sorted and deduplicated, so equal
+    # searches compare (and cache) equal. A phrase is one term, its stemmed
+    # words joined by spaces.
+    terms: Set[str] = set()
+    excluded: Set[str] = set()
+    negate = False
+    for compound in COMPOUND_RE.findall(text.lower()):
+        parts = compound.split("-")
+        if parts[0] in NEGATIONS and not negate:
+            if len(parts) == 1:
+                negate = True
+                continue
+            parts, negate = parts[1:], True  # "no-egg"
+        term = " ".join(stem(w) for w in parts)
+        if negate:
+            excluded.add(term)
+            negate = False
+        elif len(parts) > 1 or parts[0] not in STOPWORDS:
+            terms.add(term)
+    return tuple(sorted(terms - excluded)), tuple(sorted(excluded))
+
+
+def term_keys(term: str) -> List[str]:
+    # the postings a term needs: its word, or each adjacent pair of a phrase
+    w = term.split(" ")
+    return [term] if len(w) <= 2 else [f"{w[i]} {w[i + 1]}" for i in range(len(w) - 1)]
+
+
+@dataclass
+class TextMatch:
+    scores: Dict[int, float] = field(default_factory=dict)  # recipe id -> share of TEXT_WEIGHT it adds
+    excluded: Set[int] = field(default_factory=set)  # recipes using an excluded term
+    filtered: bool = False  # True when only recipes in scores may be ranked
+
+    def allows(self, rid: int) -> bool:
+        return rid not in self.excluded and (not self.filtered or rid in self.scores)
+
+    def exclude(self, members: Optional[bytes], n: int) -> bytes:
+        # members (a FacetIndex.members() bit array over n recipes, or None
+        # for all of them) without the excluded recipes
+        bits = bytearray(members) if members is not None else bytearray(b"\xff" * ((n + 7) // 8))
+        for rid in self.excluded:
+            bits[rid >> 3] &= ~(1 << (rid & 7)) & 0xFF
+        return bytes(bits)
+
+
+class TextIndex:
+    def __init__(self, index: IngredientIndex):
+        records = index.records
+        if isinstance(records, SnapshotRecords):
+            texts: Iterable[Tuple[str, Tuple[str, ...]]] = records.texts()
+        else:
+            texts = ((rec.title, rec.steps) for rec in records)
+        self.size = len(records)
+        # term -> (recipe ids ascending, weighted term frequencies)
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.lengths = array("d")  # words per recipe, titles weighted
+        seen: Dict[str, Dict[str, int]] = {}  # step text -> term counts; catalogs reuse steps
+        for rid, (title, steps) in enumerate(texts):
+            tf: Dict[str, float] = {}
+            for t in doc_terms(title):
+                tf[t] = tf.get(t, 0.0) + TITLE_WEIGHT
+            for step in steps:
+                counts = seen.get(step)
+                if counts is None:
+                    counts = seen[step] = {}
+                    for t in doc_terms(step):
+                        counts[t] = counts.get(t, 0) + 1
+                for t, c in counts.items():
+                    tf[t] = tf.get(t, 0.0) + c
+            for t, f in tf.items():
+                entry = self.postings.get(t)
+                if entry is None:
+                    entry = self.postings[t] = (array("I"), array("d"))
+                entry[0].append(rid)
+                entry[1].append(f)
+            self.lengths.append(sum(f for t, f in tf.items() if " " not in t))
+        self.avg_length = sum(self.lengths) / self.size if self.size else 0.0
+
+    def idf(self, key: str) -> float:
+        df = len(self.postings[key][0])
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def containing(self, term: str) -> Set[int]:
+        # recipes with every posting the term needs
+        found: Optional[Set[int]] = None
+        for key in term_keys(term):
+            rids = set(self.postings.get(key, ((), ()))[0])
+            found = rids if found is None else found & rids
+        return found or set()
+
+    def search(self, text: str) -> Optional[TextMatch]:
+        # None for a search with no usable words
+        terms, excluded = parse_query(text)
+        if not terms and not excluded:
+            return None
+        match = TextMatch(filtered=bool(terms))
+        for t in excluded:
+            match.excluded.update(self.containing(t))
+        scores = match.scores
+        lengths, norm = self.lengths, K1 / self.avg_length if self.avg_length else 0.0
+        for t in terms:
+            keys = term_keys(t)
+            if any(key not in self.postings for key in keys):
+                continue
+            within = self.containing(t) if len(keys) > 1 else None
+            for key in keys:
+                idf = self.idf(key)
+                for rid, f in zip(*self.postings[key]):
+                    if within is None or rid in within:
+                        s = idf * f * (K1 + 1) / (f + K1 * (1 - B) + norm * B * lengths[rid])
+                        scores[rid] = scores.get(rid, 0.0) + s
+        for rid in match.excluded:
+            scores.pop(rid, None)
+        if scores:
+            top = max(scores.values())
+            for rid, s in scores.items():
+                scores[rid] = TEXT_WEIGHT * s / top
+        return match
@@ -0,0 +1,306 @@
+# "What should I buy?": ingredients, and small sets of them, ranked by how
+# many recipes they would lift to at least a coverage threshold. Coverage is
+# the ingredient part of the score (weighted, 0..1) before preference
+# adjustments, counting exact matches only: buying the real ingredient is
+# the point, so substitution credit is left out.
+#
+# Only "near" recipes are examined: below the threshold, but within reach of
+# it given their most valuable ingredients (precomputed once per catalog).
+# For large catalogs the matrix scorer finds them in one vectorized pass;
+# otherwise they come from the pantry's postings. Single ingredients are
+# counted exactly in one pass over the near recipes. Larger sets extend the
+# best smaller ones (a beam). For a base set S, a recipe missing none of S
+# is lifted by S + x exactly when x alone lifts it, so each base only visits
+# the near recipes that use something in S (found through the postings).
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from itertools import chain
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from catalog import CATEGORIES, WEIGHTS, CompactRecipe, IngredientIndex, bit_ids, pantry_masks
+from ranking import BOUND_EPS, allows, pantry_terms, score_from_hits
+
+DEFAULT_THRESHOLD = 0.6
+MAX_SET_SIZE = 3
+BEAM_WIDTH = 8  # best sets of one size extended to the next
+# (threshold, size) pairs whose reachable recipes stay cached; clients pick
+# any threshold, so this must be bounded
+REACHABLE_CACHE_SIZE = 8
+
+# missing ingredient id -> (occurrences per category, weighted coverage it adds)
+Missing = Dict[int, Tuple[List[int], float]]
+
+
+@dataclass
+class Unlock:
+    ingredients: Tuple[str, ...]
+    recipes: List[int]  # recipe ids lifted over the threshold, in catalog order
+
+    def to_dict(self, index: IngredientIndex, examples: int = 3) -> Dict[str, Any]:
+        return {
+            "ingredients": list(self.ingredients),
+            "recipes": len(self.recipes),
+            "examples": [index.records[rid].title for rid in self.recipes[:examples]],
+        }
+
+
+def missing_gains(rec: CompactRecipe, owned: int) -> Missing:
+    # the recipe's ingredients outside `owned` (an id mask over all categories)
+    out: Missing = {}
+    for ci, cat in enumerate(CATEGORIES):
+        n = rec.sizes[ci]
+        if not n:
+            continue
+        layers = [rec.masks[ci], *(rec.repeats[ci] if rec.repeats else ())]
+        for x in chain.from_iterable(bit_ids(m & ~owned) for m in layers):
+            occ, gain = out.get(x) or ([0] * len(CATEGORIES), 0.0)
+            occ[ci] += 1
+            out[x] = (occ, gain + WEIGHTS[cat] / n)
+    return out
+
+
+def is_simple(rec: CompactRecipe) -> bool:
+    # every ingredient listed once, in one category: each is worth its
+    # category's share of the weight
+    return not rec.repeats and rec.need.bit_count() == sum(rec.sizes)
+
+
+def top_gains(rec: CompactRecipe, count: int) -> List[float]:
+    # the `count` largest coverage gains any one of the recipe's ingredients gives
+    if is_simple(rec):
+        units = sorted(((WEIGHTS[cat] / n, n) for cat, n in zip(CATEGORIES, rec.sizes) if n), reverse=True)
+        out: List[float] = []
+        for gain, n in units:
+            out.extend([gain] * min(n, count - len(out)))
+        return out
+    return sorted((g for _, g in missing_gains(rec, 0).values()), reverse=True)[:count]
+
+
+class _Near:
+    # one query's near recipes; hits and missing ingredients are worked out
+    # on first use
+    def __init__(self, records, have_masks: List[int], owned: int):
+        self.records = records
+        self.have_masks = have_masks
+        self.owned = owned
+        self.coverage: Dict[int, float] = {}
+        self._hits: Dict[int, List[int]] = {}
+        self._missing: Dict[int, Missing] = {}
+
+    def hits(self, rid: int) -> List[int]:
+        h = self._hits.get(rid)
+        if h is None:
+            h = self._hits[rid] = self.records[rid].hits(self.have_masks)
+        return h
+
+    def missing(self, rid: int) -> Missing:
+        m = self._missing.get(rid)
+        if m is None:
+            m = self._missing[rid] = missing_gains(self.records[rid], self.owned)
+        return m
+
+
+class UnlockIndex:
+    def __init__(self, index: IngredientIndex, max_size: int = MAX_SET_SIZE):
+        self.index = index
+        self.max_size = max_size
+        # best[rid * max_size + j]: coverage the recipe's j + 1 most valuable
+        # ingredients add; an upper bound on what j + 1 purchases can do
+        self.best = array("d")
+        self.simple = bytearray(len(index.records))
+        for rid, rec in enumerate(index.records):
+            self.simple[rid] = is_simple(rec)
+            gains = top_gains(rec, max_size)
+            acc = 0.0
+            for j in range(max_size):
+                if j < len(gains):
+                    acc += gains[j]
+                self.best.append(acc)
+        # ingredient ids, most used first (pads the beam, see analyze)
+        uses: Dict[int, int] = {}
+        ids = index.vocab.ids
+        for cat in CATEGORIES:
+            for x, rids in index.postings[cat].items():
+                uses[ids[x]] = uses.get(ids[x], 0) + len(rids)
+        self.popular = sorted(uses, key=lambda x: -uses[x])
+        self.reachable = lru_cache(maxsize=REACHABLE_CACHE_SIZE)(self._reachable_uncached)
+
+    def _reachable_uncached(self, threshold: float, size: int) -> List[int]:
+        # recipes `size` purchases could lift from nothing
+        best, m, j = self.best, self.max_size, size - 1
+        return [rid for rid in range(len(self.index.records)) if best[rid * m + j] + BOUND_EPS >= threshold]
+
+    def containing(self, x: int) -> Set[int]:
+        # recipes using ingredient id x in any category
+        name = self.index.vocab.names[x]
+        return {rid for cat in CATEGORIES for rid in self.index.postings[cat].get(name, ())}
+
+    def _near(self, near: "_Near", have_by_cat: Dict[str, Set[str]], threshold: float, size: int, scorer: Any):
+        # fill near.coverage with the recipes below the threshold that `size`
+        # purchases might lift
+        best, m, j = self.best, self.max_size, size - 1
+        if scorer is not None:
+            import numpy as np  # the scorer needs it anyway
+
+            cov = scorer.coverage(have_by_cat)
+            reach = np.frombuffer(self.best, dtype=np.float64)[j::m]
+            rids = np.flatnonzero((cov < threshold) & (cov + reach + BOUND_EPS >= threshold))
+            near.coverage = dict(zip(rids.tolist(), cov[rids].tolist()))
+            return
+        postings = self.index.postings
+        touched = {rid for ci, x in pantry_terms(have_by_cat) for rid in postings[CATEGORIES[ci]].get(x, ())}
+        for rid in sorted(touched.union(self.reachable(threshold, size))):
+            cov = score_from_hits(near.hits(rid), self.index.records[rid].sizes)
+            if cov < threshold and cov + best[rid * m + j] + BOUND_EPS >= threshold:
+                near.coverage[rid] = cov
+
+    def analyze(
+        self,
+        have_by_cat: Dict[str, Set[str]],
+        size: int = 2,
+        threshold: float = DEFAULT_THRESHOLD,
+        limit: int = 5,
+        members: Optional[bytes] = None,
+        scorer: Any = None,
+    ) -> List[Unlock]:
+        # Up to `limit` sets per size from 1 to `size`, smallest sets first,
+        # then most recipes lifted. Ingredients already in the pantry (in any
+        # category) are never suggested. scorer: the catalog's MatrixScorer,
+        # if it has one.
+        if not 1 <= size <= self.max_size:
+            raise ValueError(f"size must be between 1 and {self.max_size}")
+        index = self.index
+        have_masks = pantry_masks(index.vocab, have_by_cat)
+        owned = 0
+        for mask in have_masks:
+            owned |= mask
+        near = _Near(index.records, have_masks, owned)
+        self._near(near, have_by_cat, threshold, size, scorer)
+        if members is not None:
+            near.coverage = {rid: cov for rid, cov in near.coverage.items() if allows(members, rid)}
+
+        # what each ingredient lifts on its own
+        alone: Dict[int, List[int]] = {}
+        best, m = self.best, self.max_size
+        for rid, cov in near.coverage.items():
+            if cov + best[rid * m] + BOUND_EPS < threshold:
+                continue
+            for x in self._lifters(near, rid, near.hits(rid), cov, owned, threshold):
+                alone.setdefault(x, []).append(rid)
+
+        names = index.vocab.names
+
+        def label(ids: Tuple[int, ...]) -> Tuple[str, ...]:
+            return tuple(sorted(names[x] for x in ids))
+
+        # ties go to the ingredient seen first in the catalog
+        level = sorted((((x,), rids) for x, rids in alone.items()), key=lambda t: (-len(t[1]), t[0]))
+        out = [Unlock(label(ids), rids) for ids, rids in level[:limit]]
+        lifted_by = dict(level[:BEAM_WIDTH])
+        beam = list(lifted_by)
+        # ingredients that lift nothing alone may still do so together, so a
+        # short beam is topped up with the most used ones
+        for x in self.popular:
+            if len(beam) >= BEAM_WIDTH:
+                break
+            if not owned >> x & 1 and (x,) not in lifted_by:
+                beam.append((x,))
+
+        for _ in range(size - 1):
+            # set -> (its ids sorted, recipes it lifts, how to list them)
+            found: Dict[FrozenSet[int], Tuple[Tuple[int, ...], int, Callable[[], List[int]]]] = {}
+            for base in beam:
+                counts, recipes = self._extend(near, base, lifted_by.get(base, []), alone, threshold)
+                for x, n in counts.items():
+                    ids = base + (x,)
+                    found.setdefault(frozenset(ids), (tuple(sorted(ids)), n, partial(recipes, x)))
+            # only the sets shown or extended get their recipes listed
+            level = sorted(found.values(), key=lambda t: (-t[1], t[0]))
+            level = [(ids, recipes()) for ids, _, recipes in level[:max(limit, BEAM_WIDTH)]]
+            out.extend(Unlock(label(ids), rids) for ids, rids in level[:limit])
+            lifted_by = dict(level[:BEAM_WIDTH])
+            beam = list(lifted_by)
+        return out
+
+    def _lifters(self, near: _Near, rid: int, hits: List[int], cov: float, skip: int, threshold: float) -> List[int]:
+        # missing ingredients outside `skip` (an id mask) that would lift the
+        # recipe from `hits` (with coverage cov) on their own
+        rec = self.index.records[rid]
+        out: List[int] = []
+        if self.simple[rid]:
+            # all missing ingredients of a category add the same, so one
+            # exact check per category decides them all
+            for ci, cat in enumerate(CATEGORIES):
+                n = rec.sizes[ci]
+                if not n or cov + WEIGHTS[cat] / n + BOUND_EPS < threshold:
+                    continue
+                free = rec.masks[ci] & ~skip
+                if not free:
+                    continue
+                hits[ci] += 1
+                ok = score_from_hits(hits, rec.sizes) >= threshold
+                hits[ci] -= 1
+                if ok:
+                    out.extend(bit_ids(free))
+            return out
+        for x, (occ, gain) in near.missing(rid).items():
+            # the gain is a float shortcut; the exact score decides
+            if skip >> x & 1 or cov + gain + BOUND_EPS < threshold:
+                continue
+            if score_from_hits([h + o for h, o in zip(hits, occ)], rec.sizes) >= threshold:
+                out.append(x)
+        return out
+
+    def _extend(
+        self,
+        near: _Near,
+        base: Tuple[int, ...],
+        base_lifted: List[int],
+        alone: Dict[int, List[int]],
+        threshold: float,
+    ) -> Tuple[Dict[int, int], Callable[[int], List[int]]]:
+        # How many recipes base + x lifts, for each x it beats base and x
+        # alone with, and a function listing them for a given x
+        records = self.index.records
+        inside: Set[int] = set()  # near recipes missing something in base
+        skip = near.owned
+        for b in base:
+            inside |= self.containing(b)
+            skip |= 1 << b
+        inside.intersection_update(near.coverage)
+        lifted = set(base_lifted)
+        joint: Dict[int, List[int]] = {}  # x -> recipes in `inside` lifted by base + x only
+        for rid in inside:
+            if rid in lifted:
+                continue
+            rec = records[rid]
+            hits = list(near.hits(rid))
+            if self.simple[rid]:
+                for ci in range(len(CATEGORIES)):
+                    for b in base:
+                        hits[ci] += rec.masks[ci] >> b & 1
+            else:
+                missing = near.missing(rid)
+                for b in base:
+                    if b in missing:
+                        hits = [h + o for h, o in zip(hits, missing[b][0])]
+            cov = score_from_hits(hits, rec.sizes)
+            for x in self._lifters(near, rid, hits, cov, skip, threshold):
+                joint.setdefault(x, []).append(rid)
+
+        # outside `inside`, base + x lifts exactly what x alone does
+        counts: Dict[int, int] = {}
+        for x in set(joint).union(alone):
+            if x in base:
+                continue
+            n = len(lifted) + sum(1 for rid in alone.get(x, ()) if rid not in inside) + len(joint.get(x, ()))
+            # worth listing only if it beats both base and x on their own
+            if n > len(lifted) and n > len(alone.get(x, ())):
+                counts[x] = n
+
+        def recipes(x: int) -> List[int]:
+            outside = [rid for rid in alone.get(x, ()) if rid not in inside]
+            return sorted(lifted.union(outside, joint.get(x, ())))
+
+        return counts, recipes
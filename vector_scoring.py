@@ -0,0 +1,132 @@
+from typing import List, Dict, Set, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import CATEGORIES, WEIGHTS, IngredientIndex, norm
+from ranking import Prefs, credit_terms
+
+
+# Batch scorer: the catalog as one sparse recipes x vocabulary incidence
+# matrix per category, stored by column (CSC: each ingredient's recipe ids),
+# so a pantry is scored against every recipe by counting its columns' ids in
+# one bincount. Memory grows with the ingredient lines in the catalog, not
+# with recipes x vocabulary. Produces exactly the same floats as
+# score_recipe (same operation order).
+class MatrixScorer:
+    def __init__(self, index: IngredientIndex):
+        self.index = index
+        records = index.records
+        n = len(records)
+
+        self.cols: Dict[str, Dict[int, int]] = {}  # category -> ingredient id -> column
+        # category -> (column start offsets, recipe ids by column); a recipe
+        # listing an ingredient twice appears twice, so duplicates count like
+        # coverage_score
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.sizes = np.array([rec.sizes for rec in records], dtype=np.float64).reshape(n, len(CATEGORIES))
+        for ci, cat in enumerate(CATEGORIES):
+            cols: Dict[int, int] = {}
+            rows, cs = [], []
+            for rid, rec in enumerate(records):
+                for i in rec.ingredient_ids(ci):
+                    rows.append(rid)
+                    cs.append(cols.setdefault(i, len(cols)))
+            cs = np.array(cs, dtype=np.int64)
+            order = np.argsort(cs, kind="stable")
+            starts = np.zeros(len(cols) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(cs, minlength=len(cols)), out=starts[1:])
+            self.cols[cat] = cols
+            self.postings[cat] = (starts, np.array(rows, dtype=np.int32)[order])
+
+        cuisines = sorted({r.cuisine for r in records})
+        self.cuisine_ids = {c: i for i, c in enumerate(cuisines)}
+        self.cuisine = np.array([self.cuisine_ids[r.cuisine] for r in records], dtype=np.int32)
+        self.diets: Dict[str, np.ndarray] = {}
+        for rid, r in enumerate(records):
+            for d in r.diet:
+                self.diets.setdefault(d, np.zeros(n, dtype=bool))[rid] = True
+        self.time = np.array([r.time_minutes for r in records], dtype=np.int64)
+
+    def coverage(
+        self,
+        have_by_cat: Dict[str, Set[str]],
+        rows=slice(None),
+        credits: Sequence[Tuple[int, str, float]] = (),
+    ) -> np.ndarray:
+        # weighted ingredient coverage (the score before preferences) of the
+        # given rows, every recipe by default; credits as from credit_terms
+        n = len(self.index.records)
+        m = n if isinstance(rows, slice) else rows.size
+        ids = self.index.vocab.ids
+        s = np.zeros(m, dtype=np.float64)
+        for ci, cat in enumerate(CATEGORIES):
+            block_cols = self.cols[cat]
+            cols = sorted({block_cols[i] for i in (ids.get(norm(x)) for x in have_by_cat.get(cat, set())) if i in block_cols})
+            levels: Dict[float, List[int]] = {}
+            for cj, x, c in credits:
+                i = ids.get(x)
+                if cj == ci and i in block_cols:
+                    levels.setdefault(c, []).append(block_cols[i])
+            if not cols and not levels:
+                continue
+            starts, rids = self.postings[cat]
+
+            def count(cols: List[int]) -> np.ndarray:
+                picked = np.concatenate([rids[starts[c]:starts[c + 1]] for c in cols])
+                return np.bincount(picked, minlength=n)[rows].astype(np.int64, copy=False)
+
+            hits = count(cols) if cols else np.zeros(m, dtype=np.int64)
+            # credit times whole counts: exact, like the other paths' sums
+            for c, credited in sorted(levels.items()):
+                hits = hits + c * count(credited)
+            sizes = self.sizes[rows, ci]
+            cov = np.divide(hits, sizes, out=np.zeros(m), where=sizes > 0)
+            s += WEIGHTS[cat] * cov
+        return s
+
+    def scores(self, have_by_cat: Dict[str, Set[str]], prefs: Prefs, members: Optional[bytes] = None) -> np.ndarray:
+        # With members (FacetIndex.members), only the recipes in the filter
+        # are scored; the rest get 0, which select() drops.
+        n = len(self.index.records)
+        if members is None:
+            rows = slice(None)
+        else:
+            rows = np.flatnonzero(np.unpackbits(np.frombuffer(members, dtype=np.uint8), count=n, bitorder="little"))
+        s = self.coverage(have_by_cat, rows, credit_terms(have_by_cat, prefs))
+
+        if prefs.cuisine:
+            ids = [self.cuisine_ids[c] for c in prefs.cuisine if c in self.cuisine_ids]
+            s[np.isin(self.cuisine[rows], ids)] += 0.08
+
+        if prefs.diet != "no preference":
+            ok = self.diets.get(prefs.diet)
+            s[~ok[rows] if ok is not None else slice(None)] -= 0.5
+
+        s += np.where(self.time[rows] <= prefs.time_limit, 0.05, -0.05)
+        if members is None:
+            return s
+        full = np.zeros(n, dtype=np.float64)
+        full[rows] = s
+        return full
+
+    def rank(
+        self,
+        have_by_cat: Dict[str, Set[str]],
+        prefs: Prefs,
+        k: Optional[int] = None,
+        members: Optional[bytes] = None,
+    ) -> List[Tuple[int, float]]:
+        return self.select(self.scores(have_by_cat, prefs, members), k)
+
+    @staticmethod
+    def select(s: np.ndarray, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        if k == 0:
+            return []
+        keep = np.flatnonzero(s > 0)
+        if k is not None and k < keep.size:
+            # partial selection: only recipes scoring at least the k-th best get sorted
+            kth = np.partition(s[keep], keep.size - k)[keep.size - k]
+            keep = keep[s[keep] >= kth]
+        # stable on -s keeps catalog order for ties, like sorted(..., reverse=True)
+        order = keep[np.argsort(-s[keep], kind="stable")]
+        return [(int(i), float(s[i])) for i in order[:k]]